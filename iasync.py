@@ -9,9 +9,11 @@ import time
 from requests.exceptions import HTTPError
 from zipfile import ZipFile
 import codecs
+import tempfile
 
 from internetarchive import upload, get_session, get_item, modify_metadata
 from egazette.utils.file_storage import FileManager
+from egazette.utils.storage_backend import get_backend
 
 from egazette.utils import reporting
 from egazette.srcs  import datasrcs 
@@ -145,6 +147,8 @@ class GazetteIA:
 
         self.session = get_session({'s3': session_data, 'logging': logconfig})
         self.logger = logging.getLogger('iasync')
+        # relurls whose upload failed even after the retries
+        self.failed = []
    
     def get_identifier(self, relurl, metainfo):
         srcname    = self.get_srcname(relurl)
@@ -273,9 +277,19 @@ class GazetteIA:
                 break
             time.sleep(300)
 
-        rawfile  = self.file_storage.get_rawfile_path(relurl)
-        metafile = self.file_storage.get_metafile_path(relurl)
-
+        # compressed or remote raw docs and packed, compressed or remote
+        # metadata are fetched into tmpdir in their plain form
+        tmpdir   = tempfile.mkdtemp(prefix = 'iasync')
+        try:
+            rawfile  = self.file_storage.get_plain_rawfile(relurl, tmpdir)
+            metafile = self.file_storage.get_plain_metafile(relurl, tmpdir)
+            return self.upload_files(relurl, identifier, item, metainfo, \
+                                     rawfile, metafile)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def upload_files(self, relurl, identifier, item, metainfo, \
+                     rawfile, metafile):
         if item.exists:    
             filelist = item.get_files() 
 
@@ -324,6 +338,7 @@ class GazetteIA:
             self.logger.info('Successfully uploaded %s', identifier)
         else:    
             self.logger.warn('Error in uploading %s', identifier)
+            self.failed.append(relurl)
         return success
 
     def ia_upload(self, identifier, metadata, to_upload, files, rawfile):
@@ -531,6 +546,10 @@ def print_usage(progname):
                         [-g google_gvision_key]
                         [-t start_time (%Y-%m-%d %H:%M:%S)]
                         [-T end_time (%Y-%m-%d %H:%M:%S)]
+                        [-c journal_consumer (resume from its journal cursor)]
+                        [-w workers (scan source directories and prefetch metatags in parallel)]
+                        [-M (metatags are stored in pack files)]
+                        [-B s3://bucket/prefix (raw docs and metatags are in S3)]
                         [-U gmail_user]
                         [-P gmail_password]
                         [-E email_to_report]
@@ -556,6 +575,25 @@ def handle_relurl(gazette_ia, relurl, to_upload, to_update, stats):
         success = gazette_ia.update_meta(relurl)   
         stats.update_modify(srcname, success)
 
+def handle_relurls(gazette_ia, relurls, to_upload, to_update, stats, workers):
+    if workers <= 1:
+        for relurl in relurls:
+            handle_relurl(gazette_ia, relurl, to_upload, to_update, stats)
+        return
+
+    batch = []
+    for relurl in relurls:
+        batch.append(relurl)
+        if len(batch) >= 64:
+            gazette_ia.file_storage.prefetch_metainfos(batch, workers)
+            for relurl in batch:
+                handle_relurl(gazette_ia, relurl, to_upload, to_update, stats)
+            batch = []
+
+    gazette_ia.file_storage.prefetch_metainfos(batch, workers)
+    for relurl in batch:
+        handle_relurl(gazette_ia, relurl, to_upload, to_update, stats)
+
 if __name__ == '__main__':
     progname  = sys.argv[0]
     loglevel  = 'info'
@@ -575,8 +613,12 @@ if __name__ == '__main__':
     to_addrs   = []
     key_file   = None
     iadir      = None
+    consumer   = None
+    workers    = 1
+    metapacks  = False
+    storeurl   = None
 
-    optlist, remlist = getopt.getopt(sys.argv[1:], 'a:k:d:D:f:g:hiI:l:s:t:T:mr:uE:U:P:')
+    optlist, remlist = getopt.getopt(sys.argv[1:], 'a:B:c:k:d:D:f:g:hiI:l:Ms:t:T:mr:uw:E:U:P:')
     for o, v in optlist:
         if o == '-l':
             loglevel = v
@@ -619,6 +661,14 @@ if __name__ == '__main__':
             iadir = v
         elif o == '-g':
             key_file = v
+        elif o == '-c':
+            consumer = v
+        elif o == '-B':
+            storeurl = v
+        elif o == '-M':
+            metapacks = True
+        elif o == '-w':
+            workers = int(v)
         elif o == '-h':
             print_usage(progname)
             sys.exit(0)
@@ -688,7 +738,8 @@ if __name__ == '__main__':
         )
 
 
-    storage = FileManager(datadir, False, False)
+    storage = FileManager(datadir, False, False, metapacks = metapacks, \
+                          backend = get_backend(storeurl, datadir))
     gazette_ia = GazetteIA(gvisionobj, storage, access_key, secret_key, loglevel, logfile)
     stats        = Stats()
 
@@ -696,15 +747,22 @@ if __name__ == '__main__':
         srcnames = datasrcs.srcdict.keys()
 
     if relurls:
-        for relurl in relurls:
-            handle_relurl(gazette_ia, relurl, to_upload, to_update, stats)
+        handle_relurls(gazette_ia, relurls, to_upload, to_update, stats, workers)
     elif from_stdin:
-        for line in sys.stdin:
-            relurl = line.strip()
-            handle_relurl(gazette_ia, relurl, to_upload, to_update, stats)
+        relurls = (line.strip() for line in sys.stdin)
+        handle_relurls(gazette_ia, relurls, to_upload, to_update, stats, workers)
+    elif consumer:
+        # the journal moves past relurls whose upload failed, so they are
+        # kept in a retry list of the consumer and tried first next time
+        cursor  = storage.get_cursor(consumer)
+        retries = storage.get_retries(consumer)
+        relurls = storage.find_changed_relurls(srcnames, cursor, retries)
+        handle_relurls(gazette_ia, relurls, to_upload, to_update, stats, workers)
+        storage.save_retries(consumer, gazette_ia.failed)
+        storage.save_cursor(cursor)
     else:        
-        for relurl in storage.find_matching_relurls(srcnames, start_ts, end_ts):
-            handle_relurl(gazette_ia, relurl, to_upload, to_update, stats)
+        relurls = storage.find_matching_relurls(srcnames, start_ts, end_ts, workers)
+        handle_relurls(gazette_ia, relurls, to_upload, to_update, stats, workers)
 
 
 
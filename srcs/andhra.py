@@ -3,6 +3,7 @@ import re
 import os
 
 from ..utils import utils
+from ..utils import tables
 from .basegazette import BaseGazette
 from .central import CentralWeekly
 
@@ -13,36 +14,14 @@ class Andhra(BaseGazette):
         self.baseurl   = 'https://apegazette.cgg.gov.in/eGazetteSearch.do'
         self.searchurl = self.baseurl
         self.hostname  = 'apegazette.cgg.gov.in'
-
-    def get_field_order(self, tr):
-        i = 0
-        order  = []
-        valid = False
-        for th in tr.find_all('th'):
-            txt = utils.get_tag_contents(th)
-            if txt and re.search('gazette\s+type', txt, re.IGNORECASE):
-                order.append('gztype')
-            elif txt and re.search('department', txt, re.IGNORECASE):
-                order.append('department')
-            elif txt and re.search('abstract', txt, re.IGNORECASE):
-                order.append('subject')
-            elif txt and re.search('Issue\s+No', txt, re.IGNORECASE):
-                order.append('gznum')
-            elif txt and re.search('Notification\s+No', txt, re.IGNORECASE):
-                order.append('notification_num')
-            elif txt and re.search('Download', txt, re.IGNORECASE):
-                order.append('download')
-                valid = True
-            elif txt and re.search('', txt, re.IGNORECASE):
-                order.append('')
-
-            else:
-                order.append('')    
-
-            i += 1
-        if valid:    
-            return order
-        return None    
+        self.header_map = tables.HeaderMap([\
+            ('gazette\s+type',    'gztype'),           \
+            ('department',        'department'),       \
+            ('abstract',          'subject'),          \
+            ('Issue\s+No',        'gznum'),            \
+            ('Notification\s+No', 'notification_num'), \
+            ('Download',          'download'),         \
+        ], flags = re.IGNORECASE, required = ['download'])
 
     def get_post_data(self, dateobj):
         datestr = utils.dateobj_to_str(dateobj, '')
@@ -84,7 +63,8 @@ class Andhra(BaseGazette):
 
     def parse_search_results(self, webpage, dateobj):
         minfos = []
-        d = utils.parse_webpage(webpage, self.parser)
+        d = utils.parse_webpage(webpage, self.parser, \
+                                [('table', {'id': 'displaytable'})])
         if not d:
             self.logger.warn('Unable to parse results page for date %s', dateobj)
             return minfos
@@ -94,11 +74,7 @@ class Andhra(BaseGazette):
             self.logger.warn('Unable to find result table for date %s', dateobj)
             return minfos
         
-        order = None
-        for tr in table.find_all('tr'):
-            if not order:
-                order = self.get_field_order(tr)
-                continue
+        for tr, order in self.header_map.get_rows(table):
             metainfo = self.parse_row(tr, order, dateobj)
             if metainfo and 'download' in metainfo:
                 minfos.append(metainfo)
@@ -174,11 +150,20 @@ class AndhraArchive(CentralWeekly):
         self.hostname     = 'gazettearchive.ap.gov.in'
         self.search_endp  = 'gt_PublicReport.aspx'
         self.result_table = 'FileMoveList2'
+        self.max_window   = 1
+        self.header_map   = tables.HeaderMap([\
+            ('GazetteType',     'gztype'),     \
+            ('Abstract',        'subject'),    \
+            ('DepartmentName',  'department'), \
+            ('Gazette\s+No',    'gznum'),      \
+            ('Issued\s+By',     'issued_by'),  \
+        ])
 
     def get_search_results(self, search_url, dateobj, cookiejar):
         response = self.download_url(search_url, savecookies = cookiejar, loadcookies=cookiejar)
 
-        postdata = self.get_form_data(response.webpage, dateobj)
+        d = self.parse_search_page(response, dateobj)
+        postdata = self.get_form_data(d, dateobj)
         if postdata == None:
             return None
         response = self.download_url(search_url, savecookies = cookiejar, \
@@ -223,24 +208,6 @@ class AndhraArchive(CentralWeekly):
 
         return postdata
 
-    def get_column_order(self, tr):
-        order = []
-        for th in tr.find_all('th'):
-            txt = utils.get_tag_contents(th)
-            if txt and re.search('GazetteType', txt):
-                order.append('gztype')
-            elif txt and re.search('Abstract', txt):
-                order.append('subject')
-            elif txt and re.search('DepartmentName', txt):
-                order.append('department')
-            elif txt and re.search('Gazette\s+No', txt):
-                order.append('gznum')
-            elif txt and re.search('Issued\s+By', txt):
-                order.append('issued_by')
-            else:
-                order.append('')
-        return order
-
     def process_result_row(self, tr, metainfos, dateobj, order):
         download = None
         for link in tr.find_all('a'):
@@ -5,21 +5,37 @@ import urllib.request, urllib.error, urllib.parse
 import urllib.parse
 import os
 import time
+import threading
+import concurrent.futures
 
 from ..utils import utils
 
+# fetches in flight to one host, shared by all the sources on that host
+host_slots = {}
+host_lock  = threading.Lock()
+
+def get_host_slots(hostname, size):
+    with host_lock:
+        slots = host_slots.get(hostname)
+        if slots == None:
+            slots = threading.BoundedSemaphore(size)
+            host_slots[hostname] = slots
+    return slots
+
 class WebResponse:
    def __init__(self):
        self.srvresponse  = None
        self.webpage      = None
        self.error        = None
        self.response_url = None
+       self.dom          = None
 
    def set_error(self, error):
        self.error = error
 
    def set_webpage(self, webpage):
        self.webpage = webpage
+       self.dom     = None
 
    def set_srvresponse(self, response):
        self.srvresponse = response
@@ -36,6 +52,9 @@ class Downloader:
         self.storage_manager = storage_manager
         self.backoff  = 0
         self.lookback = 15 
+
+        self.fetch_workers = 4
+        self.host_fetches  = 4
     
         self.logger      = logging.getLogger('crawler.%s' % self.name)
 
@@ -67,9 +86,46 @@ class Downloader:
             fromdate += datetime.timedelta(days=1)
         return newdownloads
 
+    def sync_by_year(self, fromdate, todate, event):
+        # for sources that list their gazettes by year, download_dates
+        # gets the part of the range that falls in one year
+        newdownloads = []
+        while fromdate <= todate:
+            if event.is_set():
+                self.logger.warn('Exiting prematurely as timer event is set')
+                break
+
+            dateobj   = fromdate.date()
+            lastdate  = datetime.datetime(fromdate.year, 12, 31)
+            if todate < lastdate:
+                lastdate = todate
+            lastdate = lastdate.date()
+
+            self.logger.info('Dates:  %s to %s', dateobj, lastdate)
+
+            dls = self.download_dates(self.name, dateobj, lastdate)
+
+            self.logger.info('Got %d gazettes between  %s and %s' % (len(dls), dateobj, lastdate))
+            newdownloads.extend(dls)
+            fromdate = datetime.datetime(fromdate.year + 1, 1, 1)
+
+        return newdownloads
+
+    def fetch_concurrently(self, func, argslist):
+        # calls func with each args in a pool of fetch_workers threads and
+        # returns the results in the order of argslist. download_url keeps
+        # the fetches to any one host within host_fetches
+        if self.fetch_workers <= 1 or len(argslist) <= 1:
+            return [func(*args) for args in argslist]
+
+        workers = min(self.fetch_workers, len(argslist))
+        with concurrent.futures.ThreadPoolExecutor(max_workers = workers) as executor:
+            futures = [executor.submit(func, *args) for args in argslist]
+            return [future.result() for future in futures]
+
     def download_url(self, url, loadcookies = None, savecookies = None, \
                      postdata = None, referer = None, \
-                     encodepost= True, headers = {}):
+                     encodepost= True, headers = None):
         for i in range(0, 3):
             if i > 0:
                 time.sleep(i * 100)
@@ -94,6 +150,12 @@ class Downloader:
         if self.backoff > 0:
             time.sleep(self.backoff)
 
+        # a copy, so that the headers of one request do not leak into
+        # the next one or into a request on another thread
+        if headers:
+            headers = dict(headers)
+        else:
+            headers = {}
         headers['User-agent'] = self.useragent
 
         if referer:
@@ -115,10 +177,13 @@ class Downloader:
                 request.headers['Cookie'] = request.unredirected_hdrs.pop('Cookie')
         self.logger.debug('Request url: %s headers: %s data: %s', \
                             request.full_url, request.headers, request.data)
+        slots = get_host_slots(urllib.parse.urlsplit(fixed_url).netloc, \
+                               self.host_fetches)
         try:
-            opener  = urllib.request.urlopen(request, timeout = 400)
-            response = opener.info()
-            webpage  = opener.read()
+            with slots:
+                opener  = urllib.request.urlopen(request, timeout = 400)
+                response = opener.info()
+                webpage  = opener.read()
             
             webresponse.set_webpage(webpage)
             webresponse.set_srvresponse(response)
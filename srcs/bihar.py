@@ -3,6 +3,7 @@ import os
 import datetime
 
 from ..utils import utils
+from ..utils import tables
 from .central import CentralWeekly
 
 class Bihar(CentralWeekly):
@@ -13,6 +14,11 @@ class Bihar(CentralWeekly):
         self.search_endp = 'SearchGazette.aspx'
         self.result_table = 'ctl00_ContentPlaceHolder1_DetailView'
         self.start_date   = datetime.datetime(2008, 9, 24)
+        self.max_window   = 1
+        self.header_map   = tables.HeaderMap([\
+            ('Gazette\s+Number', 'download'), \
+            ('^\s*Type\s*$',     'gztype'),   \
+        ])
 
     def get_post_data(self, tags, dateobj):
         datestr  = utils.dateobj_to_str(dateobj, '/')
@@ -57,18 +63,6 @@ class Bihar(CentralWeekly):
 
         return postdata
 
-    def get_column_order(self, tr):
-        order = []
-        for td in tr.find_all('th'):
-            txt = utils.get_tag_contents(td)
-            if txt and re.search('Gazette\s+Number', txt):
-                order.append('download')
-            elif txt and re.match('\s*Type\s*$', txt):
-                order.append('gztype')
-            else:    
-                order.append('')
-        return order
-
     def find_next_page(self, tr, curr_page):
         for tr in tr.find_all('tr'):
             if tr.find('tr') != None:
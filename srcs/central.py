@@ -1,9 +1,12 @@
 from http.cookiejar import CookieJar
 import urllib.request, urllib.parse, urllib.error
+import datetime
 import re
 import os
 
 from ..utils import utils
+from ..utils import tables
+from ..utils import dateparse
 from .basegazette import BaseGazette
 
 class CentralWeekly(BaseGazette):
@@ -15,6 +18,32 @@ class CentralWeekly(BaseGazette):
         self.parser      = 'lxml'
         self.search_endp = 'SearchCategory.aspx'
         self.result_table= 'gvGazette'
+        self.header_map  = tables.HeaderMap([\
+            ('Ministry',                 'ministry'),   \
+            ('Subject',                  'subject'),    \
+            ('Download',                 'download'),   \
+            ('Department',               'department'), \
+            ('Office',                   'office'),     \
+            ('(Gazette\s+ID)|(UGID)',    'gazetteid'),  \
+            ('Issue\s+Date',             'issuedate'),  \
+        ])
+
+        # sync searches windows of up to max_window days at a time. A
+        # window is halved when its results run past window_pages pages
+        # and doubled when they fit in one. todate_fields are the form
+        # fields that take the last day of the window
+        self.max_window    = 7
+        self.window_pages  = 4
+        self.todate_fields = ['txtDateIssueT']
+        self.window_todate = None
+
+        # the form of the last results page sends the next search on the
+        # same session, a new session is started only when it is rejected
+        self.reuse_session  = True
+        self.search_session = None
+        # text of a search that found nothing, it has no result table
+        self.noresults_re   = re.compile(rb'No\s+(Records?|Data|Gazettes?)\s+(Found|Available)', \
+                                         re.IGNORECASE)
 
     def find_search_form(self, d):
         search_form = None
@@ -25,6 +54,11 @@ class CentralWeekly(BaseGazette):
                 search_form = form
                 break
 
+        if search_form == None and not forms and d.parse_only != None:
+            # a page parsed with get_page_regions has only the form fields
+            # left, so the whole document stands in for the form
+            search_form = d
+
         return search_form
 
     def get_post_data(self, tags, dateobj):
@@ -65,21 +99,34 @@ class CentralWeekly(BaseGazette):
 
         return postdata
 
-    def get_search_form(self, webpage, dateobj):
-        if webpage == None:
-            self.logger.warn('Unable to download the starting search page for day: %s', dateobj)
-            return None 
+    def parse_search_page(self, response, dateobj):
+        # the parsed page is kept on the response so that the result
+        # rows, the pager and the form fields all come from one parse
+        if response == None or response.webpage == None:
+            self.logger.warn('Unable to download the search page for day: %s', dateobj)
+            return None
 
-        d = utils.parse_webpage(webpage, self.parser)
+        if response.dom == None:
+            response.dom = utils.parse_webpage(response.webpage, self.parser, \
+                                               self.get_page_regions())
+            if response.dom == None:
+                self.logger.warn('Unable to parse the search page for day: %s', dateobj)
+        return response.dom
+
+    def get_page_regions(self):
+        # only the form fields and the result table are read from a page
+        return [('input', None), ('select', None), \
+                ('table', {'id': self.result_table})]
+
+    def get_search_form(self, d, dateobj):
         if d == None:
-            self.logger.warn('Unable to parse the search page for day: %s', dateobj)
             return None
 
         search_form = self.find_search_form(d)
         return search_form
 
-    def get_form_data(self, webpage, dateobj):
-        search_form = self.get_search_form(webpage, dateobj)
+    def get_form_data(self, d, dateobj):
+        search_form = self.get_search_form(d, dateobj)
         if search_form == None:
             self.logger.warn('Unable to get the search form for day: %s', dateobj)
             return None 
@@ -88,69 +135,50 @@ class CentralWeekly(BaseGazette):
         inputs = search_form.find_all(reobj)
         postdata = self.get_post_data(inputs, dateobj)
 
+        if self.window_todate != None:
+            todata   = dict(self.get_post_data(inputs, self.window_todate))
+            postdata = [(k, todata[k]) if k in self.todate_fields else (k, v) \
+                        for k, v in postdata]
+
         return postdata
 
     def get_search_results(self, search_url, dateobj, cookiejar):
         referer_url = urllib.parse.urljoin(search_url, 'SearchMenu.aspx')
         response = self.download_url(search_url, savecookies = cookiejar, loadcookies=cookiejar, referer = referer_url)
 
-        postdata = self.get_form_data(response.webpage, dateobj)
+        d = self.parse_search_page(response, dateobj)
+        postdata = self.get_form_data(d, dateobj)
         if postdata == None:
             return None
 
         response = self.download_url(search_url, savecookies = cookiejar, \
                                      referer = search_url, \
                                    loadcookies = cookiejar, postdata = postdata)
-        postdata = self.get_form_data(response.webpage, dateobj)
+        d = self.parse_search_page(response, dateobj)
+        postdata = self.get_form_data(d, dateobj)
+        if postdata == None:
+            return None
         response = self.download_url(search_url, savecookies = cookiejar, \
                                      referer = search_url, \
                                   loadcookies = cookiejar, postdata = postdata)
 
         return response
 
-    def get_column_order(self, tr):
-        order = []
-        for td in tr.find_all('th'):
-            txt = utils.get_tag_contents(td)
-            if txt and re.search('Ministry', txt):
-                order.append('ministry')
-            elif txt and re.search('Subject', txt):
-                order.append('subject')
-            elif txt and re.search('Download', txt):
-                order.append('download')
-            elif txt and re.search('Department', txt):
-                order.append('department')
-            elif txt and re.search('Office', txt):
-                order.append('office')
-            elif txt and re.search('(Gazette\s+ID)|(UGID)', txt):
-                order.append('gazetteid')
-            elif txt and re.search('Issue\s+Date', txt):
-                order.append('issuedate')
-            else:
-                order.append('')
-        return order
-
-    def parse_search_results(self, webpage, dateobj, curr_page):
+    def parse_search_results(self, d, dateobj, curr_page):
         metainfos = []
         nextpage  = None
 
-        d = utils.parse_webpage(webpage, self.parser)
         if not d:
             self.logger.warn('Unable to parse search result page for %s', dateobj)
             return metainfos, nextpage
 
-        tables = d.find_all('table', {'id': self.result_table})
+        result_tables = d.find_all('table', {'id': self.result_table})
 
-        if len(tables) != 1:
+        if len(result_tables) != 1:
             self.logger.warn('Could not find the result table for %s', dateobj)
             return metainfos, nextpage
         
-        order = None
-        for tr in tables[0].find_all('tr'):
-            if not order:
-                order = self.get_column_order(tr)
-                continue
-
+        for tr, order in self.header_map.get_rows(result_tables[0]):
             if nextpage == None:
                 nextpage = self.find_next_page(tr, curr_page)
                 if nextpage != None:
@@ -243,6 +271,15 @@ class CentralWeekly(BaseGazette):
                                             
                 elif col in ['office', 'department', 'gazetteid']:
                     metainfo[col] = txt
+                elif col == 'issuedate' and dateobj == None and txt:
+                    # rows of a multi-day window carry their own date
+                    try:
+                        issuedate = dateparse.to_dateobj(txt)
+                    except ValueError:
+                        issuedate = None
+                    if issuedate == None:
+                        issuedate = dateparse.dmy_to_date(txt)
+                    metainfo.set_date(issuedate)
             i += 1
 
 
@@ -267,35 +304,171 @@ class CentralWeekly(BaseGazette):
             return relurl 
         return None     
 
+    def sync(self, fromdate, todate, event):
+        if self.max_window <= 1 or not self.todate_fields:
+            return BaseGazette.sync(self, fromdate, todate, event)
+
+        newdownloads = []
+        window = self.max_window
+        while fromdate <= todate:
+            if event.is_set():
+                self.logger.warn('Exiting prematurely as timer event is set')
+                break
+
+            dateobj  = fromdate.date()
+            lastdate = dateobj + datetime.timedelta(days = window - 1)
+            if lastdate > todate.date():
+                lastdate = todate.date()
+
+            self.logger.info('Dates:  %s to %s', dateobj, lastdate)
+            # a one day window is searched as a single day, so it needs the
+            # relpath of that day
+            relpath = self.name
+            if dateobj == lastdate:
+                relpath = os.path.join(self.name, dateobj.__str__())
+
+            dls, numpages = self.download_dates(relpath, dateobj, lastdate)
+            if dls == None:
+                self.logger.warn('No issue dates in the results for %s to %s. Searching a day at a time', dateobj, lastdate)
+                newdownloads.extend(BaseGazette.sync(self, fromdate, todate, event))
+                break
+
+            self.logger.info('Got %d gazettes between  %s and %s' % (len(dls), dateobj, lastdate))
+            newdownloads.extend(dls)
+
+            if numpages > self.window_pages:
+                window = max(1, window // 2)
+            elif numpages <= 1:
+                window = min(self.max_window, window * 2)
+
+            fromdate = datetime.datetime.combine(lastdate + datetime.timedelta(days = 1), \
+                                                 datetime.time())
+
+        return newdownloads
+
     def download_oneday(self, relpath, dateobj):
+        dls, numpages = self.download_dates(relpath, dateobj, dateobj)
+        return dls
+
+    def download_dates(self, relpath, fromdate, todate):
+        # searches fromdate to todate with one query. For a single day the
+        # gazettes go under relpath, for a longer window each one goes under
+        # the relpath of its issue date. Returns the saved relurls, None if
+        # the rows do not say their date, and the number of result pages
         dls = []
+        pagenum = 1
+
+        window = (fromdate != todate)
+        if window:
+            self.window_todate = todate
+            dateobj = None
+        else:
+            dateobj = fromdate
+
+        try:
+            response, search_url, cookiejar = self.start_search(fromdate)
+
+            while response != None and response.webpage != None:
+                d = self.parse_search_page(response, fromdate)
+                if d == None:
+                    break
+
+                metainfos, nextpage = self.parse_search_results(d, dateobj, pagenum)
+
+                postdata = self.get_form_data(d, fromdate)
+                if postdata == None:
+                    break
+
+                if self.reuse_session:
+                    self.search_session = (cookiejar, search_url, d)
+
+                if window:
+                    byday = self.group_by_date(metainfos)
+                    if None in byday:
+                        return None, pagenum
+
+                    for day in sorted(byday.keys()):
+                        dayrel  = os.path.join(relpath, day.__str__())
+                        relurls = self.download_metainfos(dayrel, byday[day], \
+                                          search_url, postdata, cookiejar)
+                        dls.extend(relurls)
+                else:
+                    relurls = self.download_metainfos(relpath, metainfos, search_url, \
+                                                      postdata, cookiejar)
+                    dls.extend(relurls)
+
+                if nextpage:
+                    pagenum += 1
+                    self.logger.info('Going to page %d for dates %s to %s', pagenum, fromdate, todate)
+                    response = self.download_nextpage(nextpage, search_url, postdata, cookiejar)
+                else:
+                    break
+        finally:
+            self.window_todate = None
+ 
+        return dls, pagenum
+
+    def start_search(self, dateobj):
+        cookiejar = None
+        if self.reuse_session and self.search_session != None:
+            cookiejar, search_url, d = self.search_session
+            self.search_session = None
+
+            response = self.resubmit_search(search_url, d, dateobj, cookiejar)
+            if self.is_search_page(response, search_url, dateobj):
+                return response, search_url, cookiejar
+            self.logger.warn('Search session rejected for %s. Starting a new session', dateobj)
+
         cookiejar  = CookieJar()
         response = self.download_url(self.baseurl, savecookies = cookiejar, loadcookies = cookiejar)
         if not response:
             self.logger.warn('Could not fetch %s for the day %s', self.baseurl, dateobj)
-            return dls
+            return None, None, cookiejar
         curr_url = response.response_url
         search_url = urllib.parse.urljoin(curr_url, self.search_endp)
         response = self.get_search_results(search_url, dateobj, cookiejar)
+        return response, search_url, cookiejar
 
-        pagenum = 1
-        while response != None and response.webpage != None:
-            metainfos, nextpage = self.parse_search_results(response.webpage, \
-                                                            dateobj, pagenum)
-
-            postdata = self.get_form_data(response.webpage, dateobj)
-
-            relurls = self.download_metainfos(relpath, metainfos, search_url, \
-                                              postdata, cookiejar)
-            dls.extend(relurls)
-            if nextpage:
-                pagenum += 1
-                self.logger.info('Going to page %d for date %s', pagenum, dateobj)
-                response = self.download_nextpage(nextpage, search_url, postdata, cookiejar)
-            else:
-                break
- 
-        return dls
+    def resubmit_search(self, search_url, d, dateobj, cookiejar):
+        postdata = self.get_form_data(d, dateobj)
+        if postdata == None:
+            return None
+
+        response = self.download_url(search_url, savecookies = cookiejar, \
+                                     referer = search_url, \
+                                     loadcookies = cookiejar, postdata = postdata)
+        return response
+
+    def is_search_page(self, response, search_url, dateobj):
+        # an expired session or a failed viewstate validation ends up on an
+        # error page or a redirect instead of the search form
+        if response == None or response.webpage == None:
+            return False
+
+        if response.response_url and \
+                urllib.parse.urlparse(response.response_url).path != \
+                urllib.parse.urlparse(search_url).path:
+            return False
+
+        d = self.parse_search_page(response, dateobj)
+        if d == None or d.find('input', {'name': '__VIEWSTATE'}) == None:
+            return False
+
+        # a bare search form or an intermediate postback has the same url
+        # and form state, only a result table or a no results message shows
+        # that the search was answered
+        if d.find('table', {'id': self.result_table}) != None:
+            return True
+        return self.noresults_re.search(response.webpage) != None
+
+    def group_by_date(self, metainfos):
+        byday = {}
+        for metainfo in metainfos:
+            dateobj = metainfo.get_date()
+            if dateobj not in byday:
+                byday[dateobj] = []
+            byday[dateobj].append(metainfo)
+        return byday
 
     def download_metainfos(self, relpath, metainfos, search_url, \
                            postdata, cookiejar):
@@ -6,8 +6,11 @@ import http.client
 import datetime
 
 from ..utils  import utils
+from ..utils  import tables
 from .central import CentralWeekly 
 
+GZNUM_HEADER = '\u0930\u093e\u091c\u092a\u0924\u094d\u0930\s*\u0915\u094d\u0930\u092e\u093e\u0902\u0915'
+
 class ChattisgarhWeekly(CentralWeekly):
     def __init__(self, name, storage):
         CentralWeekly.__init__(self, name, storage)
@@ -17,11 +20,15 @@ class ChattisgarhWeekly(CentralWeekly):
         self.file_url     = 'http://egazette.cg.nic.in/FileCS1.ashx?Id=%s'
         self.result_table = 'ContentPlaceHolder2_GridView2'
         self.gztype       = '1'
-        self.gznum_re     = re.compile('\u0930\u093e\u091c\u092a\u0924\u094d\u0930\s*\u0915\u094d\u0930\u092e\u093e\u0902\u0915')
-        self.partnum_re   = re.compile('\s*\u092d\u093e\u0917\s+(?P<num>.+)')
+        self.header_map   = tables.HeaderMap([\
+            (GZNUM_HEADER, 'gznum'), \
+            ('^\s*\u092d\u093e\u0917\s+(?P<num>.+)', \
+             lambda reobj: 'partnum|%s' % reobj.group('num')), \
+        ])
         self.filenum_cookie = 'id'
         self.start_date   = datetime.datetime(2000, 11, 1)
         self.gazette_type = 'Ordinary'
+        self.max_window   = 1
         
     def get_post_data(self, tags, dateobj):
         datestr  = utils.dateobj_to_str(dateobj, '/')
@@ -60,20 +67,6 @@ class ChattisgarhWeekly(CentralWeekly):
 
         return postdata
 
-    def get_column_order(self, tr):
-        order = []
-        for th in tr.find_all('th'):
-            txt = utils.get_tag_contents(th)
-            if txt and self.gznum_re.search(txt):
-                order.append('gznum')
-            elif txt and self.partnum_re.match(txt):
-                reobj = self.partnum_re.match(txt)
-                partnum = reobj.groupdict()['num']
-                order.append('partnum|%s' % partnum)
-            else:
-                order.append('')    
-        return order
-
     def process_result_row(self, tr, metainfos, dateobj, order):
         gznum = None
         i     = 0
@@ -105,7 +98,8 @@ class ChattisgarhWeekly(CentralWeekly):
     def get_search_results(self, search_url, dateobj, cookiejar):
         response = self.download_url(search_url, savecookies = cookiejar, loadcookies=cookiejar)
 
-        postdata = self.get_form_data(response.webpage, dateobj)
+        d = self.parse_search_page(response, dateobj)
+        postdata = self.get_form_data(d, dateobj)
         if postdata == None:
             return None
         response = self.download_url(search_url, savecookies = cookiejar, \
@@ -116,13 +110,15 @@ class ChattisgarhWeekly(CentralWeekly):
         dls = []
         cookiejar  = CookieJar()
         response = self.get_search_results(self.baseurl, dateobj, cookiejar)
-        if response == None or response.webpage == None:
+        d = self.parse_search_page(response, dateobj)
+        if d == None:
             return dls
 
-        metainfos, nextpage = self.parse_search_results(response.webpage, \
-                                                        dateobj, 1)
+        metainfos, nextpage = self.parse_search_results(d, dateobj, 1)
 
-        postdata = self.get_form_data(response.webpage, dateobj)
+        postdata = self.get_form_data(d, dateobj)
+        if postdata == None:
+            return dls
         return self.download_metainfos(relpath, metainfos, self.baseurl, \
                                        postdata, cookiejar)
 
@@ -200,11 +196,14 @@ class ChattisgarhExtraordinary(ChattisgarhWeekly):
         self.file_url       = 'http://egazette.cg.nic.in/FileCS.ashx?Id=%s'
         self.gazette_type   = 'Extraordinary'
 
-        self.notification_num_re=re.compile('\u0905\u0927\u093f\u0938\u0942\u091a\u0928\u093e\s+\u0915\u094d\u0930\u092e\u093e\u0902\u0915')
-        self.notification_date_re = re.compile('\u0905\u0927\u093f\u0938\u0942\u091a\u0928\u093e\s+\u0926\u093f\u0928\u093e\u0902\u0915')
-        self.subject_re = re.compile('\u0935\u093f\u0937\u092f')
-        self.dept_re = re.compile('\u0935\u093f\u092d\u093e\u0917')
-        self.download_re = re.compile('\u0921\u093e\u0909\u0928\u0932\u094b\u0921')
+        self.header_map     = tables.HeaderMap([\
+            (GZNUM_HEADER, 'gznum'), \
+            ('^\u0935\u093f\u0937\u092f', 'subject'), \
+            ('^\u0935\u093f\u092d\u093e\u0917', 'department'), \
+            ('^\u0905\u0927\u093f\u0938\u0942\u091a\u0928\u093e\s+\u0915\u094d\u0930\u092e\u093e\u0902\u0915', 'notification_num'), \
+            ('^\u0905\u0927\u093f\u0938\u0942\u091a\u0928\u093e\s+\u0926\u093f\u0928\u093e\u0902\u0915', 'notification_date'), \
+            ('^\u0921\u093e\u0909\u0928\u0932\u094b\u0921', 'download'), \
+        ])
     def get_relurl(self, relpath, metainfo):
         if 'gznum' not in metainfo:
             return None
@@ -212,27 +211,6 @@ class ChattisgarhExtraordinary(ChattisgarhWeekly):
         relurl = os.path.join(relpath, num)
         return relurl
 
-    def get_column_order(self, tr):
-        order = []
-        for th in tr.find_all('th'):
-            txt = utils.get_tag_contents(th)
-            if txt and self.gznum_re.search(txt):
-                order.append('gznum')
-
-            elif txt and self.subject_re.match(txt):
-                order.append('subject')
-            elif txt and self.dept_re.match(txt):
-                order.append('department')
-            elif txt and self.notification_num_re.match(txt):
-                order.append('notification_num')
-            elif txt and self.notification_date_re.match(txt):
-                order.append('notification_date')
-            elif txt and self.download_re.match(txt):
-                order.append('download')
-            else:
-                order.append('')    
-        return order
-
     def process_result_row(self, tr, metainfos, dateobj, order):
         metainfo = utils.MetaInfo()
         metainfo.set_gztype(self.gazette_type)
@@ -73,7 +73,8 @@ class CSLWeekly(CentralWeekly):
     def get_search_results(self, search_url, dateobj, cookiejar):
         response = self.download_url(search_url, savecookies = cookiejar, loadcookies=cookiejar)
 
-        postdata = self.get_form_data(response.webpage, dateobj)
+        d = self.parse_search_page(response, dateobj)
+        postdata = self.get_form_data(d, dateobj)
         if postdata == None:
             return None
 
@@ -82,19 +83,22 @@ class CSLWeekly(CentralWeekly):
                                      referer = search_url, \
                                    loadcookies = cookiejar, postdata = postdata)
 
-        postdata = self.get_form_data(response.webpage, dateobj)
+        d = self.parse_search_page(response, dateobj)
+        postdata = self.get_form_data(d, dateobj)
         postdata = self.get_part_postdata(postdata)
 
         response = self.download_url(search_url, savecookies = cookiejar, \
                                      referer = search_url, \
                                   loadcookies = cookiejar, postdata = postdata)
 
-        postdata = self.get_form_data(response.webpage, dateobj)
+        d = self.parse_search_page(response, dateobj)
+        postdata = self.get_form_data(d, dateobj)
         response = self.download_url(search_url, savecookies = cookiejar, \
                                      referer = search_url, \
                                   loadcookies = cookiejar, postdata = postdata)
 
-        postdata = self.get_form_data(response.webpage, dateobj)
+        d = self.parse_search_page(response, dateobj)
+        postdata = self.get_form_data(d, dateobj)
         response = self.download_url(search_url, savecookies = cookiejar, \
                                      referer = search_url, \
                                   loadcookies = cookiejar, postdata = postdata)
@@ -138,12 +142,17 @@ class CSLWeekly(CentralWeekly):
 
         pagenum = 1
         while response != None and response.webpage != None:
-            metainfos, nextpage = self.parse_search_results(response.webpage, \
-                                                            fromdate, pagenum)
+            d = self.parse_search_page(response, fromdate)
+            if d == None:
+                break
+
+            metainfos, nextpage = self.parse_search_results(d, fromdate, pagenum)
 
             metainfos = self.filter_by_date(metainfos, fromdate, todate)
 
-            postdata = self.get_form_data(response.webpage, fromdate)
+            postdata = self.get_form_data(d, fromdate)
+            if postdata == None:
+                break
 
             relurls = self.download_metainfos(relpath, metainfos, search_url, \
                                               postdata, cookiejar)
@@ -17,7 +17,8 @@ class DelhiWeekly(CentralWeekly):
         response = self.download_url(search_url, savecookies = cookiejar, \
                                   loadcookies=cookiejar, referer = referer_url)
 
-        postdata = self.get_form_data(response.webpage, dateobj)
+        d = self.parse_search_page(response, dateobj)
+        postdata = self.get_form_data(d, dateobj)
         if postdata == None:
             return None
 
@@ -34,7 +35,8 @@ class DelhiWeekly(CentralWeekly):
                                    referer = search_url, \
                                    loadcookies = cookiejar, postdata = newdata)
 
-        postdata = self.get_form_data(response.webpage, dateobj)
+        d = self.parse_search_page(response, dateobj)
+        postdata = self.get_form_data(d, dateobj)
         if postdata == None:
             return None
         response = self.download_url(search_url, savecookies = cookiejar, \
@@ -5,6 +5,7 @@ import datetime
 
 from .basegazette import BaseGazette
 from ..utils import utils
+from ..utils import tables
 
 class Goa(BaseGazette):
     def __init__(self, name, storage):
@@ -12,6 +13,13 @@ class Goa(BaseGazette):
         self.hostname = 'goaprintingpress.gov.in'
         self.searchurl = 'http://goaprintingpress.gov.in/search-by-date/?task=search_by_date&Itemid=177&type=ALL&series=ALL&sdate=%s&edate=%s&action=search'
         self.start_date = datetime.datetime(1908, 1, 1)
+        self.header_map = tables.HeaderMap([\
+            ('Gazette\s+No', 'gznum'),    \
+            ('Series',       'series'),   \
+            ('Type',         'gztype'),   \
+            ('^\s*No',       'num'),      \
+            ('Download',     'download'), \
+        ], cell = 'td')
 
     def download_oneday(self, relpath, dateobj):
         dls = []
@@ -54,25 +62,6 @@ class Goa(BaseGazette):
             return relurl
         return None    
        
-    def get_field_order(self, tr):
-        order = []
-        for td in tr.find_all('td'):
-            txt = utils.get_tag_contents(td)
-            txt = txt.strip()
-            if re.search('Gazette\s+No', txt):
-                order.append('gznum')
-            elif re.search('Series', txt):
-                order.append('series')
-            elif re.search('Type', txt):
-                order.append('gztype')
-            elif re.match('No', txt):
-                order.append('num')
-            elif re.search('Download', txt):
-                order.append('download')
-            else:
-                order.append('')
-        return order        
-
     def parse_results(self, d, dateobj):
         minfos = []
         result_table = d.find('table', {'class': 'gazettes'})
@@ -81,12 +70,7 @@ class Goa(BaseGazette):
             self.logger.warn('Did not get the result table for %s', dateobj)
             return minfos
 
-        order = None
-        for tr in result_table.find_all('tr'):
-            if not order:
-                order = self.get_field_order(tr)
-                continue
-            
+        for tr, order in self.header_map.get_rows(result_table):
             metainfo = self.get_metainfo(order, tr, dateobj)
             if metainfo and 'download' in metainfo:
                 minfos.append(metainfo)
@@ -8,6 +8,7 @@ import datetime
 
 from .andhra import AndhraArchive
 from ..utils import utils
+from ..utils import tables
 from ..utils import decode_captcha
 
 class Haryana(AndhraArchive):
@@ -24,6 +25,17 @@ class Haryana(AndhraArchive):
         self.solve_captcha = decode_captcha.haryana_captcha
         self.search_button = 'ctl00$ContentPlaceHolder1$Button1'
         self.counter = 1
+        # the captcha solved for a session is sent again with the searches
+        # that reuse it, until the server asks for a new one
+        self.captcha_val = None
+        self.header_map   = tables.HeaderMap([\
+            ('Department',               'department'),       \
+            ('Notification\s+No',        'notification_num'), \
+            ('Notification\s+Subject',   'subject'),          \
+            ('Gazette\s+No',             'gznum'),            \
+            ('Category',                 'category'),         \
+            ('Type',                     'gztype'),           \
+        ])
 
     def get_post_data(self, tags, dateobj):
         datestr  = utils.dateobj_to_str(dateobj, '-', reverse = True)
@@ -83,46 +95,46 @@ class Haryana(AndhraArchive):
                                      loadcookies=cookiejar)
 
         while response and response.webpage: 
-            response = self.submit_captcha_form(search_url, response.webpage, \
+            d = self.parse_search_page(response, dateobj)
+            response = self.submit_captcha_form(search_url, d, \
                                                 cookiejar, dateobj)
              
             if not response or not response.webpage:
                 break
-            d = utils.parse_webpage(response.webpage, self.parser)
+            d = self.parse_search_page(response, dateobj)
             if d and not self.is_form_webpage(d):
                 break 
             else:   
                 self.logger.warn('Failed in solving captcha. Rerying.')
-                cookiejar = CookieJar()
+                cookiejar.clear()
                 response = self.download_url(search_url, savecookies = cookiejar)
                 
         return response
-    
-    def get_column_order(self, tr):
-        order = []
-        for th in tr.find_all('th'):
-            txt = utils.get_tag_contents(th)
-            if txt and re.search('Department', txt):
-                order.append('department')
-            elif txt and re.search('Notification\s+No', txt):
-                order.append('notification_num')
-            elif txt and re.search('Notification\s+Subject', txt):
-                order.append('subject')
-            elif txt and re.search('Gazette\s+No', txt):
-                order.append('gznum')
-            elif txt and re.search('Category', txt):
-                order.append('category')
-            elif txt and re.search('Type', txt):
-                order.append('gztype')
-            else:
-                order.append('')
-        return order
 
-    def download_captcha(self, search_url, webpage, cookiejar):
+    def resubmit_search(self, search_url, d, dateobj, cookiejar):
+        if self.captcha_val == None:
+            return None
+
+        postdata = self.get_form_data(d, dateobj)
+        if postdata == None:
+            return None
+
+        return self.post_captcha_form(search_url, postdata, self.captcha_val, \
+                                      cookiejar)
+
+    def is_search_page(self, response, search_url, dateobj):
+        # a rejected captcha brings back the search form without results
+        if not AndhraArchive.is_search_page(self, response, search_url, dateobj):
+            return False
+
+        d = self.parse_search_page(response, dateobj)
+        return not self.is_form_webpage(d)
+    
+    def download_captcha(self, search_url, d, cookiejar):
         return self.download_url(self.captcha_url, loadcookies=cookiejar)
              
-    def submit_captcha_form(self, search_url, webpage, cookiejar, dateobj): 
-        captcha = self.download_captcha(search_url, webpage, cookiejar)
+    def submit_captcha_form(self, search_url, d, cookiejar, dateobj): 
+        captcha = self.download_captcha(search_url, d, cookiejar)
         if captcha == None or captcha.webpage == None:
             self.logger.warn('Unable to download captcha')
             return None
@@ -132,11 +144,16 @@ class Haryana(AndhraArchive):
         #img.save('new_captchas/%d.jpeg' % self.counter)          
         captcha_val = self.solve_captcha(img)
         self.counter += 1
+        self.captcha_val = captcha_val
 
-        postdata = self.get_form_data(webpage, dateobj)
+        postdata = self.get_form_data(d, dateobj)
         if postdata == None:
             return None
 
+        return self.post_captcha_form(search_url, postdata, captcha_val, \
+                                      cookiejar)
+
+    def post_captcha_form(self, search_url, postdata, captcha_val, cookiejar):
         newpost = []
         for name, value in postdata:
             if name == self.captcha_field:
@@ -321,14 +338,20 @@ class HaryanaArchive(Haryana):
 
     def download_onecat(self, relpath, dateobj, category):
         dls = []
-        cookiejar  = CookieJar()
-        response = self.get_search_results(self.baseurl, dateobj, category, cookiejar)
+        response, cookiejar = self.start_category_search(dateobj, category)
 
         pagenum = 1
         while response != None and response.webpage != None:
-            metainfos, nextpage = self.parse_search_results(response.webpage, \
-                                                            dateobj, pagenum)
-            postdata = self.get_form_data(response.webpage, dateobj, category)
+            d = self.parse_search_page(response, dateobj)
+            if d == None:
+                break
+
+            metainfos, nextpage = self.parse_search_results(d, dateobj, pagenum)
+            postdata = self.get_form_data(d, dateobj, category)
+            if postdata == None:
+                break
+
+            self.search_session = (cookiejar, self.baseurl, d)
 
             relurls = self.download_metainfos(relpath, metainfos, self.baseurl,\
                                               postdata, cookiejar)
@@ -336,13 +359,48 @@ class HaryanaArchive(Haryana):
             if nextpage:
                 pagenum += 1
                 self.logger.info('Going to page %d for date %s', pagenum, dateobj)
-                response = self.download_nextpage(nextpage, search_url, postdata, cookiejar)
+                response = self.download_nextpage(nextpage, self.baseurl, postdata, cookiejar)
             else:
                 break
         return dls
 
-    def get_form_data(self, webpage, dateobj, category):
-        search_form = self.get_search_form(webpage, dateobj)
+    def start_category_search(self, dateobj, category):
+        # the session of the last search, with its solved captcha, is tried
+        # first for every day and category
+        if self.search_session != None:
+            cookiejar, search_url, d = self.search_session
+            self.search_session = None
+
+            response = self.resubmit_category_search(search_url, d, dateobj, \
+                                                     category, cookiejar)
+            if self.is_search_page(response, search_url, dateobj):
+                return response, cookiejar
+            self.logger.warn('Search session rejected for %s, %s. Solving the captcha again', dateobj, category['name'])
+
+        cookiejar = CookieJar()
+        response = self.get_search_results(self.baseurl, dateobj, category, cookiejar)
+        return response, cookiejar
+
+    def resubmit_category_search(self, search_url, d, dateobj, category, \
+                                 cookiejar):
+        if self.captcha_val == None:
+            return None
+
+        postdata = self.get_form_data(d, dateobj, category)
+        if postdata == None:
+            return None
+
+        newpost = []
+        for name, value in postdata:
+            if name == self.captcha_field:
+                value = self.captcha_val
+            newpost.append((name, value))
+        response = self.download_url(search_url, savecookies = cookiejar, \
+                                   loadcookies = cookiejar, postdata = newpost)
+        return response
+
+    def get_form_data(self, d, dateobj, category):
+        search_form = self.get_search_form(d, dateobj)
         if search_form == None:
             self.logger.warn('Unable to get the search form for day: %s', dateobj)
             return None
@@ -357,12 +415,13 @@ class HaryanaArchive(Haryana):
         response = self.download_url(search_url, savecookies = cookiejar, loadcookies=cookiejar)
 
         while response and response.webpage: 
-            response = self.submit_captcha_form(search_url, response.webpage, \
+            d = self.parse_search_page(response, dateobj)
+            response = self.submit_captcha_form(search_url, d, \
                                                 cookiejar, dateobj, category)
              
             if not response or not response.webpage:
                 break
-            d = utils.parse_webpage(response.webpage, self.parser)
+            d = self.parse_search_page(response, dateobj)
             if d and not self.is_form_webpage(d):
                 break 
             else:    
@@ -371,7 +430,7 @@ class HaryanaArchive(Haryana):
         return response
     
         
-    def submit_captcha_form(self, search_url, webpage, cookiejar, \
+    def submit_captcha_form(self, search_url, d, cookiejar, \
                             dateobj, category):        
         captcha  = self.download_url(self.captcha_url, loadcookies=cookiejar)
         if captcha == None or captcha.webpage == None:
@@ -381,14 +440,15 @@ class HaryanaArchive(Haryana):
         img = Image.open(io.BytesIO(captcha.webpage))
                     
         captcha_val = decode_captcha.haryana_captcha(img)
+        self.captcha_val = captcha_val
 
-        postdata = self.get_form_data(webpage, dateobj, category)
+        postdata = self.get_form_data(d, dateobj, category)
         if postdata == None:
             return None
 
         newpost = []
         for name, value in postdata:
-            if name == 'ctl00$ContentPlaceHolder1$txtcaptcha':
+            if name == self.captcha_field:
                 value = captcha_val
             newpost.append((name, value))   
         response = self.download_url(search_url, savecookies = cookiejar, \
@@ -60,8 +60,10 @@ class Himachal(Haryana):
                 postdata.append((name, value))
         return postdata
         
-    def download_captcha(self, search_url, webpage, cookiejar):
-        d = utils.parse_webpage(webpage, self.parser)
+    def get_page_regions(self):
+        return Haryana.get_page_regions(self) + [('img', None)]
+
+    def download_captcha(self, search_url, d, cookiejar):
         if d == None:
             return None
 
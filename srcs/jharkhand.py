@@ -3,6 +3,7 @@ import os
 
 from .andhra import AndhraArchive
 from ..utils import utils
+from ..utils import tables
 
 class Jharkhand(AndhraArchive):
     def __init__(self, name, storage):
@@ -12,6 +13,10 @@ class Jharkhand(AndhraArchive):
         self.search_endp  = 'SearchGazette.aspx'
 
         self.result_table = 'ctl00_ContentPlaceHolder1_DetailView'
+        self.header_map   = tables.HeaderMap([\
+            ('^\s*Type',         'gztype'), \
+            ('Gazette\s+Number', 'gznum'),  \
+        ])
 
     def get_post_data(self, tags, dateobj):
         datestr  = utils.dateobj_to_str(dateobj, '/')
@@ -52,18 +57,6 @@ class Jharkhand(AndhraArchive):
                 postdata.append((name, value))
         return postdata
 
-    def get_column_order(self, tr):
-        order = []
-        for th in tr.find_all('th'):
-            txt = utils.get_tag_contents(th)
-            if txt and re.match('\s*Type', txt):
-                order.append('gztype')
-            elif txt and re.search('Gazette\s+Number', txt):
-                order.append('gznum')
-            else:
-                order.append('')
-        return order
-
     def process_result_row(self, tr, metainfos, dateobj, order):
         tds = tr.find_all('td')
         if len(tds) != len(order):
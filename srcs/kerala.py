@@ -5,6 +5,7 @@ import urllib.request, urllib.parse, urllib.error
 
 from .basegazette import BaseGazette
 from ..utils import utils
+from ..utils import dateparse
 
 class Kerala(BaseGazette):
     def __init__(self, name, storage):
@@ -18,27 +19,7 @@ class Kerala(BaseGazette):
         self.year_href =  '/%d.php'
 
     def sync(self, fromdate, todate, event):
-        newdownloads = []
-        while fromdate <= todate:
-            if event.is_set():
-                self.logger.warn('Exiting prematurely as timer event is set')
-                break
-
-            dateobj   = fromdate.date()
-            lastdate  = datetime.datetime(fromdate.year, 12, 31)
-            if todate < lastdate:
-                lastdate = todate
-            lastdate = lastdate.date()
-
-            self.logger.info('Dates:  %s to %s', dateobj, lastdate)
-
-            dls = self.download_dates(self.name, dateobj, lastdate)
-
-            self.logger.info('Got %d gazettes between  %s and %s' % (len(dls), dateobj, lastdate))
-            newdownloads.extend(dls)
-            fromdate = datetime.datetime(fromdate.year + 1, 1, 1)
-
-        return newdownloads
+        return self.sync_by_year(fromdate, todate, event)
 
     def download_dates(self, relpath, fromdate, todate):
         year = fromdate.year
@@ -106,13 +87,16 @@ class Kerala(BaseGazette):
         return relurl
 
     def process_listing_page(self, baseurl, d, fromdate, todate):
-        minfos = []
-        for link in d.find_all('a'):
-            txt = utils.get_tag_contents(link)
+        minfos    = []
+        datepages = []
+        links = d.find_all('a')
+        txts  = [utils.get_tag_contents(link) for link in links]
+        dates = dateparse.parse_dates(dateparse.get_date_from_title, txts)
+
+        for link, txt, dateobj in zip(links, txts, dates):
             if not txt:
                 continue
 
-            dateobj = utils.get_date_from_title(txt)
             if not dateobj:
                 self.logger.warn('Unable to extract date from %s', txt)
                 continue
@@ -125,7 +109,12 @@ class Kerala(BaseGazette):
                 continue
 
             url = urllib.parse.urljoin(baseurl, href)
-            minfos.extend(self.datepage_metainfos(url, dateobj))       
+            datepages.append((url, dateobj))
+
+        # the date pages are fetched together and merged in date order
+        datepages.sort(key = lambda x: x[1])
+        for metainfos in self.fetch_concurrently(self.datepage_metainfos, datepages):
+            minfos.extend(metainfos)
         return minfos
 
     def datepage_metainfos(self, url, dateobj):
@@ -5,6 +5,7 @@ import urllib.request, urllib.parse, urllib.error
 
 from .basegazette import BaseGazette
 from ..utils import utils
+from ..utils import tables
 
 class MadhyaPradesh(BaseGazette):
     def __init__(self, name, storage):
@@ -20,52 +21,92 @@ class MadhyaPradesh(BaseGazette):
             ('Part 4', '/history-gazette-4-%d.html'), \
         }
         self.start_date = datetime.datetime(2010, 1, 1)   
+        self.header_map = tables.HeaderMap([\
+            ('\u0935\u093f\u0937\u092f',             'subject'),    \
+            ('\u0935\u093f\u092d\u093e\u0917',       'department'), \
+            ('\u0926\u093f\u0928\u093e\u0902\u0915', 'date'),       \
+            ('\u0915\u094d\u0930\.',                 'gznum'),      \
+        ], required = ['subject', 'date', 'gznum'])
+
+    def sync(self, fromdate, todate, event):
+        # the five part listings of a year are fetched once and serve all
+        # the days of the range in that year
+        return self.sync_by_year(fromdate, todate, event)
+
+    def download_dates(self, relpath, fromdate, todate):
+        dls = []
+        date_index = self.get_date_index(fromdate, todate)
+        for dateobj in sorted(date_index.keys()):
+            self.download_metainfos(date_index[dateobj], dls, \
+                                    os.path.join(relpath, dateobj.__str__()))
+        return dls
 
     def download_oneday(self, relpath, dateobj):
         dls = []
+        date_index = self.get_date_index(dateobj, dateobj)
+        if dateobj in date_index:
+            self.download_metainfos(date_index[dateobj], dls, relpath)
+        return dls
 
-        self.download_extraordinary(dls, relpath, dateobj)
-        self.download_ordinary(dls, relpath, dateobj)
+    def get_date_index(self, fromdate, todate):
+        # fromdate and todate are in the same year. The gazettes between
+        # them are grouped by date, extraordinary ones first
+        assert fromdate.year == todate.year
 
-        return dls
+        date_index = {}
+
+        minfos = self.get_extraordinary(fromdate, todate)
+        minfos.extend(self.get_ordinary(fromdate, todate))
+
+        for metainfo in minfos:
+            dateobj = metainfo.get_date()
+            if dateobj not in date_index:
+                date_index[dateobj] = []
+            date_index[dateobj].append(metainfo)
+        return date_index
     
-    def download_ordinary(self, dls, relpath, dateobj):
+    def get_ordinary(self, fromdate, todate):
+        minfos = []
+        year   = fromdate.year
         for partnum, parturl in self.ordinary_urls:    
-            parturl = urllib.parse.urljoin(self.baseurl, parturl % dateobj.year)
+            parturl = urllib.parse.urljoin(self.baseurl, parturl % year)
             response = self.download_url(parturl)
             if not response or not response.webpage:
-                self.logger.warn('Unable to download Ordinary gazette list for Part %s, year %d', partnum, dateobj.year)
+                self.logger.warn('Unable to download Ordinary gazette list for Part %s, year %d', partnum, year)
                 continue
 
             d = utils.parse_webpage(response.webpage, self.parser)
             if not d:    
-                self.logger.warn('Unable to parse Ordinary gazette list for Part %s, year %d', partnum, dateobj.year)
+                self.logger.warn('Unable to parse Ordinary gazette list for Part %s, year %d', partnum, year)
                 continue
             
-            minfos = self.parse_listing_webpage(parturl, d, dateobj, partnum, 'Ordinary')
-            self.download_metainfos(minfos, dls, relpath)
+            minfos.extend(self.parse_listing_webpage(parturl, d, fromdate, \
+                                                     todate, partnum, 'Ordinary'))
+        return minfos
 
-    def download_extraordinary(self, dls, relpath, dateobj):
-        ex_url = urllib.parse.urljoin(self.baseurl, self.extraordinary_url % dateobj.year)
+    def get_extraordinary(self, fromdate, todate):
+        year   = fromdate.year
+        ex_url = urllib.parse.urljoin(self.baseurl, self.extraordinary_url % year)
 
         response = self.download_url(ex_url)
         if not response or not response.webpage:
-            self.logger.warn('Unable to download Extraordinary gazette for year %d', dateobj.year)
-            return
+            self.logger.warn('Unable to download Extraordinary gazette for year %d', year)
+            return []
 
         d = utils.parse_webpage(response.webpage, self.parser)
         if not d:    
-            self.logger.warn('Unable to parse Extraordinary gazette list for year %d', dateobj.year)
-            return
+            self.logger.warn('Unable to parse Extraordinary gazette list for year %d', year)
+            return []
             
-        if dateobj.year == 2010:
-            minfos = self.parse_listing_webpage(ex_url, d, dateobj, None, 'Extraordinary')
+        if year == 2010:
+            minfos = self.parse_listing_webpage(ex_url, d, fromdate, todate, \
+                                                None, 'Extraordinary')
         else:    
-            minfos = self.parse_extraordinary_webpage(d, dateobj, ex_url)
+            minfos = self.parse_extraordinary_webpage(d, fromdate, todate, ex_url)
 
-        self.download_metainfos(minfos, dls, relpath)
+        return minfos
 
-    def parse_listing_webpage(self, parturl, d, dateobj, partnum, gztype):
+    def parse_listing_webpage(self, parturl, d, fromdate, todate, partnum, gztype):
         minfos = []
         for li in d.find_all('li'):
             link = li.find('a')
@@ -92,12 +133,12 @@ class MadhyaPradesh(BaseGazette):
                     self.logger.warn('Could not get date. Ignoring %s', txt)
                     continue
                 
-                if date != dateobj:
+                if date < fromdate or date > todate:
                     continue
                                 
                 metainfo = utils.MetaInfo()
                 metainfo.set_gztype(gztype)
-                metainfo.set_date(dateobj)
+                metainfo.set_date(date)
                 metainfo.set_url(url)
                 metainfo['gznum']   = gznum
                 if partnum:
@@ -108,10 +149,8 @@ class MadhyaPradesh(BaseGazette):
         return minfos
 
     def find_result_table(self, d):        
-        tables = d.find_all('table')
-        
         tablelist = []
-        for table in tables:
+        for table in d.find_all('table'):
             if table.find('table') == None:
                 tablelist.append((table, len(table.find_all('tr'))))
 
@@ -121,25 +160,20 @@ class MadhyaPradesh(BaseGazette):
 
         return tablelist[0][0]
             
-    def parse_extraordinary_webpage(self, d, dateobj, ex_url):
+    def parse_extraordinary_webpage(self, d, fromdate, todate, ex_url):
         minfos = []
 
         result_table = self.find_result_table(d)
         if result_table == None:
-            self.loger.warn('Could not find result table for date %s', dateobj)
+            self.logger.warn('Could not find result table for year %d', fromdate.year)
             return minfos
 
-        order = None
-        for tr in result_table.find_all('tr'):
-            if not order:
-                order = self.find_result_order(tr)
-                continue
-            
+        for tr, order in self.header_map.get_rows(result_table):
             link = tr.find('a')
             if link == None:
                 continue
 
-            metainfo = self.process_row(tr, order, dateobj)
+            metainfo = self.process_row(tr, order, fromdate, todate)
             if metainfo:
                 href = link.get('href')
                 if href:
@@ -149,27 +183,7 @@ class MadhyaPradesh(BaseGazette):
 
         return minfos                    
     
-    def find_result_order(self, tr):
-        order = []
-        for td in tr.find_all('th'):
-            txt = utils.get_tag_contents(td)
-            if txt and re.search('\u0935\u093f\u0937\u092f', txt):
-                order.append('subject')
-            elif txt and re.search('\u0935\u093f\u092d\u093e\u0917', txt):
-                order.append('department')
-            elif txt and re.search('\u0926\u093f\u0928\u093e\u0902\u0915', txt):
-                order.append('date')
-            elif txt and re.search('\u0915\u094d\u0930\.', txt):
-                order.append('gznum')
-            else:
-                order.append('')
-
-        if 'subject' in order and 'date' in order and 'gznum' in order:
-            return order
-
-        return None     
-    
-    def process_row(self, tr, order, dateobj):    
+    def process_row(self, tr, order, fromdate, todate):    
         metainfo = utils.MetaInfo()
         i = 0
         for td in tr.find_all('td'):
@@ -193,7 +207,8 @@ class MadhyaPradesh(BaseGazette):
                     self.logger.warn('Could not parse date %s', txt)
                     
             i += 1
-        if metainfo.get_date() == dateobj:
+        dateobj = metainfo.get_date()
+        if dateobj and dateobj >= fromdate and dateobj <= todate:
             metainfo.set_gztype('Extraordinary')
             return metainfo
 
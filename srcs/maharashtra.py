@@ -4,6 +4,7 @@ import datetime
 
 from .andhra import AndhraArchive
 from ..utils import utils
+from ..utils import tables
 
 class Maharashtra(AndhraArchive):
     def __init__(self, name, storage):
@@ -13,6 +14,13 @@ class Maharashtra(AndhraArchive):
         self.search_endp  = 'GazetteSearch.aspx'
         self.result_table = 'CPH_GridView2'
         self.start_date   = datetime.datetime(2010, 1, 1)
+        self.header_map   = tables.HeaderMap([\
+            ('Division\s+Name', 'division'), \
+            ('Subject',         'subject'),  \
+            ('View\s+Gazette',  'download'), \
+            ('Section\s+Name',  'partnum'),  \
+            ('Gazette\s+Type',  'gztype'),   \
+        ])
 
     def get_post_data(self, tags, dateobj):
         datestr  = utils.dateobj_to_str(dateobj, '/')
@@ -46,24 +54,6 @@ class Maharashtra(AndhraArchive):
                 postdata.append((name, value))
         return postdata
 
-    def get_column_order(self, tr):
-        order = []
-        for th in tr.find_all('th'):
-            txt = utils.get_tag_contents(th)
-            if txt and re.search('Division\s+Name', txt):
-                order.append('division')
-            elif txt and re.search('Subject', txt):
-                order.append('subject')
-            elif txt and re.search('View\s+Gazette', txt):
-                order.append('download')
-            elif txt and re.search('Section\s+Name', txt):
-                order.append('partnum')
-            elif txt and re.search('Gazette\s+Type', txt):
-                order.append('gztype')
-            else:
-                order.append('')
-        return order
-
     def process_result_row(self, tr, metainfos, dateobj, order):
         metainfo = utils.MetaInfo()
         metainfo.set_date(dateobj)
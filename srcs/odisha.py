@@ -4,6 +4,8 @@ import urllib.request, urllib.parse, urllib.error
 import datetime
 
 from ..utils import utils
+from ..utils import tables
+from ..utils import dateparse
 from .basegazette import BaseGazette
 
 class Odisha(BaseGazette):
@@ -11,36 +13,21 @@ class Odisha(BaseGazette):
         BaseGazette.__init__(self, name, storage)
         self.baseurl = 'http://govtpress.odisha.gov.in/notdtsearch.asp'
         self.hostname = 'govtpress.odisha.gov.in'
+        self.header_map = tables.HeaderMap([\
+            ('Department',            'department'),       \
+            ('Notification\s+Number', 'notification_num'), \
+            ('Gazette\s+Number',      'gznum'),            \
+            ('Subject',               'subject'),          \
+            ('File',                  'download'),         \
+            ('Gazette\s+Date',        'gzdate'),           \
+        ], cell = 'td', required = ['department', 'download', 'subject', \
+                                    'gznum', 'notification_num'])
 
     def get_post_data(self, dateobj):
         return [('bsubmit', 'Submit'), ('select', utils.pad_zero(dateobj.day)),\
                 ('select2', utils.pad_zero(dateobj.month)), \
                 ('select3', utils.pad_zero(dateobj.year % 2000))]
 
-    def find_field_order(self, tr):
-        order  = []
-        for td in tr.find_all('td'):
-            txt = utils.get_tag_contents(td)
-            if txt and re.search('Department', txt):
-                order.append('department')
-            elif txt and re.search('Notification\s+Number', txt):
-                order.append('notification_num')
-            elif txt and re.search('Gazette\s+Number', txt):
-                order.append('gznum')
-            elif txt and re.search('Subject', txt):
-                order.append('subject')
-            elif txt and re.search('File', txt):
-                order.append('download')
-            elif txt and re.search('Gazette\s+Date', txt):
-                order.append('gzdate')
-            else:
-                order.append('')    
-        
-        for field in ['department', 'download', 'subject', 'gznum', 'notification_num']:
-            if field not in order:
-                return None
-        return order
-                
     def process_row(self, tr, order, dateobj):
         metainfo = utils.MetaInfo()
         metainfo.set_date(dateobj)
@@ -52,13 +39,11 @@ class Odisha(BaseGazette):
                 if order[i] in ['gznum', 'department', 'notification_num', 'subject']:
                     metainfo[order[i]] = txt
                 elif order[i] == 'gzdate':
-                    nums = re.findall('\d+', txt)
-                    if len(nums) == 3:
-                        try:
-                            d = datetime.date(int(nums[2]), int(nums[1]), int(nums[0]))
-                            metainfo['gzdate'] = d
-                        except:
-                            self.logger.warn('Unable to form date for %s', txt)        
+                    d = dateparse.dmy_to_date(txt)
+                    if d:
+                        metainfo['gzdate'] = d
+                    else:
+                        self.logger.warn('Unable to form date for %s', txt)        
                 elif order[i] == 'download':
                     link = td.find('a')
                     if link and link.get('href'):
@@ -77,26 +62,18 @@ class Odisha(BaseGazette):
             self.logger.warn('Unable to get result page for date %s', dateobj)
             return dls
 
-        d = utils.parse_webpage(response.webpage, self.parser)
+        d = utils.parse_webpage(response.webpage, self.parser, [('table', None)])
         if not d:     
             self.logger.warn('Unable to parse result page for date %s', dateobj)
             return dls
 
-        result_table = None
-            
-        for table in d.find_all('table'):
-            for tr in table.find_all('tr'):
-                order = self.find_field_order(tr)
-                if order:
-                    result_table = table
-                    break
-                 
+        result_table = self.header_map.find_table(d.find_all('table'))
         if result_table == None:
             self.logger.warn('Unable to find the result table for %s', dateobj)
             return dls
 
         minfos = []
-        for tr in result_table.find_all('tr'):
+        for tr, order in self.header_map.get_rows(result_table):
             if tr.find('a') == None:
                 continue
             metainfo = self.process_row(tr, order, dateobj)
@@ -5,6 +5,7 @@ import datetime
 
 from .basegazette import BaseGazette
 from ..utils import utils
+from ..utils import tables
 
 class Punjab(BaseGazette):
     def __init__(self, name, storage):
@@ -12,6 +13,16 @@ class Punjab(BaseGazette):
         self.hostname  = 'esarkar.punjab.gov.in'
         self.searchurl = 'http://esarkar.punjab.gov.in/web/guest/customepage?p_p_id=guestPortlet&p_p_lifecycle=1&p_p_state=normal&p_p_mode=view&p_p_col_id=column-1&p_p_col_count=1&requestType=ApplicationRH&actionVal=searchRecord&queryType=Select&screenId=400176'
         self.start_date   = datetime.datetime(2007, 1, 1)
+        self.header_map   = tables.HeaderMap([\
+            ('Department',          'department'),        \
+            ('Notification\s+No',   'notification_num'),  \
+            ('Subject',             'subject'),           \
+            ('Notification\s+For',  'notification_type'), \
+            ('Gazette\s+No',        'gznum'),             \
+            ('Type',                'gztype'),            \
+            ('Category',            'category'),          \
+            ('Detail',              'download'),          \
+        ], cell = 'td')
        
     def get_post_data(self, dateobj):
         datestr = utils.dateobj_to_str(dateobj, '/')
@@ -58,18 +69,13 @@ class Punjab(BaseGazette):
 
     def get_metainfos(self, d, dateobj):             
         minfos = []
-        tables = d.find_all('table', {'id': 'tblData'})
-        if len(tables) == 0:
+        result_tables = d.find_all('table', {'id': 'tblData'})
+        if len(result_tables) == 0:
             self.logger.warn('Could not find the result table for %s', dateobj)
             return minfos
 
         
-        order  = None
-        for tr in tables[0].find_all('tr'):   
-            if not order:
-                order = self.get_field_order(tr)
-                continue
-
+        for tr, order in self.header_map.get_rows(result_tables[0]):
             metainfo = self.process_row(tr, order, dateobj)    
             if metainfo:
                 minfos.append(metainfo)
@@ -91,31 +97,6 @@ class Punjab(BaseGazette):
                     docids[docid] = metainfo    
         return final
 
-    def get_field_order(self, tr):
-        order = []
-        for td in tr.find_all('td'):
-            txt = utils.get_tag_contents(td)
-            if txt and re.search('Department', txt):
-                order.append('department')
-            elif txt and re.search('Notification\s+No', txt):
-                order.append('notification_num')
-            elif txt and re.search('Subject', txt):
-                order.append('subject')
-            elif txt and re.search('Notification\s+For', txt):
-                order.append('notification_type')
-            elif txt and re.search('Gazette\s+No', txt):
-                order.append('gznum')
-            elif txt and re.search('Type', txt):
-                order.append('gztype')
-            elif txt and re.search('Category', txt):
-                order.append('category')
-            elif txt and re.search('Detail', txt):
-                order.append('download')
-            else:    
-                order.append('')
-
-        return order
-    
     def get_doc_url(self, docid):
         href = '/web/guest/customepage?p_p_id=guestPortlet&p_p_lifecycle=1&p_p_state=exclusive&p_p_mode=view&p_p_col_id=column-1&p_p_col_count=1&requestType=ApplicationRH&actionVal=openAttachmentFile&queryType=Select&screenId=400176&refDocId=%s' % docid 
         return urllib.parse.urljoin(self.searchurl, href)
@@ -1,11 +1,17 @@
 import datetime
 import re
 import os
-import calendar
+import concurrent.futures
+from io import BytesIO
+
+from PIL import Image
 
 from .kerala import Kerala
 from ..utils import utils
+from ..utils import html_ops
+from ..utils import dateparse
 
+LOADFULLIMG_RE = re.compile("loadFullImg\(\s*'(?P<gzyear>\w+)'\s*,\s*'(?P<month>\w+)'\s*,\s*'(?P<day>\w+)'\s*,\s*'(?P<accno>\w+)'\s*,\s*(?P<pdf_page>\w+)\s*,\s*(?P<gzpage>\w+)\)")
 
 class StGeorge(Kerala):
     def __init__(self, name, storage):
@@ -13,10 +19,13 @@ class StGeorge(Kerala):
         self.hostname = 'statelibrary.kerala.gov.in'
         self.date_url = 'http://statelibrary.kerala.gov.in/fort_gazette/gazette.php'
         self.baseurl = 'http://statelibrary.kerala.gov.in/fort_gazette/'
-        self.parser     = 'html.parser'
+        self.parser     = html_ops.HTML_PARSER
         self.start_date   = datetime.datetime(1903, 1, 1)
         self.save_raw     = False 
         self.gzurl_format = 'sitemedia/TG%s/%s/%s_Page_%s.png' 
+        # with save_raw, store every issue as one pdf of all its pages
+        # instead of a png and a metainfo for each page
+        self.issue_pdf    = False
 
     def get_post_data(self, year):        
         postdata = [('action', 'search_Gazette'), ('department', ''), \
@@ -44,40 +53,97 @@ class StGeorge(Kerala):
     def results_page(self, relpath, webpage, year, fromdate, todate):
         dls = []
 
-        while 1:
-            minfos, nextpage = self.parse_metainfos(webpage, year, \
-                                                    fromdate, todate)
-            self.download_gazettes(relpath, minfos, dls)
+        # the results pages that the pager links to are fetched ahead, in
+        # fetch_workers threads, while the gazettes of a page are saved.
+        # The pages are still processed in order
+        pagenums = {}
+        fetches  = {'1': None}
+        issue_minfos = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers = self.fetch_workers) as executor:
+            while 1:
+                minfos, nextpage, pagelinks = self.parse_metainfos(webpage, \
+                                                  year, fromdate, todate)
+                if nextpage != None:
+                    pagelinks.insert(0, nextpage)
+
+                for link in pagelinks:
+                    onclick = link.get('onclick')
+                    if onclick in pagenums:
+                        continue
+
+                    pagenum  = None
+                    postdata = self.next_page_post(onclick, year)
+                    if postdata:
+                        pagenum = dict(postdata)['current_page']
+                        if pagenum not in fetches:
+                            fetches[pagenum] = executor.submit(self.download_url, \
+                                                   self.date_url, postdata = postdata)
+                    pagenums[onclick] = pagenum
+
+                if self.save_raw and self.issue_pdf:
+                    # an issue can be spread over many results pages
+                    issue_minfos.extend(minfos)
+                else:
+                    self.download_gazettes(relpath, minfos, dls)
+
+                if nextpage == None:
+                    break
 
-            if nextpage:
                 onclick = nextpage.get('onclick')
-                postdata = self.next_page_post(onclick, year)
-                if not postdata:
+                nextnum = pagenums[onclick]
+                if nextnum == None:
                     self.logger.warn('Unable to get postdata for next page from %s', onclick)
                     break
 
-                response = self.download_url(self.date_url, postdata = postdata)
+                future = fetches.get(nextnum)
+                if future == None:
+                    break
+                response = future.result()
+                fetches[nextnum] = None
                 if not response or not response.webpage:
                     break
                 webpage = response.webpage
-            else:
-                break        
 
-        return dls          
+            for future in fetches.values():
+                if future != None:
+                    future.cancel()
+
+        if issue_minfos:
+            self.download_issues(relpath, issue_minfos, dls)
 
+        return dls          
 
     def download_gazettes(self, relpath, minfos, dls):
+        relurls  = []
+        pageurls = {}
+        rawurls  = set()
         for metainfo in minfos:
             relurl = metainfo.pop('relurl')
+            metainfo.pop('issue_pages')
             dateobj = metainfo.get_date()
-       
-            gurl = metainfo.get_url()
             relurl = os.path.join(relpath, dateobj.__str__(), relurl)
+            relurls.append(relurl)
 
-            updated = False
-            if self.save_raw and self.storage_manager.should_download_raw(relurl, gurl):
-                response = self.download_url(gurl)
- 
+            gurl = metainfo.get_url()
+            if self.save_raw and relurl not in rawurls and \
+                    self.storage_manager.should_download_raw(relurl, gurl):
+                rawurls.add(relurl)
+                pageurls[gurl] = relurl
+
+        # the page images are fetched together, they are saved in order.
+        # Notifications on the same page share its image, so it is fetched
+        # once and saved once for each relurl
+        gurls     = list(pageurls.keys())
+        responses = dict(zip(gurls, self.fetch_concurrently(self.download_url, \
+                                                   [(gurl,) for gurl in gurls])))
+
+        for relurl, metainfo in zip(relurls, minfos):
+            updated  = False
+            response = None
+            if relurl in rawurls:
+                rawurls.remove(relurl)
+                response = responses.get(metainfo.get_url())
+            if response != None:
                 doc = response.webpage
                 if doc and self.is_valid_gazette(doc, 0):
                     if self.storage_manager.save_rawdoc(self.name, relurl, response.srvresponse, doc):
@@ -94,22 +160,92 @@ class StGeorge(Kerala):
             if updated:
                 dls.append(relurl)
 
+    def download_issues(self, relpath, minfos, dls):
+        issues = {}
+        for metainfo in minfos:
+            metainfo.pop('relurl')
+            gzyear, accno, numpages = metainfo.pop('issue_pages')
+            relurl = os.path.join(relpath, metainfo.get_date().__str__(), accno)
+            if relurl not in issues:
+                issues[relurl] = (gzyear, accno, numpages, [])
+            issues[relurl][3].append(metainfo)
+
+        for relurl, (gzyear, accno, numpages, pages) in issues.items():
+            gzurls = [self.get_page_url(gzyear, accno, page, numpages) \
+                      for page in range(1, numpages + 1)]
+
+            metainfo = utils.MetaInfo()
+            metainfo.set_date(pages[0].get_date())
+            metainfo.set_url(gzurls[0])
+            metainfo['numpages'] = '%d' % numpages
+            for k in ['issue', 'volume', 'number']:
+                if k in pages[0]:
+                    metainfo[k] = pages[0][k]
+
+            notifications = []
+            for page in pages:
+                notification = {}
+                for k, v in page.items():
+                    if k not in ['date', 'url', 'issue', 'volume', 'number']:
+                        notification[k] = v
+                notifications.append(notification)
+            metainfo['notifications'] = notifications
+
+            updated = False
+            if self.storage_manager.should_download_raw(relurl, gzurls[0]):
+                doc = self.get_issue_pdf(relurl, gzurls)
+                if doc and self.storage_manager.save_rawdoc(self.name, relurl, None, doc):
+                    updated = True
+                    self.logger.info('Saved rawfile %s' % relurl)
+
+            if self.storage_manager.save_metainfo(self.name, relurl, metainfo):
+                self.logger.info('Saved metainfo %s' % relurl)
+                updated = True
+
+            if updated:
+                dls.append(relurl)
+
+    def get_issue_pdf(self, relurl, gzurls):
+        responses = self.fetch_concurrently(self.download_url, \
+                                            [(gzurl,) for gzurl in gzurls])
+        images = []
+        for gzurl, response in zip(gzurls, responses):
+            if response == None or not response.webpage:
+                self.logger.warn('Unable to get page %s. Not saving %s', gzurl, relurl)
+                return None
+            try:
+                img = Image.open(BytesIO(response.webpage))
+                img.load()
+            except (IOError, SyntaxError) as e:
+                self.logger.warn('Unable to read page %s: %s. Not saving %s', gzurl, e, relurl)
+                return None
+
+            if img.mode not in ['1', 'L', 'RGB']:
+                img = img.convert('RGB')
+            images.append(img)
+
+        pdf = BytesIO()
+        images[0].save(pdf, 'PDF', save_all = True, append_images = images[1:])
+        return pdf.getvalue()
+
     def parse_metainfos(self, webpage, year, fromdate, todate):
         minfos = []
         nextpage = None
+        pagelinks = []
 
         d = utils.parse_webpage(webpage, self.parser)
-        if not d:
+        if d == None:
             self.logger.warn('Unable to parse results page for year %d', year)
-            return minfos
+            return minfos, nextpage, pagelinks
 
+        pagelinks = html_ops.xpath(d, '//a[contains(@onclick, "recordPagination")]')
 
-        for td in d.find_all('td'):
-            link =  td.find('a') 
+        for td in d.iter('td'):
+            link =  html_ops.find(td, 'a')
             if link == None:
                 continue
-            img = td.find('img')
-            if img:
+            img = html_ops.find(td, 'img')
+            if img != None:
                 title = img.get('title')
                 if title == 'Next' and nextpage == None:
                     nextpage = link
@@ -120,7 +256,7 @@ class StGeorge(Kerala):
                 dateobj = metainfo.get_date()
                 if dateobj and dateobj >= fromdate and dateobj <= todate:
                     minfos.append(metainfo)
-                paras = td.find_all('p')
+                paras = html_ops.find_all(td, 'p')
 
                 if len(paras) >= 2:
                     p = paras[1]
@@ -139,14 +275,14 @@ class StGeorge(Kerala):
                     if txt:
                         metainfo.set_subject(txt) 
 
-        return minfos, nextpage
+        return minfos, nextpage, pagelinks
          
     def get_metainfo(self, link, td):
         onclick = link.get('onclick')
         if onclick == None:
             return None
         
-        reobj = re.search("loadFullImg\(\s*'(?P<gzyear>\w+)'\s*,\s*'(?P<month>\w+)'\s*,\s*'(?P<day>\w+)'\s*,\s*'(?P<accno>\w+)'\s*,\s*(?P<pdf_page>\w+)\s*,\s*(?P<gzpage>\w+)\)", onclick)
+        reobj = LOADFULLIMG_RE.search(onclick)
         if not reobj:
             return None
 
@@ -158,6 +294,30 @@ class StGeorge(Kerala):
         page      = int(groupdict['pdf_page'])
         gzpage    = int(groupdict['gzpage'])
 
+        d = dateparse.abbr_to_date(gzyear, month, day)
+        if d == None:
+            self.logger.warn('Unable to get date from %s', onclick)
+            return None
+
+        gzurl = self.get_page_url(gzyear, accno, page, gzpage)
+        
+        metainfo = utils.MetaInfo()
+        metainfo.set_url(gzurl)       
+        metainfo.set_date(d)
+        metainfo['relurl'] =  '%s_Page_%s' % (accno, self.get_page_number(page, gzpage))
+        metainfo['issue_pages'] = (gzyear, accno, gzpage)
+
+        txt = utils.get_tag_contents(link)
+        self.populate_link_metainfo(txt, metainfo)
+
+        return metainfo
+
+    def get_page_url(self, gzyear, accno, page, gzpage):
+        pagenumber = self.get_page_number(page, gzpage)
+        return self.baseurl +  self.gzurl_format % (gzyear, accno, accno, pagenumber)
+
+    def get_page_number(self, page, gzpage):
+        # pages are numbered with as many digits as the page count
         pagenumber = '%d' % page
         if gzpage >= 10 and gzpage < 100:
             if page < 10:
@@ -174,22 +334,7 @@ class StGeorge(Kerala):
                 pagenumber = '00' + pagenumber
             elif page < 1000:
                 pagenumber = '0' + pagenumber
-                    
-        month_num = utils.get_month_num(month, calendar.month_abbr)             
-        d = datetime.date(int(gzyear), month_num, int(day))
-
-        gzurl = self.baseurl +  self.gzurl_format % (gzyear, accno, accno, pagenumber)
-
-        
-        metainfo = utils.MetaInfo()
-        metainfo.set_url(gzurl)       
-        metainfo.set_date(d)
-        metainfo['relurl'] =  '%s_Page_%s' % (accno, pagenumber)
-
-        txt = utils.get_tag_contents(link)
-        self.populate_link_metainfo(txt, metainfo)
-
-        return metainfo
+        return pagenumber
 
     def populate_link_metainfo(self, txt, metainfo):
         reobj = re.search('Issue\s+Number:\s*(?P<num>\d+)', txt)
@@ -224,7 +369,7 @@ class KeralaLibrary(StGeorge):
         self.hostname = 'statelibrary.kerala.gov.in'
         self.date_url = 'http://statelibrary.kerala.gov.in/gazette/gazette.php'
         self.baseurl = 'http://statelibrary.kerala.gov.in/gazette/'
-        self.parser     = 'html.parser'
+        self.parser     = html_ops.HTML_PARSER
         self.start_date   = datetime.datetime(1903, 1, 1)
         self.save_raw     = False 
         self.gzurl_format = 'sitemedia/%s/%s/%s_Page_%s.png'
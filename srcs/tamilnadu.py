@@ -5,6 +5,9 @@ import urllib.request, urllib.parse, urllib.error
 
 from .basegazette import BaseGazette
 from ..utils import utils
+from ..utils import html_ops
+from ..utils import tables
+from ..utils import dateparse
                 
 class TamilNadu(BaseGazette):
     def __init__(self, name, storage):
@@ -18,41 +21,84 @@ class TamilNadu(BaseGazette):
         self.ordinary_latest      = '/gazette/gazette_list.php'
         self.extraordinary_latest = '/extraordinary/extraord_list.php'
         self.start_date           = datetime.datetime(2008, 1, 1)
+        self.parser               = html_ops.HTML_PARSER
+
+        self.ordinary_header = tables.HeaderMap([\
+            ('Issue\s+No',   'gznum'),   \
+            ('Particulars',  'subject'), \
+        ], cell = 'td', flags = re.IGNORECASE, require_any = True)
+
+        self.listing_header = tables.HeaderMap([\
+            ('Click\s+to',   'download'), \
+            ('Content',      'subject'),  \
+        ], cell = 'td', require_any = True)
+
+        self.extraordinary_header = tables.HeaderMap([\
+            ('Issue\s+No',             'gznum'),              \
+            ('Issue\s+Date',           'date'),               \
+            ('Extraordinary\s+Part',   'partnum'),            \
+            ('Extraordinary\s+Type',   'extraordinary_type'), \
+            ('Subject',                'subject'),            \
+        ], cell = 'td', flags = re.IGNORECASE, require_any = True)
+
+    def sync(self, fromdate, todate, event):
+        # the listings are by year, so each year page and the issue
+        # listings in it are fetched once for all the days in the range
+        return self.sync_by_year(fromdate, todate, event)
+
+    def download_dates(self, relpath, fromdate, todate):
+        dls = []
+        date_index = self.get_date_index(fromdate, todate)
+        for dateobj in sorted(date_index.keys()):
+            self.process_metainfos(date_index[dateobj], dls, \
+                                   os.path.join(relpath, dateobj.__str__()))
+        return dls
 
     def download_oneday(self, relpath, dateobj):
         dls = []
+        date_index = self.get_date_index(dateobj, dateobj)
+        if dateobj in date_index:
+            self.process_metainfos(date_index[dateobj], dls, relpath)
+        return dls
+
+    def get_listing_urls(self, year):
         today = datetime.date.today()
 
         ordinary_url      = None
         extraordinary_url = None
 
-        start_date = self.start_date.date()
-        if today.year == dateobj.year:
+        if today.year == year:
             ordinary_url      = self.ordinary_latest
             extraordinary_url = self.extraordinary_latest
-        elif dateobj >= start_date:
-            ordinary_url      = self.ordinary_byyear % dateobj.year    
-            extraordinary_url = self.extraordinary_byyear % dateobj.year    
-        
-        if ordinary_url:
-            self.download_ordinary(ordinary_url, dls, relpath, dateobj)
+        elif year >= self.start_date.year:
+            ordinary_url      = self.ordinary_byyear % year
+            extraordinary_url = self.extraordinary_byyear % year
 
-        if extraordinary_url:
-            self.download_extraordinary(extraordinary_url, dls, relpath, dateobj)
-        return dls
-            
-    def download_ordinary(self, href, dls, relpath, dateobj):
-         metainfos = self.get_metainfos(href, dateobj, \
-                           self.ordinary_field_order, self.process_ordinary_row)
+        return ordinary_url, extraordinary_url
+
+    def get_date_index(self, fromdate, todate):
+        # fromdate and todate are in the same year. The gazettes between
+        # them are grouped by date, ordinary ones before extraordinary
+        assert fromdate.year == todate.year
+
+        date_index = {}
+        ordinary_url, extraordinary_url = self.get_listing_urls(fromdate.year)
 
-         self.process_metainfos(metainfos, dls, relpath)
-                   
-    def download_extraordinary(self, href, dls, relpath, dateobj):
-        metainfos = self.get_metainfos(href, dateobj, \
-                                       self.extraordinary_field_order, \
-                                       self.process_extraordinary_row)
+        metainfos = []
+        if ordinary_url:
+            metainfos.extend(self.get_metainfos(ordinary_url, fromdate, todate, \
+                                 self.ordinary_header, self.process_ordinary_row))
+        if extraordinary_url:
+            metainfos.extend(self.get_metainfos(extraordinary_url, fromdate, todate, \
+                                 self.extraordinary_header, \
+                                 self.process_extraordinary_row))
 
-        self.process_metainfos(metainfos, dls, relpath)
+        for metainfo in metainfos:
+            dateobj = metainfo.get_date()
+            if dateobj not in date_index:
+                date_index[dateobj] = []
+            date_index[dateobj].append(metainfo)
+        return date_index
 
     def process_metainfos(self, metainfos, dls, relpath):
         for metainfo in metainfos:
@@ -79,16 +125,13 @@ class TamilNadu(BaseGazette):
             return None 
 
         d = utils.parse_webpage(response.webpage, self.parser)    
-        if not d:
+        if d == None:
             self.logger.info('Unable to parse the webpage for url: %s',  url)
             return None 
 
-        tables = d.find_all('table')
-        
         tablelist = []
-        for table in tables:
-            if table.find('table') == None:
-                tablelist.append((table, len(table.find_all('tr'))))
+        for table in html_ops.xpath(d, '//table[not(.//table)]'):
+            tablelist.append((table, int(html_ops.xpath(table, 'count(.//tr)'))))
 
         tablelist.sort(key = lambda x: x[1], reverse = True)
         if not tablelist:        
@@ -96,51 +139,29 @@ class TamilNadu(BaseGazette):
 
         return tablelist[0][0]
                 
-    def get_metainfos(self, href, dateobj, get_field_order, process_row):
+    def get_metainfos(self, href, fromdate, todate, header_map, process_row):
         minfos = []
         url = urllib.parse.urljoin(self.baseurl, href)
         result_table = self.get_result_table(url)
         if result_table == None:
-            self.logger.warn('Unable to get result table for year %d', dateobj.year)
+            self.logger.warn('Unable to get result table for year %d', fromdate.year)
             return minfos
 
-        order = None
-        for tr in result_table.find_all('tr'):
-            if not order:
-                order = get_field_order(tr)
-                continue
-            process_row(minfos, tr, order, dateobj, url)
+        for tr, order in header_map.get_rows(result_table):
+            process_row(minfos, tr, order, fromdate, todate, url)
         return minfos
 
-    def ordinary_field_order(self, tr):
-        order = []
-        found = False
-        for td in tr.find_all('td'):
-            txt = utils.get_tag_contents(td)
-            if txt and re.search('Issue\s+No', txt, re.IGNORECASE):
-                order.append('gznum')
-                found = True
-            elif txt and re.search('Particulars', txt, re.IGNORECASE):
-                order.append('subject')
-                found = True
-            else:
-                order.append('')    
-        if found:
-            return order
-
-        return None
-
-    def process_ordinary_row(self, minfos, tr, order, dateobj, url):
+    def process_ordinary_row(self, minfos, tr, order, fromdate, todate, url):
         i = 0
         metainfo = utils.MetaInfo()
         
-        for td in tr.find_all('td'):
+        for td in tr.iter('td'):
             if i < len(order): 
                 if order[i] == 'subject':
-                    metainfo.set_subject([utils.get_tag_contents(li) for li in td.find_all('li')])
+                    metainfo.set_subject([utils.get_tag_contents(li) for li in td.iter('li')])
                 elif order[i] == 'gznum':
-                    link = td.find('a')
-                    if link and link.get('href'):
+                    link = html_ops.find(td, 'a')
+                    if link != None and link.get('href'):
                         href = link.get('href')
                         metainfo.set_url(urllib.parse.urljoin(url, href))
 
@@ -159,53 +180,30 @@ class TamilNadu(BaseGazette):
             
             i += 1
 
-        url   =  metainfo.get_url()
-        gznum = metainfo.get('gznum')
+        url     = metainfo.get_url()
+        gznum   = metainfo.get('gznum')
+        dateobj = metainfo.get_date()
 
-        if metainfo.get_date() == dateobj and url and gznum:
+        if dateobj and dateobj >= fromdate and dateobj <= todate and url and gznum:
             self.process_ordinary_listing(minfos, url, gznum, dateobj) 
 
-    def get_listing_order(self, tr):
-        order = [] 
-        found = False
-        for td in tr.find_all('td'): 
-            txt = utils.get_tag_contents(td)
-            if txt and re.search('Click\s+to', txt):
-                order.append('download')
-                found = True
-            elif txt and re.search('Content', txt):
-                order.append('subject')
-                found = True
-            else:
-                order.append('')
-        if not found:
-            self.logger.warn('No order for ordinary gazette listing: %s', tr)
-            return None        
-
-        return order            
-                
     def process_ordinary_listing(self, minfos, url, gznum, dateobj):
         result_table = self.get_result_table(url)
         if result_table == None:
             self.logger.warn('Unable to fetch the ordinary gazette listing %s', url)
             return
 
-        order = None
-        for tr in result_table.find_all('tr'):
-            if not order:
-                order = self.get_listing_order(tr)
-                continue    
-
+        for tr, order in self.listing_header.get_rows(result_table):
             i = 0
             metainfo = utils.MetaInfo()
             metainfo.set_gztype('Ordinary')
             metainfo['gznum'] = gznum
             metainfo.set_date(dateobj)
 
-            for td in tr.find_all('td'):
+            for td in tr.iter('td'):
                 if i < len(order):
                     if order[i] == 'subject':
-                        lis = [li.extract() for li in td.find_all('li')]
+                        lis = [html_ops.extract(li) for li in html_ops.find_all(td, 'li')]
                         notifications = [utils.get_tag_contents(li) for li in lis]
                         metainfo['notifications'] = notifications
                         txt = utils.get_tag_contents(td)
@@ -213,8 +211,8 @@ class TamilNadu(BaseGazette):
                             metainfo['subject'] = txt
 
                     elif order[i] == 'download':
-                        link = td.find('a')
-                        if link and link.get('href'):
+                        link = html_ops.find(td, 'a')
+                        if link != None and link.get('href'):
                             href = link.get('href')
                             metainfo.set_url(urllib.parse.urljoin(url, href))
                         txt = utils.get_tag_contents(td)
@@ -231,37 +229,10 @@ class TamilNadu(BaseGazette):
             if metainfo.get_url():
                 minfos.append(metainfo)
                     
-    def extraordinary_field_order(self, tr):
-        order = []
-        found = False
-        for td in tr.find_all('td'):
-            txt = utils.get_tag_contents(td)
-            if txt and re.search('Issue\s+No', txt, re.IGNORECASE):
-                order.append('gznum')
-                found = True
-            elif txt and re.search('Issue\s+Date', txt, re.IGNORECASE):
-                order.append('date')
-                found = True
-            elif txt and re.search('Extraordinary\s+Part', txt, re.IGNORECASE):
-                order.append('partnum')
-                found = True
-            elif txt and re.search('Extraordinary\s+Type', txt, re.IGNORECASE):
-                order.append('extraordinary_type')
-                found = True
-            elif txt and re.search('Subject', txt, re.IGNORECASE):
-                order.append('subject')
-                found = True
-            else:
-                order.append('')    
-        if found:
-            return order
-
-        return None
-
-    def process_extraordinary_row(self, minfos, tr, order, dateobj, url):
+    def process_extraordinary_row(self, minfos, tr, order, fromdate, todate, url):
         i = 0
         metainfo = utils.MetaInfo()
-        for td in tr.find_all('td'):
+        for td in tr.iter('td'):
             if i < len(order): 
                 txt = utils.get_tag_contents(td)
                 txt = txt.strip()
@@ -270,21 +241,19 @@ class TamilNadu(BaseGazette):
                     continue
 
                 if order[i] == 'gznum':
-                    link = td.find('a')
-                    if link and link.get('href'):
+                    link = html_ops.find(td, 'a')
+                    if link != None and link.get('href'):
                         href = link.get('href')
                         metainfo.set_url(urllib.parse.urljoin(url, href))
 
                     if txt:
                         metainfo['gznum'] = txt
                 elif order[i] == 'date':
-                    ds = re.findall('\d+', txt)
-                    if len(ds) == 3:
-                        try:
-                            d = datetime.date(int(ds[2]), int(ds[1]), int(ds[0]))
-                            metainfo.set_date(d)
-                        except:    
-                            self.logger.warn('Unable to create date from %s', txt)
+                    d = dateparse.dmy_to_date(txt)
+                    if d:
+                        metainfo.set_date(d)
+                    else:
+                        self.logger.warn('Unable to create date from %s', txt)
                 elif order[i] == 'partnum':
                     section = None
                     reobj = re.search('Part[\s-]*\w+', txt)
@@ -305,7 +274,8 @@ class TamilNadu(BaseGazette):
                     metainfo[order[i]] = txt                    
  
             i += 1
-        if metainfo.get_date() == dateobj:
+        dateobj = metainfo.get_date()
+        if dateobj and dateobj >= fromdate and dateobj <= todate:
             metainfo.set_gztype('Extraordinary')
             minfos.append(metainfo)
 
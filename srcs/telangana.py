@@ -3,6 +3,7 @@ import datetime
 
 from .andhra import Andhra
 from ..utils import utils
+from ..utils import tables
 
 class Telangana(Andhra):
     def __init__(self, name, storage):
@@ -11,36 +12,14 @@ class Telangana(Andhra):
         self.hostname     = 'tsgazette.cgg.gov.in'
         self.searchurl    = self.baseurl
         self.start_date   = datetime.datetime(2014, 1, 1)
-
-    def get_field_order(self, tr):
-        i = 0
-        order  = []
-        valid = False
-        for th in tr.find_all('th'):
-            txt = utils.get_tag_contents(th)
-            if txt and re.search('gazettetype', txt, re.IGNORECASE):
-                order.append('gztype')
-            elif txt and re.search('department', txt, re.IGNORECASE):
-                order.append('department')
-            elif txt and re.search('abstract', txt, re.IGNORECASE):
-                order.append('subject')
-            elif txt and re.search('Issue\s+No', txt, re.IGNORECASE):
-                order.append('gznum')
-            elif txt and re.search('Job\s+No', txt, re.IGNORECASE):
-                order.append('job_num')
-            elif txt and re.search('Download', txt, re.IGNORECASE):
-                order.append('download')
-                valid = True
-            elif txt and re.search('', txt, re.IGNORECASE):
-                order.append('')
-
-            else:
-                order.append('')    
-
-            i += 1
-        if valid:    
-            return order
-        return None    
+        self.header_map   = tables.HeaderMap([\
+            ('gazettetype', 'gztype'),     \
+            ('department',  'department'), \
+            ('abstract',    'subject'),    \
+            ('Issue\s+No',  'gznum'),      \
+            ('Job\s+No',    'job_num'),    \
+            ('Download',    'download'),   \
+        ], flags = re.IGNORECASE, required = ['download'])
 
     def get_post_data(self, dateobj):
         curr_date = utils.dateobj_to_str(datetime.date.today(), '/')
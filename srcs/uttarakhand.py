@@ -6,6 +6,7 @@ from http.cookiejar import CookieJar
 
 from .basegazette import BaseGazette
 from ..utils import utils
+from ..utils import tables
 
 class Uttarakhand(BaseGazette):
     def __init__(self, name, storage):
@@ -15,6 +16,11 @@ class Uttarakhand(BaseGazette):
         self.searchurl    = urllib.parse.urljoin(self.baseurl, self.search_endp)
         self.hostname     = 'gazettes.uk.gov.in'
         self.start_date   = datetime.datetime(2013, 1, 1)
+        self.header_map   = tables.HeaderMap([\
+            ('GO\s+No',          'notification_num'), \
+            ('GO\s+Description', 'subject'),          \
+            ('Issued\s+by',      'issued_by'),        \
+        ], cell = 'td', required = ['notification_num', 'subject', 'issued_by'])
 
     def find_search_form(self, d):
         search_form = None
@@ -142,44 +148,18 @@ class Uttarakhand(BaseGazette):
     def get_metainfos(self, d, dateobj):
         minfos = []
         
-        order = None
-        for table in d.find_all('table'):
-            if table.find('table'):
-                continue
+        leaf_tables  = [t for t in d.find_all('table') if t.find('table') == None]
+        result_table = self.header_map.find_table(leaf_tables)
+        if result_table == None:
+            return minfos
 
-            for tr in table.find_all('tr'):
-                if not order:
-                    order = self.get_field_order(tr)
-                    continue
-                
-                metainfo = self.process_row(tr, order, dateobj)
-                if metainfo:
-                    minfos.append(metainfo)
-                       
-            if order:
-                break
+        for tr, order in self.header_map.get_rows(result_table):
+            metainfo = self.process_row(tr, order, dateobj)
+            if metainfo:
+                minfos.append(metainfo)
 
         return minfos
      
-    def get_field_order(self, tr):
-        order = []
-        for td in tr.find_all('td'):
-            txt = utils.get_tag_contents(td)
-            if txt and re.search('GO\s+No', txt):
-                order.append('notification_num')     
-            elif txt and re.search('GO\s+Description', txt):
-                order.append('subject')     
-            elif txt and re.search('Issued\s+by', txt):
-                order.append('issued_by')     
-            else:
-                order.append('')     
-       
-        if 'notification_num' in order and 'subject' in order and \
-                'issued_by' in order:
-            return order
-
-        return None                
-    
     def process_row(self, tr, order, dateobj):
         metainfo = utils.MetaInfo()
         metainfo.set_date(dateobj)    
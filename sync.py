@@ -8,14 +8,22 @@ import re
 from egazette.utils import utils
 from egazette.utils import download
 from egazette.utils.file_storage import FileManager
+from egazette.utils.storage_backend import get_backend
 from egazette.srcs import datasrcs
 
 def print_usage(progname):
     print('''Usage: %s [-l loglevel(critical, error, warn, info, debug)]
                        [-a (all_downloads)]
+                       [-B s3://bucket/prefix (store raw docs and metatags in S3)]
+                       [-c (store identical raw documents only once)]
+                       [-g (save page images of srcs that skip them by default, e.g. stgeorge)]
+                       [-i (with -g, store each stgeorge issue as one pdf)]
                        [-m (updateMeta)]
+                       [-M (store metatags in per source/month pack files)]
                        [-n (no aggregation of srcs by hostname)]
                        [-r (updateRaw)]
+                       [-S fsync_batch (fsync saved files in groups of this size)]
+                       [-z (compress non-PDF raw docs and metadata)]
                        [-f logfile]
                        [-t fromdate (DD-MM-YYYY)] [-T todate (DD-MM-YYYY)]
                        [-d last_n_days]
@@ -51,13 +59,19 @@ def to_datetime(datestr):
             datelist.append(int(num))
         return datetime.datetime(datelist[2], datelist[1], datelist[0])
 
-def execute(storage, srclist, agghosts, fromdate, todate, max_wait, all_dls):
+def execute(storage, srclist, agghosts, fromdate, todate, max_wait, all_dls, \
+            save_raw = False, issue_pdf = False):
     if fromdate == None and todate != None:
         fromdate = todate
     elif fromdate != None and todate == None:
         todate = datetime.datetime.today()
 
     srcobjs = datasrcs.get_srcobjs(srclist,  storage)
+    for srcobj in srcobjs:
+        if save_raw and hasattr(srcobj, 'save_raw'):
+            srcobj.save_raw = True
+        if issue_pdf and hasattr(srcobj, 'issue_pdf'):
+            srcobj.issue_pdf = True
 
     download.parallel_download(srcobjs, agghosts, fromdate, todate, max_wait, all_dls)
 
@@ -79,23 +93,40 @@ if __name__ == '__main__':
     all_dls    = False
     max_wait   = None
     agghosts   = True
-
-    optlist, remlist = getopt.getopt(sys.argv[1:], 'ad:D:l:mnf:p:t:T:hrs:W:')
+    dedup      = False
+    fsync_batch = 0
+    compress   = False
+    metapacks  = False
+    storeurl   = None
+    save_raw   = False
+    issue_pdf  = False
+
+    optlist, remlist = getopt.getopt(sys.argv[1:], 'aB:cd:D:gil:mMnf:p:t:T:hrs:S:W:z')
     for o, v in optlist:
         if o == '-a':
             all_dls = True
+        elif o == '-B':
+            storeurl = v
+        elif o == '-c':
+            dedup = True
         elif o == '-d':   
             num_days = int(v)
             todate = datetime.datetime.today()
             fromdate = todate - datetime.timedelta(days = num_days)
         elif o == '-D':
             datadir = v
+        elif o == '-g':
+            save_raw = True
+        elif o == '-i':
+            issue_pdf = True
         elif o == '-l':
             debuglevel = v
         elif o == '-f':
             filename = v
         elif o == '-m':
             updateMeta = True
+        elif o == '-M':
+            metapacks = True
         elif o == '-n':
             agghosts = False
         elif o == '-t':
@@ -106,6 +137,10 @@ if __name__ == '__main__':
             updateRaw = True
         elif o == '-s':
             srclist.append(v)
+        elif o == '-S':
+            fsync_batch = int(v)
+        elif o == '-z':
+            compress = True
         elif o == '-W':
             max_wait = int(v)
         else:
@@ -146,6 +181,10 @@ if __name__ == '__main__':
         )
 
 
-    storage = FileManager(datadir, updateMeta, updateRaw)
-    execute(storage, srclist, agghosts, fromdate, todate, max_wait, all_dls)
+    backend = get_backend(storeurl, datadir, fsync_batch)
+    storage = FileManager(datadir, updateMeta, updateRaw, dedup = dedup, \
+                          fsync_batch = fsync_batch, compress = compress, \
+                          metapacks = metapacks, backend = backend)
+    execute(storage, srclist, agghosts, fromdate, todate, max_wait, all_dls, \
+            save_raw, issue_pdf)
 
@@ -0,0 +1,106 @@
+import datetime
+import threading
+import unittest
+
+from egazette.srcs.central import CentralWeekly
+from egazette.utils import utils
+
+FORM  = '''<html><body><form action="./SearchCategory.aspx">
+<input type="hidden" name="__VIEWSTATE" value="vs"/>
+<input name="txtDateIssueF" value=""/><input name="txtDateIssueT" value=""/>
+<input name="btnDetail" value="x"/><select name="ddlGazetteCategory"></select>
+%s</form></body></html>'''
+TABLE = '''<table id="gvGazette"><tr><th>Gazette ID</th><th>Issue Date</th>
+<th>Download</th></tr>%s</table>'''
+ROW   = '<tr><td>UGID %d</td><td>%s</td><td><input name="dl%d"/></td></tr>'
+
+class FakeResponse:
+    def __init__(self, webpage, response_url):
+        self.webpage      = webpage.encode('utf8')
+        self.response_url = response_url
+        self.dom          = None
+        self.error        = None
+
+class FakeCentral(CentralWeekly):
+    # answers the searches with one gazette a day
+    def __init__(self):
+        CentralWeekly.__init__(self, 'central_weekly', None)
+        self.saved    = []
+        self.sessions = 0
+        self.bare     = False
+        self.empty    = False
+
+    def download_url(self, url, savecookies = None, loadcookies = None, \
+                     postdata = None, referer = None, **kwargs):
+        search_url = 'http://egazette.nic.in/SearchCategory.aspx'
+        if url.find('default') >= 0:
+            self.sessions += 1
+            return FakeResponse('<html></html>', 'http://egazette.nic.in/default.aspx')
+
+        postdata = dict(postdata or [])
+        if not postdata.get('btnDetail') or not postdata.get('txtDateIssueF') \
+                or self.bare:
+            self.bare = False
+            return FakeResponse(FORM % '', search_url)
+
+        if self.empty:
+            return FakeResponse(FORM % '<span>No Records Found</span>', search_url)
+
+        fromdate = datetime.datetime.strptime(postdata['txtDateIssueF'], '%d-%b-%Y').date()
+        todate   = datetime.datetime.strptime(postdata['txtDateIssueT'], '%d-%b-%Y').date()
+        rows = []
+        while fromdate <= todate:
+            rows.append(ROW % (fromdate.toordinal(), utils.get_egz_date(fromdate), \
+                               fromdate.day))
+            fromdate += datetime.timedelta(days = 1)
+        return FakeResponse(FORM % (TABLE % ''.join(rows)), search_url)
+
+    def save_gazette(self, relurl, gurl, metainfo, **kwargs):
+        self.saved.append(relurl)
+        return True
+
+class TestSyncWindows(unittest.TestCase):
+    def sync(self, fromdate, todate, max_window):
+        src = FakeCentral()
+        src.max_window = max_window
+        dls = src.sync(fromdate, todate, threading.Event())
+        return src, dls
+
+    def get_relurl(self, dateobj):
+        return 'central_weekly/%s/%d' % (dateobj, dateobj.toordinal())
+
+    def test_one_day_window(self):
+        day = datetime.datetime(2020, 1, 5)
+        src, dls = self.sync(day, day, 7)
+        self.assertEqual(dls, [self.get_relurl(day.date())])
+
+    def test_windows_keep_date_relpaths(self):
+        fromdate = datetime.datetime(2020, 1, 1)
+        src, dls = self.sync(fromdate, datetime.datetime(2020, 1, 15), 7)
+        expected = [self.get_relurl((fromdate + datetime.timedelta(days = i)).date()) \
+                    for i in range(15)]
+        self.assertEqual(dls, expected)
+
+class TestSessionReuse(unittest.TestCase):
+    def test_bare_form_starts_new_session(self):
+        src = FakeCentral()
+        day = datetime.date(2020, 1, 5)
+        src.download_oneday('central_weekly/2020-01-05', day)
+        src.bare = True
+        dls = src.download_oneday('central_weekly/2020-01-06', \
+                                  day + datetime.timedelta(days = 1))
+        self.assertEqual(src.sessions, 2)
+        self.assertEqual(len(dls), 1)
+
+    def test_no_records_keeps_session(self):
+        src = FakeCentral()
+        day = datetime.date(2020, 1, 5)
+        src.download_oneday('central_weekly/2020-01-05', day)
+        src.empty = True
+        dls = src.download_oneday('central_weekly/2020-01-06', \
+                                  day + datetime.timedelta(days = 1))
+        self.assertEqual(src.sessions, 1)
+        self.assertEqual(dls, [])
+
+if __name__ == '__main__':
+    unittest.main()
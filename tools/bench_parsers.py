@@ -0,0 +1,385 @@
+import sys
+import os
+import time
+import random
+import getopt
+import logging
+import datetime
+import resource
+import multiprocessing
+from io import BytesIO
+
+from egazette.srcs import datasrcs
+from egazette.srcs.basegazette import WebResponse
+from egazette.utils import utils
+
+def print_usage(progname):
+    print('''Usage: %s [-l loglevel(critical, error, warn, info, debug)]
+                       [-n passes (parses of every page, default 5)]
+                       [-r rows (rows per synthetic page, default 500)]
+                       [-F fixturedir (recorded pages under fixturedir/srcname/)]
+                       [-S (only the recorded pages, no synthetic ones)]
+                       [-s srcname -s srcname ...]
+          ''' % progname)
+    print('Times the offline parsing of result and listing pages for each source')
+    print('and reports pages/sec and the peak memory growth while parsing.')
+    print('A recorded page is named after the kind of page it is, for example')
+    print('fixturedir/tamilnadu/extraordinary-2019.html. Kinds: %s' % \
+          ', '.join(['%s(%s)' % (k, ', '.join(v[0])) for k, v in BENCHMARKS.items()]))
+
+DATEOBJ = datetime.date(2019, 3, 5)
+NODATE  = datetime.date(1900, 1, 1)
+
+WORDS = ['Ministry', 'of', 'Finance', 'Notification', 'Revenue', 'Department', \
+         'G.O.', 'Ms.', 'No.', 'regarding', 'the', 'Public', 'Works', \
+         'appointment', 'transfer', '&amp;', 'सूचना', 'அரசாணை', 'ഉത്തരവ്']
+
+class FixtureSite:
+    # stands in for the network, every url gets the page being timed
+    def __init__(self):
+        self.webpage = None
+
+    def download_url(self, url, *args, **kwargs):
+        response = WebResponse()
+        response.set_webpage(self.webpage)
+        return response
+
+def words(rand, n):
+    return ' '.join(rand.choice(WORDS) for i in range(rand.randint(1, n)))
+
+def dates(rand, rows):
+    for i in range(rows):
+        if i % 10 == 0:
+            yield DATEOBJ
+        else:
+            yield datetime.date(2019, rand.randint(1, 12), rand.randint(1, 28))
+
+def wrap_page(body, rand, scripts = 20):
+    # the menus and scripts around the results that every page carries
+    menu = ''.join(['<li><a href="/menu%d.php">%s</a></li>' % (i, words(rand, 3)) \
+                    for i in range(100)])
+    script = 'function f%d(x) { return x + %d; }\n'
+    script = ''.join([script % (i, i) for i in range(scripts)])
+    page = '''<html><head><meta charset="utf-8"/><script>%s</script></head>
+<body><div id="menu"><ul>%s</ul></div>
+<table><tr><td><a href="/">Home</a></td><td><a href="/about.php">About</a></td></tr></table>
+%s
+<div id="footer"><ul>%s</ul></div></body></html>''' % (script, menu, body, menu)
+    return page.encode('utf8')
+
+def central_results(rand, rows):
+    viewstate = ''.join(rand.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdef0123456789+/') \
+                        for i in range(250000))
+    trs = ['<tr><th>Ministry</th><th>Subject</th><th>Department</th><th>Office</th>' \
+           '<th>UGID</th><th>Issue Date</th><th>Download</th></tr>']
+    for i in range(rows):
+        trs.append('<tr><td>%s</td><td>%s</td><td>%s</td><td>%s</td><td>CG-DL-E-%d</td>' \
+                   '<td>%s</td><td><input type="image" name="gvGazette$ctl%02d$imgbtn"' \
+                   ' src="images/pdf.png"/></td></tr>' % \
+                   (words(rand, 4), words(rand, 20), words(rand, 4), words(rand, 3), \
+                    200000 + i, utils.get_egz_date(DATEOBJ), i + 2))
+    trs.append('<tr class="pager"><td colspan="7"><table><tr><td><span>1</span></td>' \
+               '<td><a href="javascript:__doPostBack(\'gvGazette\',\'Page$2\')">2</a>' \
+               '</td></tr></table></td></tr>')
+
+    body = '''<form method="post" action="./SearchCategory.aspx" id="form1">
+<input type="hidden" name="__EVENTTARGET" id="__EVENTTARGET" value=""/>
+<input type="hidden" name="__EVENTARGUMENT" id="__EVENTARGUMENT" value=""/>
+<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="%s"/>
+<select name="ddlGazetteCategory"><option>Weekly</option><option>Extra Ordinary</option></select>
+<select name="ddlPartSection"><option>Select Part &amp; Section</option></select>
+<input name="txtDateIssueF" type="text"/><input name="txtDateIssueT" type="text"/>
+<input type="submit" name="btnDetail" value="Detailed Report"/>
+<table id="gvGazette">%s</table></form>''' % (viewstate, '\n'.join(trs))
+    return wrap_page(body, rand, 200)
+
+def tamilnadu_extraordinary(rand, rows):
+    trs = ['<tr><td>Issue No.</td><td>Issue Date</td><td>Extraordinary Part</td>' \
+           '<td>Extraordinary Type</td><td>Subject</td></tr>']
+    for i, d in enumerate(dates(rand, rows)):
+        trs.append('<tr><td><a href="../extraordinary/%d/%d_Ex_II_1.pdf">%d</a></td>' \
+                   '<td>%s</td><td>Part II - Section %d</td><td>%s</td><td>%s</td></tr>' % \
+                   (d.year, i, i, utils.dateobj_to_str(d, '-'), rand.randint(1, 4), \
+                    words(rand, 2), words(rand, 20)))
+    return wrap_page('<table>%s</table>' % '\n'.join(trs), rand)
+
+def tamilnadu_ordinary(rand, rows):
+    trs = ['<tr><td>Issue No.</td><td>Particulars</td></tr>']
+    for i, d in enumerate(dates(rand, rows)):
+        lis = ''.join(['<li>%s</li>' % words(rand, 12) for j in range(rand.randint(1, 5))])
+        trs.append('<tr><td><a href="%d/%d.php">%d dt %s</a></td><td><ul>%s</ul></td></tr>' % \
+                   (d.year, i, i, utils.dateobj_to_str(d, '-'), lis))
+    return wrap_page('<table>%s</table>' % '\n'.join(trs), rand)
+
+def tamilnadu_listing(rand, rows):
+    trs = ['<tr><td>Click to Download</td><td>Content</td></tr>']
+    for i in range(rows):
+        lis = ''.join(['<li>%s</li>' % words(rand, 12) for j in range(rand.randint(1, 5))])
+        trs.append('<tr><td><a href="../pdf/2019/%d.pdf">Part %s - Section %d</a></td>' \
+                   '<td>%s<ul>%s</ul></td></tr>' % \
+                   (i, rand.choice(['I', 'II', 'III', 'IV']), rand.randint(1, 4), \
+                    words(rand, 4), lis))
+    return wrap_page('<table>%s</table>' % '\n'.join(trs), rand)
+
+def kerala_year(rand, rows):
+    links = []
+    for d in dates(rand, rows):
+        links.append('<li><a href="%d/%s.php">Gazette dated %dth %s %d</a></li>' % \
+                     (d.year, utils.dateobj_to_str(d, '-'), d.day, \
+                      d.strftime('%B'), d.year))
+    return wrap_page('<ul>%s</ul>' % '\n'.join(links), rand)
+
+def kerala_date(rand, rows):
+    trs = []
+    for i in range(rows):
+        if i % 20 == 0:
+            trs.append('<tr><td colspan="2">Part %s</td></tr>' % \
+                       rand.choice(['I', 'II', 'III', 'IV']))
+        trs.append('<tr><td>%d</td><td><strong>%s</strong><br/>' \
+                   '<a href="../pdf/2019/part%d/%d.pdf">%s</a></td></tr>' % \
+                   (i, words(rand, 3), i % 4 + 1, i, words(rand, 10)))
+    return wrap_page('<table>%s</table>' % '\n'.join(trs), rand)
+
+def stgeorge_results(rand, rows):
+    tds = []
+    for i, d in enumerate(dates(rand, rows)):
+        d = d.replace(year = 1923)
+        tds.append('<tr><td><a onclick="loadFullImg(\'%d\',\'%s\',\'%02d\',\'%d\',%d,%d)">' \
+                   'Issue Number: %d, Part: %s, Gazette Page: %d</a><p>%s</p>' \
+                   '<p>Department: %s Order Nos: %d, %d</p><p>%s</p></td></tr>' % \
+                   (d.year, d.strftime('%b'), d.day, 10000 + i, i % 40 + 1, 120, \
+                    i % 52 + 1, rand.choice(['I', 'II', 'III']), i % 40 + 1, \
+                    words(rand, 3), words(rand, 2), i, i + 1, words(rand, 15)))
+    tds.append('<tr><td><a onclick="recordPagination(&quot;q&quot;, 20, 2)">' \
+               '<img title="Next" src="next.png"/></a></td></tr>')
+    return wrap_page('<table>%s</table>' % '\n'.join(tds), rand)
+
+def karnataka_contents(rand, rows):
+    # a contents pdf whose link annotations launch the part pdfs
+    perpage = 40
+    numpages = max(1, (rows + perpage - 1) // perpage)
+    objects = [None, '<< /Type /Catalog /Pages 2 0 R >>', None]
+    kids    = []
+    for p in range(numpages):
+        annots = []
+        for i in range(p * perpage, min(rows, (p + 1) * perpage)):
+            objects.append('<< /Type /Annot /Subtype /Link /Rect [72 %d 540 %d] ' \
+                           '/A << /S /Launch /F << /Type /Filespec ' \
+                           '/F (Part-%s-%d.pdf) >> >> >>' % \
+                           (700 - (i % perpage) * 15, 712 - (i % perpage) * 15, \
+                            rand.choice(['I', 'II', 'III', 'IVA']), i))
+            annots.append('%d 0 R' % (len(objects) - 1))
+        objects.append('<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] ' \
+                       '/Annots [%s] >>' % ' '.join(annots))
+        kids.append('%d 0 R' % (len(objects) - 1))
+    objects[2] = '<< /Type /Pages /Kids [%s] /Count %d >>' % (' '.join(kids), numpages)
+
+    pdf     = [b'%PDF-1.4\n']
+    offsets = []
+    size    = len(pdf[0])
+    for i in range(1, len(objects)):
+        obj = ('%d 0 obj\n%s\nendobj\n' % (i, objects[i])).encode('ascii')
+        offsets.append(size)
+        pdf.append(obj)
+        size += len(obj)
+
+    xref = ['xref\n0 %d\n0000000000 65535 f \n' % len(objects)]
+    xref.extend(['%010d 00000 n \n' % offset for offset in offsets])
+    xref.append('trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % \
+                (len(objects), size))
+    pdf.append(''.join(xref).encode('ascii'))
+    return b''.join(pdf)
+
+def run_central(src, site, kind):
+    response = WebResponse()
+    response.set_webpage(site.webpage)
+    d = src.parse_search_page(response, DATEOBJ)
+    src.get_form_data(d, DATEOBJ)
+    metainfos, nextpage = src.parse_search_results(d, DATEOBJ, 1)
+    return len(metainfos)
+
+def run_tamilnadu(src, site, kind):
+    minfos = []
+    if kind == 'extraordinary':
+        minfos = src.get_metainfos('/extraordinary/extraord_list2019.php', \
+                                   DATEOBJ, DATEOBJ, src.extraordinary_header, \
+                                   src.process_extraordinary_row)
+    elif kind == 'ordinary':
+        # no issue matches the date so only the year listing is parsed
+        minfos = src.get_metainfos('/gazette/gazette_list2019.php', NODATE, \
+                                   NODATE, src.ordinary_header, \
+                                   src.process_ordinary_row)
+    elif kind == 'listing':
+        src.process_ordinary_listing(minfos, src.baseurl + '/gazette/2019/9.php', \
+                                     '9', DATEOBJ)
+    return len(minfos)
+
+def run_kerala(src, site, kind):
+    minfos = []
+    if kind == 'year':
+        # the date range is empty so that the date pages are not followed
+        d = utils.parse_webpage(site.webpage, src.parser)
+        minfos = src.process_listing_page(src.baseurl, d, NODATE, NODATE)
+    elif kind == 'date':
+        minfos = src.datepage_metainfos(src.baseurl + '2019/05-03-2019.php', DATEOBJ)
+    return len(minfos)
+
+def run_stgeorge(src, site, kind):
+    minfos, nextpage, pagelinks = src.parse_metainfos(site.webpage, 1923, \
+                                           datetime.date(1923, 1, 1), \
+                                           datetime.date(1923, 12, 31))
+    return len(minfos)
+
+def run_karnataka(src, site, kind):
+    return len(utils.extract_links_from_pdf(BytesIO(site.webpage)))
+
+# srcname: (kinds of pages, synthetic page makers, run a page)
+BENCHMARKS = {
+    'central_weekly': (['results'], [central_results], run_central), \
+    'tamilnadu':      (['extraordinary', 'ordinary', 'listing'], \
+                       [tamilnadu_extraordinary, tamilnadu_ordinary, \
+                        tamilnadu_listing], run_tamilnadu), \
+    'kerala':         (['year', 'date'], [kerala_year, kerala_date], run_kerala), \
+    'stgeorge':       (['results'], [stgeorge_results], run_stgeorge), \
+    'karnataka':      (['contents'], [karnataka_contents], run_karnataka), \
+}
+
+def recorded_pages(fixturedir, srcname, kinds):
+    pages  = []
+    srcdir = os.path.join(fixturedir, srcname)
+    if not os.path.isdir(srcdir):
+        return pages
+
+    for filename in sorted(os.listdir(srcdir)):
+        for kind in kinds:
+            if filename.startswith(kind):
+                filepath = os.path.join(srcdir, filename)
+                with open(filepath, 'rb') as f:
+                    pages.append((filename, kind, f.read()))
+                break
+    return pages
+
+def get_maxrss():
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return maxrss
+    return maxrss * 1024
+
+def bench_kind(srcname, kind, pages, passes, loglevel):
+    # runs in a fresh process so that the peak memory is that of this
+    # source and kind of page alone. The sources warn about every link
+    # that is not a gazette, so below debug only their errors are logged
+    if loglevel > logging.DEBUG:
+        loglevel = logging.ERROR
+    logging.basicConfig(level = loglevel, \
+                        format = '%(asctime)s: %(name)s: %(levelname)s %(message)s', \
+                        datefmt = '%Y-%m-%d %H:%M:%S')
+
+    kinds, makers, run = BENCHMARKS[srcname]
+    site = FixtureSite()
+    src  = datasrcs.srcdict[srcname](srcname, None)
+    src.download_url = site.download_url
+
+    baseline  = get_maxrss()
+    metainfos = 0
+    nbytes    = 0
+    start     = time.time()
+    for i in range(passes):
+        for name, webpage in pages:
+            site.webpage = webpage
+            metainfos += run(src, site, kind)
+            nbytes    += len(webpage)
+    secs = time.time() - start
+
+    return {'pages': passes * len(pages), 'secs': secs, 'bytes': nbytes, \
+            'metainfos': metainfos, 'peak': get_maxrss() - baseline}
+
+if __name__ == '__main__':
+    progname   = sys.argv[0]
+    loglevel   = 'info'
+    passes     = 5
+    rows       = 500
+    fixturedir = None
+    synthetic  = True
+    srcnames   = []
+
+    optlist, remlist = getopt.getopt(sys.argv[1:], 'F:hl:n:r:s:S')
+    for o, v in optlist:
+        if o == '-F':
+            fixturedir = v
+        elif o == '-l':
+            loglevel = v
+        elif o == '-n':
+            passes = int(v)
+        elif o == '-r':
+            rows = int(v)
+        elif o == '-s':
+            srcnames.append(v)
+        elif o == '-S':
+            synthetic = False
+        else:
+            print_usage(progname)
+            sys.exit(0)
+
+    leveldict = {'critical': logging.CRITICAL, 'error': logging.ERROR, \
+                 'warning': logging.WARNING, 'info': logging.INFO, \
+                 'debug': logging.DEBUG}
+
+    if loglevel not in leveldict:
+        print_usage(progname)
+        sys.exit(0)
+
+    logging.basicConfig(level = leveldict[loglevel], \
+                        format = '%(asctime)s: %(name)s: %(levelname)s %(message)s', \
+                        datefmt = '%Y-%m-%d %H:%M:%S')
+    logger = logging.getLogger('bench_parsers')
+
+    if not srcnames:
+        srcnames = list(BENCHMARKS.keys())
+
+    context  = multiprocessing.get_context('spawn')
+    failures = []
+    for srcname in srcnames:
+        if srcname not in BENCHMARKS:
+            logger.warn('No benchmark for %s', srcname)
+            continue
+
+        kinds, makers, run = BENCHMARKS[srcname]
+        recorded = []
+        if fixturedir:
+            recorded = recorded_pages(fixturedir, srcname, kinds)
+
+        for kind, maker in zip(kinds, makers):
+            pages = [(name, webpage) for name, k, webpage in recorded if k == kind]
+            if synthetic:
+                pages.append(('synthetic', maker(random.Random(rows), rows)))
+            if not pages:
+                continue
+
+            # a source that fails is reported and the others still run
+            pool  = context.Pool(1)
+            try:
+                stats = pool.apply(bench_kind, (srcname, kind, pages, passes, \
+                                                leveldict[loglevel]))
+            except Exception as e:
+                logger.error('%s %s: FAILED %s: %s', srcname, kind, \
+                             type(e).__name__, e)
+                failures.append((srcname, kind))
+                continue
+            finally:
+                pool.close()
+                pool.join()
+
+            secs = max(stats['secs'], 1e-9)
+            logger.info('%s %s: %d pages (%.1fKB avg), %.1f pages/sec, ' \
+                        '%.1f metainfos/page, peak memory +%.1fMB', \
+                        srcname, kind, stats['pages'], \
+                        stats['bytes'] / 1024.0 / stats['pages'], \
+                        stats['pages'] / secs, \
+                        stats['metainfos'] / float(stats['pages']), \
+                        stats['peak'] / 1024.0 / 1024.0)
+
+    if failures:
+        logger.error('Failed benchmarks: %s', \
+                     ', '.join(['%s %s' % f for f in failures]))
+        sys.exit(1)
@@ -0,0 +1,216 @@
+import sys
+import os
+import time
+import random
+import getopt
+import logging
+import datetime
+from xml.dom import minidom, Node
+from xml.parsers.expat import ExpatError
+from xml.sax import saxutils
+
+from egazette.utils import xml_ops
+from egazette.utils import compression
+from egazette.utils.utils import MetaInfo
+
+def print_usage(progname):
+    print('''Usage: %s [-n num_records (synthetic records, default 10000)]
+                       [-D datadir (also check every metatags file under datadir)]
+                       [-s srcname -s srcname ...]
+          ''' % progname)
+    print('Checks that the metatags reader/writer in xml_ops is identical to')
+    print('the older minidom based one and compares their throughput.')
+
+# the minidom based reader and recursive writer that xml_ops replaced
+def legacy_get_xml_tag(tagName, tagValue):
+    if type(tagValue) == int:
+        return '<%s>%d</%s>' % (tagName, tagValue, tagName)
+    elif type(tagValue) == float:
+        return '<%s>%f</%s>' % (tagName, tagValue, tagName)
+    return '<%s>%s</%s>' % (tagName, saxutils.escape(tagValue), tagName)
+
+def legacy_obj_to_xml(tagName, obj):
+    if type(obj) in (str,):
+        return legacy_get_xml_tag(tagName, obj)
+
+    tags = ['<%s>' % tagName]
+    ks = list(obj.keys())
+    ks.sort()
+    for k in ks:
+        newobj = obj[k]
+        if isinstance(newobj, dict):
+            tags.append(legacy_obj_to_xml(k, newobj))
+        elif isinstance(newobj, list):
+            if k == 'bench':
+                tags.append('<%s>'% k)
+                for o in newobj:
+                    tags.append(legacy_obj_to_xml('name', o))
+                tags.append('</%s>'% k)
+            else:
+                for o in newobj:
+                    tags.append(legacy_obj_to_xml(k, o))
+        elif isinstance(newobj,  datetime.datetime) or \
+                isinstance(newobj, datetime.date):
+            tags.append(legacy_obj_to_xml(k, xml_ops.date_to_xml(newobj)))
+        else:
+            tags.append(legacy_get_xml_tag(k, obj[k]))
+    tags.append('</%s>' % tagName)
+    return '\n'.join(tags)
+
+def legacy_tag_file_bytes(feature):
+    xmlstring = '<?xml version="1.0" encoding="utf-8"?>\n' + \
+                legacy_obj_to_xml('document', feature)
+    return xmlstring.encode('utf8')
+
+def legacy_xml_to_tagdict(docid, xmlstring):
+    try:
+        xmlnode = minidom.parseString(xmlstring)
+    except ExpatError as e:
+        return None
+
+    feature = legacy_xml_to_obj(xmlnode.childNodes[0])
+    metainfo = MetaInfo()
+    for k, v in feature.items():
+        if k == 'date':
+            d = feature['date']
+            metainfo['date'] = datetime.date(int(d['year']), int(d['month']), int(d['day']))
+        else:
+            metainfo[k] = v
+    return metainfo
+
+def legacy_xml_to_obj(xmlNode):
+    xmldict = {}
+    for node in xmlNode.childNodes:
+        if node.nodeType == Node.ELEMENT_NODE:
+           k = node.tagName
+           obj = legacy_xml_to_obj(node)
+           if k in xmldict:
+               if not (type(xmldict[k]) == list):
+                   xmldict[k] = [xmldict[k]]
+               xmldict[k].append(obj)
+           else:
+               xmldict[k] = obj
+
+    if xmldict:
+        return xmldict
+    else:
+        value = []
+        for node in xmlNode.childNodes:
+            if node.nodeType == Node.TEXT_NODE and node.data != '\n':
+                value.append(node.data)
+        return ''.join(value)
+
+def synthetic_records(num):
+    rand  = random.Random(num)
+    words = ['Ministry', 'of', 'Finance', 'Notification', 'S.O.', '&', '<Part>', \
+             'II', 'Section', '3', 'अधिसूचना', \
+             '"quoted"', "it's", '\n']
+    for i in range(num):
+        metainfo = MetaInfo()
+        metainfo['date']   = datetime.date(rand.randint(1950, 2024), \
+                                           rand.randint(1, 12), rand.randint(1, 28))
+        metainfo['gztype'] = rand.choice(['Weekly', 'Extraordinary'])
+        metainfo['gznum']  = str(rand.randint(1, 5000))
+        metainfo['url']    = 'https://egazette.gov.in/WriteReadData/%d/%d.pdf' % \
+                             (metainfo['date'].year, rand.randint(1, 10 ** 6))
+        for field in ['subject', 'ministry', 'department', 'office']:
+            if rand.random() < 0.7:
+                metainfo[field] = ' '.join(rand.choice(words) \
+                                          for j in range(rand.randint(1, 12)))
+        if rand.random() < 0.3:
+            metainfo['partnum'] = rand.randint(1, 4)
+        if rand.random() < 0.2:
+            metainfo['bench'] = [rand.choice(words) for j in range(rand.randint(1, 3))]
+        if rand.random() < 0.1:
+            metainfo['notification_num'] = ['%d' % rand.randint(1, 99), 'G.S.R. %d' % i]
+        if rand.random() < 0.05:
+            metainfo['issue'] = {'volume': str(rand.randint(1, 80)), 'number': ''}
+        yield metainfo
+
+def stored_records(datadir, srcnames):
+    metadir = os.path.join(datadir, 'metatags')
+    for src in sorted(os.listdir(metadir)):
+        if srcnames and src not in srcnames:
+            continue
+        for dirpath, dirnames, filenames in os.walk(os.path.join(metadir, src)):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.startswith('.'):
+                    continue
+                filepath = os.path.join(dirpath, filename)
+                yield filepath, compression.read_file(filepath)
+
+def timeit(func, items):
+    start = time.time()
+    for item in items:
+        func(item)
+    return time.time() - start
+
+def report(logger, name, num, legacy_secs, new_secs):
+    logger.info('%s: %d records, minidom/recursive %.0f/sec, xml_ops %.0f/sec, speedup %.1fx', \
+                name, num, num / max(legacy_secs, 1e-9), num / max(new_secs, 1e-9), \
+                legacy_secs / max(new_secs, 1e-9))
+
+if __name__ == '__main__':
+    progname = sys.argv[0]
+    num      = 10000
+    datadir  = None
+    srcnames = []
+
+    optlist, remlist = getopt.getopt(sys.argv[1:], 'D:hn:s:')
+    for o, v in optlist:
+        if o == '-D':
+            datadir = v
+        elif o == '-n':
+            num = int(v)
+        elif o == '-s':
+            srcnames.append(v)
+        else:
+            print_usage(progname)
+            sys.exit(0)
+
+    logging.basicConfig(level = logging.INFO, \
+                        format = '%(asctime)s: %(name)s: %(levelname)s %(message)s', \
+                        datefmt = '%Y-%m-%d %H:%M:%S')
+    logger = logging.getLogger('bench_xml')
+
+    mismatches = 0
+
+    records = list(synthetic_records(num))
+    blobs   = []
+    for metainfo in records:
+        blob = xml_ops.tag_file_bytes(metainfo)
+        if blob != legacy_tag_file_bytes(metainfo):
+            logger.error('Writer mismatch for %s', metainfo)
+            mismatches += 1
+        if xml_ops.xml_to_tagdict('', blob) != legacy_xml_to_tagdict('', blob):
+            logger.error('Reader mismatch for %s', blob)
+            mismatches += 1
+        blobs.append(blob)
+
+    report(logger, 'write', num, timeit(legacy_tag_file_bytes, records), \
+                                 timeit(xml_ops.tag_file_bytes, records))
+    report(logger, 'read', num, \
+           timeit(lambda b: legacy_xml_to_tagdict('', b), blobs), \
+           timeit(lambda b: xml_ops.xml_to_tagdict('', b), blobs))
+
+    if datadir:
+        blobs = []
+        for filepath, blob in stored_records(datadir, srcnames):
+            metainfo = xml_ops.xml_to_tagdict(filepath, blob)
+            if metainfo != legacy_xml_to_tagdict(filepath, blob):
+                logger.error('Reader mismatch for %s', filepath)
+                mismatches += 1
+            elif metainfo != None and xml_ops.tag_file_bytes(metainfo) != \
+                    legacy_tag_file_bytes(metainfo):
+                logger.error('Writer mismatch for %s', filepath)
+                mismatches += 1
+            blobs.append(blob)
+
+        report(logger, 'read %s' % datadir, len(blobs), \
+               timeit(lambda b: legacy_xml_to_tagdict('', b), blobs), \
+               timeit(lambda b: xml_ops.xml_to_tagdict('', b), blobs))
+
+    logger.info('Mismatches: %d', mismatches)
+    if mismatches:
+        sys.exit(1)
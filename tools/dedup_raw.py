@@ -0,0 +1,69 @@
+import sys
+import os
+import getopt
+import logging
+
+from egazette.utils.file_storage import FileManager
+
+def print_usage(progname):
+    print('''Usage: %s [-l loglevel(critical, error, warn, info, debug)]
+                       [-g (remove blobs no longer referenced by any relurl)]
+                       [-s srcname -s srcname ...]
+                       -D datadir
+          ''' % progname)
+    print('Replaces identical raw documents with hardlinks into the')
+    print('content-addressed blob store under datadir/blobs.')
+
+if __name__ == '__main__':
+    progname = sys.argv[0]
+    loglevel = 'info'
+    datadir  = None
+    srcnames = []
+    gc       = False
+
+    optlist, remlist = getopt.getopt(sys.argv[1:], 'D:ghl:s:')
+    for o, v in optlist:
+        if o == '-D':
+            datadir = v
+        elif o == '-g':
+            gc = True
+        elif o == '-l':
+            loglevel = v
+        elif o == '-s':
+            srcnames.append(v)
+        else:
+            print_usage(progname)
+            sys.exit(0)
+
+    leveldict = {'critical': logging.CRITICAL, 'error': logging.ERROR, \
+                 'warning': logging.WARNING, 'info': logging.INFO, \
+                 'debug': logging.DEBUG}
+
+    if datadir == None or loglevel not in leveldict:
+        print_usage(progname)
+        sys.exit(0)
+
+    logging.basicConfig(level = leveldict[loglevel], \
+                        format = '%(asctime)s: %(name)s: %(levelname)s %(message)s', \
+                        datefmt = '%Y-%m-%d %H:%M:%S')
+    logger = logging.getLogger('dedup')
+
+    storage = FileManager(datadir, False, False, dedup = True)
+
+    srclist = os.listdir(storage.rawdir)
+    srclist.sort()
+
+    linked = 0
+    for src in srclist:
+        if srcnames and src not in srcnames:
+            continue
+
+        for relurl in storage.recursive_relurls(storage.rawdir, src):
+            if storage.dedup_rawfile(relurl):
+                linked += 1
+                logger.debug('Linked duplicate %s', relurl)
+
+        logger.info('Done with %s. Duplicates linked so far: %d', src, linked)
+
+    if gc:
+        logger.info('Removed %d unreferenced blobs', storage.gc_blobs())
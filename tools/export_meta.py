@@ -0,0 +1,272 @@
+import sys
+import os
+import re
+import csv
+import json
+import getopt
+import logging
+import datetime
+import collections
+import multiprocessing
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from egazette.utils.file_storage import FileManager
+
+# fields that get their own column, everything else goes into extra as json
+COLUMNS = ['relurl', 'src', 'date', 'gztype', 'gznum', 'partnum', 'title', \
+           'subject', 'ministry', 'department', 'notification_num', 'url', \
+           'href', 'download', 'extra']
+
+def print_usage(progname):
+    print('''Usage: %s [-l loglevel(critical, error, warn, info, debug)]
+                       [-p num_processes (default: number of cpus)]
+                       [-b batch_size (relurls per worker task, default 500)]
+                       [-c (write only jsonl, skip the columnar file)]
+                       [-M (metatags are stored in pack files)]
+                       [-t fromdate (DD-MM-YYYY)] [-T todate (DD-MM-YYYY)]
+                       [-s srcname -s srcname ...]
+                       -D datadir -o output_prefix
+          ''' % progname)
+    print('Writes output_prefix.jsonl and output_prefix.parquet (or')
+    print('output_prefix.csv when pyarrow is not installed).')
+
+def to_date(datestr):
+    numlist = re.findall('\d+', datestr)
+    if len(numlist) != 3:
+        return None
+    return datetime.date(int(numlist[2]), int(numlist[1]), int(numlist[0]))
+
+def to_json_value(value):
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    elif isinstance(value, dict):
+        return dict([(k, to_json_value(v)) for k, v in value.items()])
+    elif isinstance(value, list):
+        return [to_json_value(v) for v in value]
+    return value
+
+def to_column_value(value):
+    if value == None:
+        return None
+    elif isinstance(value, str):
+        return value
+    elif isinstance(value, list) and all(isinstance(v, str) for v in value):
+        return '; '.join(value)
+    return json.dumps(value, ensure_ascii = False, sort_keys = True)
+
+def to_row(record):
+    row   = {}
+    extra = {}
+    for k, v in record.items():
+        if k in COLUMNS:
+            row[k] = to_column_value(v)
+        else:
+            extra[k] = v
+    if extra:
+        row['extra'] = json.dumps(extra, ensure_ascii = False, sort_keys = True)
+    return [row.get(column) for column in COLUMNS]
+
+storage = None
+
+def init_worker(datadir, metapacks):
+    global storage
+    storage = FileManager(datadir, False, False, metapacks = metapacks)
+
+def parse_batch(relurls):
+    records = []
+    for relurl in relurls:
+        metainfo = storage.get_metainfo(relurl)
+        if metainfo == None:
+            continue
+
+        record = collections.OrderedDict()
+        record['relurl'] = relurl
+        record['src']    = relurl.split('/')[0]
+        for k in sorted(metainfo.keys()):
+            record[k] = to_json_value(metainfo[k])
+        records.append(record)
+    return records
+
+def in_range(datestr, fromdate, todate):
+    if fromdate == None and todate == None:
+        return True
+
+    reobj = re.match('(\d{4})-(\d{2})-(\d{2})$', datestr)
+    if not reobj:
+        return False
+    dateobj = datetime.date(int(reobj.group(1)), int(reobj.group(2)), int(reobj.group(3)))
+    if fromdate and dateobj < fromdate:
+        return False
+    if todate and dateobj > todate:
+        return False
+    return True
+
+def find_relurls(storage, srcnames, fromdate, todate):
+    if storage.metastore:
+        for pack in storage.metastore.get_packs():
+            pack.refresh()
+            for relurl in sorted(pack.entries.keys()):
+                words = relurl.split('/')
+                if srcnames and words[0] not in srcnames:
+                    continue
+                if len(words) > 2 and in_range(words[1], fromdate, todate):
+                    yield relurl
+        return
+
+    for src in sorted(os.listdir(storage.metadir)):
+        if srcnames and src not in srcnames:
+            continue
+
+        for datestr in sorted(os.listdir(os.path.join(storage.metadir, src))):
+            if in_range(datestr, fromdate, todate):
+                relurl = '%s/%s' % (src, datestr)
+                for x in storage.recursive_relurls(storage.metadir, relurl):
+                    yield x
+
+def make_batches(relurls, batch_size):
+    batch = []
+    for relurl in relurls:
+        batch.append(relurl)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def parse_parallel(pool, batches, window):
+    # only window batches are in flight so memory stays bounded however
+    # large the corpus is; results come back in relurl order
+    pending = collections.deque()
+    for batch in batches:
+        pending.append(pool.apply_async(parse_batch, (batch,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+
+    while pending:
+        yield pending.popleft().get()
+
+class ParquetOutput:
+    def __init__(self, filepath, rowgroup_size = 50000):
+        self.schema = pyarrow.schema([(column, pyarrow.string()) for column in COLUMNS])
+        self.writer = pyarrow.parquet.ParquetWriter(filepath, self.schema, \
+                                                    compression = 'zstd')
+        self.rows   = []
+        self.rowgroup_size = rowgroup_size
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.rowgroup_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            columns = list(zip(*self.rows))
+            arrays  = [pyarrow.array(column, pyarrow.string()) for column in columns]
+            self.writer.write_table(pyarrow.Table.from_arrays(arrays, schema = self.schema))
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+class CsvOutput:
+    def __init__(self, filepath):
+        self.filehandle = open(filepath, 'w', newline = '', encoding = 'utf8')
+        self.writer     = csv.writer(self.filehandle, lineterminator = '\n')
+        self.writer.writerow(COLUMNS)
+
+    def write(self, row):
+        self.writer.writerow(['' if v == None else v for v in row])
+
+    def close(self):
+        self.filehandle.close()
+
+if __name__ == '__main__':
+    progname   = sys.argv[0]
+    loglevel   = 'info'
+    datadir    = None
+    outprefix  = None
+    srcnames   = []
+    fromdate   = None
+    todate     = None
+    workers    = multiprocessing.cpu_count()
+    batch_size = 500
+    columnar   = True
+    metapacks  = False
+
+    optlist, remlist = getopt.getopt(sys.argv[1:], 'b:cD:hl:Mo:p:s:t:T:')
+    for o, v in optlist:
+        if o == '-b':
+            batch_size = int(v)
+        elif o == '-c':
+            columnar = False
+        elif o == '-D':
+            datadir = v
+        elif o == '-l':
+            loglevel = v
+        elif o == '-M':
+            metapacks = True
+        elif o == '-o':
+            outprefix = v
+        elif o == '-p':
+            workers = int(v)
+        elif o == '-s':
+            srcnames.append(v)
+        elif o == '-t':
+            fromdate = to_date(v)
+        elif o == '-T':
+            todate = to_date(v)
+        else:
+            print_usage(progname)
+            sys.exit(0)
+
+    leveldict = {'critical': logging.CRITICAL, 'error': logging.ERROR, \
+                 'warning': logging.WARNING, 'info': logging.INFO, \
+                 'debug': logging.DEBUG}
+
+    if datadir == None or outprefix == None or loglevel not in leveldict:
+        print_usage(progname)
+        sys.exit(0)
+
+    logging.basicConfig(level = leveldict[loglevel], \
+                        format = '%(asctime)s: %(name)s: %(levelname)s %(message)s', \
+                        datefmt = '%Y-%m-%d %H:%M:%S')
+    logger = logging.getLogger('export_meta')
+
+    init_worker(datadir, metapacks)
+
+    jsonfile = open('%s.jsonl' % outprefix, 'w', encoding = 'utf8')
+    output   = None
+    if columnar and pyarrow != None:
+        output = ParquetOutput('%s.parquet' % outprefix)
+    elif columnar:
+        logger.info('pyarrow is not installed. Writing csv instead of parquet')
+        output = CsvOutput('%s.csv' % outprefix)
+
+    relurls = find_relurls(storage, srcnames, fromdate, todate)
+    batches = make_batches(relurls, batch_size)
+
+    pool     = multiprocessing.Pool(workers, init_worker, (datadir, metapacks))
+    exported = 0
+    for records in parse_parallel(pool, batches, 2 * workers):
+        for record in records:
+            jsonfile.write(json.dumps(record, ensure_ascii = False))
+            jsonfile.write('\n')
+            if output:
+                output.write(to_row(record))
+        exported += len(records)
+        if exported and exported % (100 * batch_size) < len(records):
+            logger.info('Exported %d records', exported)
+
+    pool.close()
+    pool.join()
+
+    jsonfile.close()
+    if output:
+        output.close()
+    logger.info('Exported %d records to %s', exported, outprefix)
@@ -0,0 +1,99 @@
+import sys
+import os
+import getopt
+import logging
+
+from egazette.utils.file_storage import FileManager
+from egazette.utils import compression
+
+def print_usage(progname):
+    print('''Usage: %s [-l loglevel(critical, error, warn, info, debug)]
+                       [-x (remove the xml files once they are packed)]
+                       [-c (compact the packs, dropping superseded records)]
+                       [-s srcname -s srcname ...]
+                       -D datadir
+          ''' % progname)
+    print('Moves the per document metatags xml files into the pack files')
+    print('under datadir/metapacks. Run it while no sync is writing to datadir.')
+
+def migrate_src(storage, src, remove):
+    metastore = storage.metastore
+    migrated  = []
+    for relurl, entry in storage.scan_entries(storage.metadir, src):
+        mtime = int(entry.stat().st_mtime)
+
+        packentry = metastore.lookup(relurl)
+        if packentry == None or packentry.mtime < mtime:
+            plainpath, suffix = compression.split_suffix(entry.path)
+
+            h = open(entry.path, 'rb')
+            buf = h.read()
+            h.close()
+
+            metastore.put(relurl, buf, suffix, mtime)
+        migrated.append(entry.path)
+
+    metastore.sync()
+    if remove:
+        for filepath in migrated:
+            os.remove(filepath)
+    return len(migrated)
+
+if __name__ == '__main__':
+    progname = sys.argv[0]
+    loglevel = 'info'
+    datadir  = None
+    srcnames = []
+    remove   = False
+    compact  = False
+
+    optlist, remlist = getopt.getopt(sys.argv[1:], 'cD:hl:s:x')
+    for o, v in optlist:
+        if o == '-c':
+            compact = True
+        elif o == '-D':
+            datadir = v
+        elif o == '-l':
+            loglevel = v
+        elif o == '-s':
+            srcnames.append(v)
+        elif o == '-x':
+            remove = True
+        else:
+            print_usage(progname)
+            sys.exit(0)
+
+    leveldict = {'critical': logging.CRITICAL, 'error': logging.ERROR, \
+                 'warning': logging.WARNING, 'info': logging.INFO, \
+                 'debug': logging.DEBUG}
+
+    if datadir == None or loglevel not in leveldict:
+        print_usage(progname)
+        sys.exit(0)
+
+    logging.basicConfig(level = leveldict[loglevel], \
+                        format = '%(asctime)s: %(name)s: %(levelname)s %(message)s', \
+                        datefmt = '%Y-%m-%d %H:%M:%S')
+    logger = logging.getLogger('metapacks')
+
+    storage = FileManager(datadir, False, False, metapacks = True)
+
+    srclist = os.listdir(storage.metadir)
+    srclist.sort()
+
+    for src in srclist:
+        if srcnames and src not in srcnames:
+            continue
+
+        num = migrate_src(storage, src, remove)
+        logger.info('Packed %d metatags files of %s', num, src)
+
+    if compact:
+        for pack in storage.metastore.get_packs():
+            src = os.path.basename(os.path.dirname(pack.packpath))
+            if srcnames and src not in srcnames:
+                continue
+            before = os.path.getsize(pack.packpath)
+            pack.compact()
+            logger.info('Compacted %s from %d to %d bytes', pack.packpath, \
+                        before, os.path.getsize(pack.packpath))
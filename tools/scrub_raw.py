@@ -0,0 +1,236 @@
+import sys
+import os
+import re
+import time
+import getopt
+import logging
+import datetime
+import multiprocessing
+
+from egazette.utils.file_storage import FileManager
+from egazette.utils import compression
+from egazette.utils import utils
+
+def print_usage(progname):
+    print('''Usage: %s [-l loglevel(critical, error, warn, info, debug)]
+                       [-p num_processes (default: number of cpus)]
+                       [-k (keep damaged files in place, only list them)]
+                       [-M (metatags are stored in pack files)]
+                       [-a max_tmp_age (hours after which temp files are removed, default 24)]
+                       [-s srcname -s srcname ...]
+                       -D datadir
+          ''' % progname)
+    print('Checks raw docs and metatags for damage. Damaged relurls are listed')
+    print('in datadir/scrub and their files are moved to datadir/quarantine so')
+    print('that the next sync of those days downloads them again.')
+
+storage = None
+
+def init_worker(datadir, metapacks):
+    global storage
+    storage = FileManager(datadir, False, False, metapacks = metapacks)
+
+def check_pdf(buf):
+    tail = buf[-1024:]
+    if b'%%EOF' not in tail:
+        return 'truncated pdf, no %%EOF at the end'
+
+    startxrefs = re.findall(b'startxref\\s+(\\d+)', tail)
+    if not startxrefs:
+        return 'no startxref at the end of the pdf'
+
+    offset = int(startxrefs[-1])
+    if offset >= len(buf):
+        return 'startxref %d is beyond the end of the pdf' % offset
+
+    return None
+
+def check_xref(buf):
+    # an xref table or an xref stream object must start at startxref.
+    # Readers recover from a small mismatch, so this is only a warning
+    offset = int(re.findall(b'startxref\\s+(\\d+)', buf[-1024:])[-1])
+    if re.match(b'\\s*(xref|\\d+\\s+\\d+\\s+obj)', buf[offset:offset + 64]):
+        return None
+    return 'no xref at startxref offset %d' % offset
+
+def check_relurl(relurl):
+    problems = []
+    warnings = []
+
+    rawkey = storage.find_rawfile(relurl)
+    if rawkey:
+        plainkey, suffix = compression.split_suffix(rawkey)
+        extension = plainkey.rsplit('.', 1)[-1]
+        try:
+            buf = storage.read_file(rawkey)
+        except Exception as e:
+            buf = None
+            problems.append(('raw', 'unreadable raw file: %s' % e))
+
+        if buf != None:
+            mtype = utils.get_buffer_type(buf)
+            if utils.get_file_extension(mtype) != extension:
+                problems.append(('raw', 'type %s does not match .%s' % (mtype, extension)))
+            elif extension == 'pdf':
+                problem = check_pdf(buf)
+                if problem:
+                    problems.append(('raw', problem))
+                else:
+                    warning = check_xref(buf)
+                    if warning:
+                        warnings.append(warning)
+
+    if storage.find_metafile(relurl):
+        try:
+            metainfo = storage.get_metainfo(relurl)
+        except Exception as e:
+            metainfo = None
+        if metainfo == None:
+            problems.append(('meta', 'metatags do not parse'))
+
+    return relurl, rawkey, problems, warnings
+
+def unique_relurls(relurls):
+    prev = None
+    for relurl in relurls:
+        if relurl != prev:
+            yield relurl
+        prev = relurl
+
+def quarantine(storage, datadir, relurl, rawkey, kinds):
+    keys = []
+    if 'raw' in kinds:
+        keys.append(rawkey)
+    if 'meta' in kinds and not storage.metastore:
+        keys.append(storage.find_metafile(relurl))
+
+    for key in keys:
+        destpath = os.path.join(datadir, 'quarantine', key)
+        os.makedirs(os.path.dirname(destpath), exist_ok = True)
+        os.replace(storage.backend.get_path(key), destpath)
+
+    if 'meta' in kinds and storage.metastore:
+        # the damaged record is copied aside and removed from its pack
+        try:
+            buf = storage.metastore.get(relurl)
+        except Exception:
+            buf = None
+        if buf != None:
+            destpath = os.path.join(datadir, 'quarantine', 'metapacks', \
+                                    '%s.xml' % relurl)
+            os.makedirs(os.path.dirname(destpath), exist_ok = True)
+            h = open(destpath, 'wb')
+            h.write(buf)
+            h.close()
+        storage.remove_metainfo(relurl)
+
+def clean_tmpfiles(dirname, max_age, logger):
+    # hidden temp files left behind by killed crawler processes
+    tmp_re  = re.compile('^\\..+\\.(tmp|link)\\d+$')
+    cutoff  = time.time() - max_age * 3600
+    removed = 0
+    for dirpath, dirnames, filenames in os.walk(dirname):
+        for filename in filenames:
+            filepath = os.path.join(dirpath, filename)
+            if tmp_re.match(filename) and os.path.getmtime(filepath) < cutoff:
+                logger.info('Removing stale temp file %s', filepath)
+                os.remove(filepath)
+                removed += 1
+    return removed
+
+if __name__ == '__main__':
+    progname  = sys.argv[0]
+    loglevel  = 'info'
+    datadir   = None
+    srcnames  = []
+    workers   = multiprocessing.cpu_count()
+    to_move   = True
+    metapacks = False
+    max_age   = 24
+
+    optlist, remlist = getopt.getopt(sys.argv[1:], 'a:D:hkl:Mp:s:')
+    for o, v in optlist:
+        if o == '-a':
+            max_age = int(v)
+        elif o == '-D':
+            datadir = v
+        elif o == '-k':
+            to_move = False
+        elif o == '-l':
+            loglevel = v
+        elif o == '-M':
+            metapacks = True
+        elif o == '-p':
+            workers = int(v)
+        elif o == '-s':
+            srcnames.append(v)
+        else:
+            print_usage(progname)
+            sys.exit(0)
+
+    leveldict = {'critical': logging.CRITICAL, 'error': logging.ERROR, \
+                 'warning': logging.WARNING, 'info': logging.INFO, \
+                 'debug': logging.DEBUG}
+
+    if datadir == None or loglevel not in leveldict:
+        print_usage(progname)
+        sys.exit(0)
+
+    logging.basicConfig(level = leveldict[loglevel], \
+                        format = '%(asctime)s: %(name)s: %(levelname)s %(message)s', \
+                        datefmt = '%Y-%m-%d %H:%M:%S')
+    logger = logging.getLogger('scrub')
+
+    init_worker(datadir, metapacks)
+    main_storage = storage
+
+    scrubdir = os.path.join(datadir, 'scrub')
+    utils.mk_dir(scrubdir)
+    reportfile = os.path.join(scrubdir, 'damaged-%s.txt' % \
+                              datetime.datetime.now().strftime('%Y-%m-%d-%H%M%S'))
+    report = open(reportfile, 'w')
+
+    srclist = os.listdir(main_storage.rawdir)
+    srclist.sort()
+
+    pool    = multiprocessing.Pool(workers, init_worker, (datadir, metapacks))
+    damaged = {}
+    for src in srclist:
+        if srcnames and src not in srcnames:
+            continue
+
+        clean_tmpfiles(os.path.join(main_storage.rawdir, src), max_age, logger)
+        clean_tmpfiles(os.path.join(main_storage.metadir, src), max_age, logger)
+
+        checked = 0
+        relurls = unique_relurls(main_storage.recursive_relurls(main_storage.rawdir, src))
+        for relurl, rawkey, problems, warnings in \
+                pool.imap_unordered(check_relurl, relurls, 32):
+            checked += 1
+            for warning in warnings:
+                logger.warn('%s: %s', relurl, warning)
+
+            if not problems:
+                continue
+
+            for kind, reason in problems:
+                logger.warn('Damaged %s %s: %s', kind, relurl, reason)
+                report.write('%s\t%s\t%s\n' % (relurl, kind, reason))
+            report.flush()
+
+            if to_move:
+                quarantine(main_storage, datadir, relurl, rawkey, \
+                           set([p[0] for p in problems]))
+
+            words = relurl.split('/')
+            damaged.setdefault(src, set()).add(words[1] if len(words) > 2 else '')
+
+        logger.info('Checked %d relurls of %s', checked, src)
+
+    pool.close()
+    pool.join()
+    report.close()
+
+    for src in sorted(damaged):
+        logger.info('Damaged docs in %s on %s', src, ', '.join(sorted(damaged[src])))
+    logger.info('Damaged relurls are listed in %s', reportfile)
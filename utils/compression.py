@@ -0,0 +1,45 @@
+import gzip
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# suffixes in the order they are looked up on disk
+SUFFIXES = ['zst', 'gz']
+
+def default_suffix():
+    if zstandard != None:
+        return 'zst'
+    return 'gz'
+
+def compress(buf, suffix):
+    if suffix == 'zst':
+        return zstandard.ZstdCompressor(level = 10).compress(buf)
+    elif suffix == 'gz':
+        # mtime is fixed so that identical documents compress identically
+        return gzip.compress(buf, mtime = 0)
+    return buf
+
+def decompress(buf, suffix):
+    if suffix == 'zst':
+        if zstandard == None:
+            raise IOError('zstandard module is needed to read zst files')
+        return zstandard.ZstdDecompressor().decompress(buf)
+    elif suffix == 'gz':
+        return gzip.decompress(buf)
+    return buf
+
+def split_suffix(filepath):
+    words = filepath.rsplit('.', 1)
+    if len(words) == 2 and words[1] in SUFFIXES:
+        return words[0], words[1]
+    return filepath, None
+
+def read_file(filepath):
+    h = open(filepath, 'rb')
+    buf = h.read()
+    h.close()
+
+    plainpath, suffix = split_suffix(filepath)
+    return decompress(buf, suffix)
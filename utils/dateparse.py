@@ -0,0 +1,131 @@
+import re
+import calendar
+import datetime
+import functools
+
+# month lookups are built once instead of scanning calendar.month_name or
+# calendar.month_abbr (which call strftime for every entry) on each call
+MONTH_NAMES = [m.lower() for m in calendar.month_name]
+MONTH_ABBRS = [m.lower() for m in calendar.month_abbr]
+
+MONTH_NUMS = dict([(m, i) for i, m in enumerate(MONTH_NAMES)])
+ABBR_NUMS  = dict([(m, i) for i, m in enumerate(MONTH_ABBRS)])
+
+MISSPELT_MONTHS = {'frbruary': 'february', 'februay': 'february'}
+
+# 05-Mar-2019
+DMON_RE  = re.compile('(?P<day>\d+)-(?P<month>%s)-(?P<year>\d+)' % \
+                      '|'.join(MONTH_ABBRS[1:]), re.IGNORECASE)
+# 5th March 2019
+TITLE_RE = re.compile(r'(?P<day>\d+)\s*(st|nd|rd|th)\s*(?P<month>%s)\s*(?P<year>\d{4})\b' % \
+                      '|'.join(MONTH_NAMES[1:]), re.IGNORECASE)
+# 5 Mar 2019
+DATESTR_RE = re.compile('(?P<day>\d+)\s*(?P<month>\w+)\s*(?P<year>\d+)')
+# 05/03/2019, 05-03-2019, 05.03.2019
+NUM_RE   = re.compile('\d+')
+
+CACHE_SIZE = 4096
+
+def memoized(func):
+    # the texts usually come from a parsed page, they are turned into plain
+    # strings so that the cache does not keep the page tree alive
+    cached = functools.lru_cache(maxsize = CACHE_SIZE)(func)
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        return cached(*[str(arg) for arg in args])
+
+    wrapper.cache_clear = cached.cache_clear
+    wrapper.cache_info  = cached.cache_info
+    return wrapper
+
+def month_to_num(month):
+    month = month.lower()
+    month = MISSPELT_MONTHS.get(month, month)
+    if month in MONTH_NUMS:
+        return MONTH_NUMS[month]
+    return ABBR_NUMS.get(month)
+
+def get_month_num(month, monthnames):
+    month = month.lower()
+    if monthnames is calendar.month_abbr:
+        return ABBR_NUMS.get(month, -1)
+    elif monthnames is calendar.month_name:
+        return MONTH_NUMS.get(month, -1)
+
+    i = 0
+    for m in monthnames:
+        if m.lower() == month:
+            return i
+        i += 1
+    return -1
+
+def make_date(year, month, day):
+    try:
+        return datetime.date(int(year), int(month), int(day))
+    except (ValueError, TypeError):
+        return None
+
+@memoized
+def to_dateobj(x):
+    reobj = DMON_RE.search(x)
+    if reobj:
+        groupdict = reobj.groupdict()
+        month = ABBR_NUMS[groupdict['month'].lower()]
+        return datetime.date(int(groupdict['year']), month, int(groupdict['day']))
+
+    return None
+
+@memoized
+def get_date_from_title(title):
+    reobj = TITLE_RE.search(title)
+    if not reobj:
+        return None
+
+    groupdict = reobj.groupdict()
+    month_num = MONTH_NUMS.get(groupdict['month'].lower(), -1)
+    if month_num <= 0:
+        return None
+
+    return make_date(groupdict['year'], month_num, groupdict['day'])
+
+@memoized
+def parse_datestr(datestr):
+    reobj = DATESTR_RE.search(datestr)
+    if reobj:
+        groupdict = reobj.groupdict()
+        month_num = ABBR_NUMS.get(groupdict['month'].lower(), -1)
+        if month_num <= 0:
+            return None
+        try:
+            return datetime.datetime(int(groupdict['year']), month_num, \
+                                     int(groupdict['day']))
+        except ValueError:
+            return None
+
+    return None
+
+@memoized
+def dmy_to_date(txt):
+    # day, month and year as the only three numbers in the text
+    nums = NUM_RE.findall(txt)
+    if len(nums) != 3:
+        return None
+    return make_date(nums[2], nums[1], nums[0])
+
+@memoized
+def abbr_to_date(year, month, day):
+    # the year, month abbreviation and day arguments of StGeorge loadFullImg
+    month_num = ABBR_NUMS.get(month.lower(), -1)
+    if month_num <= 0:
+        return None
+    return make_date(year, month_num, day)
+
+def parse_dates(parser, txts):
+    # batch form for listing pages: every distinct text is parsed once and
+    # the dates come back in the order of txts
+    dates = {}
+    for txt in txts:
+        if txt not in dates:
+            dates[txt] = parser(txt)
+    return [dates[txt] for txt in txts]
@@ -17,10 +17,12 @@ def sync(hostname, gazetteobjs, fromdate, todate, event):
             obj.sync_daily(event)
         else:    
             obj.sync(fromdate, todate, event)
+        obj.storage_manager.flush()
 
 def all_downloads(hostname, gazetteobjs, event):
     for obj in gazetteobjs:
         obj.all_downloads(event)
+        obj.storage_manager.flush()
 
 def agg_host_processes(gazetteobjs, all_dls, fromdate, todate, event):
     srcdict = {}
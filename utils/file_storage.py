@@ -1,28 +1,138 @@
 import os
 import logging
-import glob
 import time
+import hashlib
+import threading
+import collections
+import concurrent.futures
 
 from . import utils
 from . import xml_ops
+from . import compression
+from .journal import ChangeJournal
+from .metapack import MetaPackStore
+from .storage_backend import AtomicWriter, LocalBackend
 
 def mk_dir(dirname):
     if not os.path.exists(dirname):
         os.mkdir(dirname)
 
+class RelurlEntry:
+    def __init__(self, relurl, rawpath, raw_mtime, metapath, meta_mtime):
+        self.relurl     = relurl
+        self.rawpath    = rawpath
+        self.raw_mtime  = raw_mtime
+        self.metapath   = metapath
+        self.meta_mtime = meta_mtime
+
+class MetaInfoCache:
+    # LRU of parsed metatags. An entry is used only while the stamp (path,
+    # mtime, size) of the stored metatags still matches
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.lock    = threading.Lock()
+
+    def get(self, relurl, stamp):
+        with self.lock:
+            entry = self.entries.get(relurl)
+            if entry == None or entry[0] != stamp:
+                return None
+            self.entries.move_to_end(relurl)
+            return entry[1]
+
+    def put(self, relurl, stamp, metainfo):
+        if self.maxsize <= 0:
+            return
+
+        with self.lock:
+            self.entries[relurl] = (stamp, metainfo)
+            self.entries.move_to_end(relurl)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last = False)
+
+    def remove(self, relurl):
+        with self.lock:
+            self.entries.pop(relurl, None)
 
 class FileManager:
-    def __init__(self, basedir, updateMeta, updateRaw):
+    def __init__(self, basedir, updateMeta, updateRaw, dedup = False, \
+                 fsync_batch = 0, compress = False, metapacks = False, \
+                 backend = None, metacache_size = 1024):
         self.logger = logging.getLogger('judis.filemanager')
 
         self.rawdir = os.path.join(basedir, 'raw')
         self.metadir = os.path.join(basedir, 'metatags')
+        self.blobdir = os.path.join(basedir, 'blobs')
+
+        # raw docs and metatags go through the backend. basedir always
+        # holds the local state (journal, stats, metapacks)
+        if backend == None:
+            backend = LocalBackend(basedir, fsync_batch)
+        self.backend     = backend
+        self.fsync_batch = fsync_batch
+
+        self.writer = None
+        if isinstance(backend, LocalBackend):
+            self.writer = backend.writer
+        elif dedup or metapacks:
+            self.logger.warn('Dedup and metapacks need a local store. Ignoring them')
+            dedup     = False
+            metapacks = False
 
         self.updateRaw  = updateRaw
         self.updateMeta = updateMeta
+        self.dedup      = dedup
+
+        # non-PDF raw docs and metadata are optionally stored compressed
+        self.compress_suffix = None
+        if compress:
+            self.compress_suffix = compression.default_suffix()
+        self.compress_exts = ['html', 'txt', 'ps', 'unkwn']
+        # every extension utils.get_file_extension gives to a raw doc
+        self.raw_exts      = ['html', 'pdf', 'png', 'ps', 'txt', 'unkwn']
+
+        if self.writer:
+            mk_dir(self.rawdir)
+            mk_dir(self.metadir)
+        if self.dedup:
+            mk_dir(self.blobdir)
+
+        # metadata optionally goes into per source/month pack files
+        # instead of one small xml file per document
+        self.metastore = None
+        if metapacks:
+            self.metastore = MetaPackStore(os.path.join(basedir, 'metapacks'))
+
+        self.journal   = ChangeJournal(os.path.join(basedir, 'journal'))
+        self.metacache = MetaInfoCache(metacache_size)
+
+        self.group        = None
+        self.unjournalled = []
+        self.metadirty    = 0
+
+    def start_group(self, relurl):
+        group = os.path.dirname(relurl)
+        if group != self.group:
+            self.flush()
+            self.group = group
 
-        mk_dir(self.rawdir)
-        mk_dir(self.metadir)
+    def log_change(self, kind, relurl):
+        self.unjournalled.append((kind, relurl))
+        if not self.backend.pending() and not self.metadirty:
+            self.flush()
+        elif self.backend.is_full() or \
+                (self.metadirty >= self.fsync_batch > 0):
+            self.flush()
+
+    def flush(self):
+        self.backend.commit()
+        if self.metadirty:
+            self.metastore.sync()
+            self.metadirty = 0
+        for kind, relurl in self.unjournalled:
+            self.journal.append(kind, relurl)
+        self.unjournalled = []
 
     def create_dirs(self, dirname, relurl):
         words = relurl.split('/')
@@ -30,109 +140,472 @@ class FileManager:
             dirname = os.path.join(dirname, word)
             mk_dir(dirname)
 
+    def get_rawkey(self, relurl):
+        return 'raw/%s' % relurl
+
+    def get_metakey(self, relurl):
+        return 'metatags/%s.xml' % relurl
+
+    def get_variants(self, key):
+        variants = [key]
+        for suffix in compression.SUFFIXES:
+            variants.append('%s.%s' % (key, suffix))
+        return variants
+
+    def remove_variants(self, key, keep):
+        for filekey in self.get_variants(key):
+            if filekey != keep and self.backend.exists(filekey):
+                self.backend.remove(filekey)
+
+    def find_metafile(self, relurl):
+        if self.metastore:
+            if self.metastore.exists(relurl):
+                return self.metastore.get_path(relurl)
+            return None
+
+        metakey, stat = self.find_metafile_stat(relurl)
+        return metakey
+
+    def find_metafile_stat(self, relurl):
+        # the few possible names are probed directly, listing the date
+        # directory would cost as much as the number of files in it
+        for key in self.get_variants(self.get_metakey(relurl)):
+            stat = self.backend.stat(key)
+            if stat != None:
+                return key, stat
+        return None, None
+
+    def find_rawfile(self, relurl):
+        rawkey = self.get_rawkey(relurl)
+        if not self.writer:
+            # one prefix listing is a single request to a remote store
+            for key, stat in self.backend.list('%s.' % rawkey):
+                return key
+            return None
+
+        # on a local store the possible names are probed, in the sorted
+        # order a listing would give them, instead of scanning the day
+        keys = []
+        for extension in self.raw_exts:
+            keys.extend(self.get_variants('%s.%s' % (rawkey, extension)))
+        keys.sort()
+
+        for key in keys:
+            if self.backend.exists(key):
+                return key
+        return None
+
+    def read_file(self, key):
+        h = self.backend.get(key)
+        buf = h.read()
+        h.close()
+
+        plainkey, suffix = compression.split_suffix(key)
+        return compression.decompress(buf, suffix)
+
     def get_metainfo(self, relurl):
-        metapath = os.path.join(self.metadir, '%s.xml' % relurl)
-        if os.path.exists(metapath):
-            return xml_ops.read_tag_file(metapath, relurl)
+        if self.metastore:
+            entry = self.metastore.lookup(relurl)
+            if entry == None:
+                return None
+            stamp = (self.metastore.get_path(relurl), entry.offset, entry.length)
+        else:
+            metakey, stat = self.find_metafile_stat(relurl)
+            if metakey == None:
+                return None
+            stamp = (metakey, stat.mtime, stat.size)
+
+        # callers are free to modify what they get, so only copies leave
+        # the cache
+        metainfo = self.metacache.get(relurl, stamp)
+        if metainfo != None:
+            return metainfo.copy()
+
+        if self.metastore:
+            buf = self.metastore.get(relurl)
+        else:
+            buf = self.read_file(metakey)
+
+        metainfo = None
+        if buf:
+            metainfo = xml_ops.xml_to_tagdict(relurl, buf)
+        if metainfo != None:
+            self.metacache.put(relurl, stamp, metainfo)
+            metainfo = metainfo.copy()
+        return metainfo
+
+    def prefetch_metainfos(self, relurls, workers = 4):
+        # parses the metatags of relurls in threads so that the
+        # get_metainfo calls that follow are served from the cache
+        if self.metacache.maxsize <= 0:
+            return 0
+
+        relurls = list(relurls)[-self.metacache.maxsize:]
+        with concurrent.futures.ThreadPoolExecutor(max_workers = workers) as executor:
+            metainfos = list(executor.map(self.get_metainfo, relurls))
+        return len([m for m in metainfos if m != None])
+
+    def read_rawdoc(self, relurl):
+        rawkey = self.find_rawfile(relurl)
+        if rawkey:
+            return self.read_file(rawkey)
+        return None
+
+    def get_plain_file(self, key, tmpdir):
+        plainkey, suffix = compression.split_suffix(key)
+        if suffix == None and self.writer:
+            return self.backend.get_path(key)
+
+        tmppath = os.path.join(tmpdir, os.path.basename(plainkey))
+        h = open(tmppath, 'wb')
+        h.write(self.read_file(key))
+        h.close()
+        return tmppath
+
+    def get_plain_rawfile(self, relurl, tmpdir):
+        rawkey = self.find_rawfile(relurl)
+        if rawkey:
+            return self.get_plain_file(rawkey, tmpdir)
+        return None
+
+    def get_plain_metafile(self, relurl, tmpdir):
+        if not self.metastore:
+            metakey = self.find_metafile(relurl)
+            if metakey:
+                return self.get_plain_file(metakey, tmpdir)
+            return None
 
-        return None   
+        buf = self.metastore.get(relurl)
+        if buf == None:
+            return None
+
+        tmppath = os.path.join(tmpdir, '%s.xml' % os.path.basename(relurl))
+        h = open(tmppath, 'wb')
+        h.write(buf)
+        h.close()
+        return tmppath
          
     def get_rawfile_path(self, relurl):
-        rawpath  = os.path.join(self.rawdir, relurl)
-        rawpaths = glob.glob('%s.*' % rawpath)
-        if rawpaths:
-            return rawpaths[0]
+        rawkey = self.find_rawfile(relurl)
+        if rawkey:
+            return self.backend.get_url(rawkey)
 
         return None    
 
     def get_metafile_path(self, relurl):
-        metapath = os.path.join(self.metadir, '%s.xml' % relurl)
-        if os.path.exists(metapath):
-            return metapath
-        return None    
+        metakey = self.find_metafile(relurl)
+        if metakey and not self.metastore:
+            return self.backend.get_url(metakey)
+        return metakey
 
     def save_metainfo(self, court, relurl, metainfo):
-        self.create_dirs(self.metadir, relurl)
+        if metainfo and (self.updateMeta or not self.find_metafile(relurl)):
+            self.start_group(relurl)
+            self.metacache.remove(relurl)
+            buf      = xml_ops.tag_file_bytes(metainfo)
+            if self.metastore:
+                if self.compress_suffix:
+                    buf = compression.compress(buf, self.compress_suffix)
+                self.metastore.put(relurl, buf, self.compress_suffix)
+                if self.fsync_batch > 0:
+                    self.metadirty += 1
+                self.log_change('meta', relurl)
+                return True
 
-        metapath = os.path.join(self.metadir, '%s.xml' % relurl)
+            metakey = self.get_metakey(relurl)
+            filekey = metakey
+            if self.compress_suffix:
+                filekey = '%s.%s' % (metakey, self.compress_suffix)
+                buf     = compression.compress(buf, self.compress_suffix)
 
-        if metainfo and (self.updateMeta or not os.path.exists(metapath)):
-            xml_ops.print_tag_file(metapath, metainfo)
+            self.save_binary_file(filekey, buf)
+            self.remove_variants(metakey, filekey)
+            self.log_change('meta', relurl)
             return True
         return False 
 
+    def remove_metainfo(self, relurl):
+        self.metacache.remove(relurl)
+        if self.metastore:
+            removed = self.metastore.remove(relurl)
+        else:
+            metakey = self.find_metafile(relurl)
+            removed = (metakey != None)
+            if removed:
+                self.backend.remove(metakey)
+
+        if removed:
+            self.log_change('remove', relurl)
+        return removed
+
     def download_stats(self, start_time, end_time):
         return None, None
         
-    def save_binary_file(self, filepath, buf):
-        h = open(filepath, 'wb')
-        h.write(buf)
-        h.close()
+    def save_binary_file(self, key, buf):
+        self.backend.put(key, buf)
 
     def should_download_raw(self, relurl, judge_url, validurl = True):
-        rawpath  = os.path.join(self.rawdir, relurl)
-        return self.updateRaw or not glob.glob('%s.*' % rawpath)
+        return self.updateRaw or not self.find_rawfile(relurl)
 
     def get_file_extension(self, doc):
         mtype = utils.get_buffer_type(doc)
         return utils.get_file_extension(mtype)
 
     def save_rawdoc(self, court, relurl, encoding, doc):
-        self.create_dirs(self.rawdir, relurl)
-        rawpath  = os.path.join(self.rawdir, relurl)
-
-        if doc and (self.updateRaw or not glob.glob('%s.*' % rawpath)):
+        if doc and (self.updateRaw or not self.find_rawfile(relurl)):
+            self.start_group(relurl)
             extension = self.get_file_extension(doc)
-            self.save_binary_file('%s.%s' % (rawpath, extension), doc)
+            plainkey  = '%s.%s' % (self.get_rawkey(relurl), extension)
+            filekey   = plainkey
+            if self.compress_suffix and extension in self.compress_exts:
+                filekey = '%s.%s' % (plainkey, self.compress_suffix)
+                doc     = compression.compress(doc, self.compress_suffix)
+
+            if self.dedup:
+                self.create_dirs(self.rawdir, relurl)
+                if not self.save_blob_link(self.backend.get_path(filekey), doc):
+                    self.logger.info('Identical rawfile already stored for %s', relurl)
+                    return False
+            else:
+                self.save_binary_file(filekey, doc)
+            self.remove_variants(plainkey, filekey)
+            self.log_change('raw', relurl)
             return True
         return False
-        
+
+    def get_blob_path(self, digest):
+        return os.path.join(self.blobdir, digest[:2], digest[2:4], digest)
+
+    def get_blob_digest(self, filepath):
+        sha = hashlib.sha256()
+        h = open(filepath, 'rb')
+        while True:
+            buf = h.read(1024 * 1024)
+            if not buf:
+                break
+            sha.update(buf)
+        h.close()
+        return sha.hexdigest()
+
+    def is_same_file(self, filepath1, filepath2):
+        try:
+            return os.path.samefile(filepath1, filepath2)
+        except OSError:
+            return False
+
+    def save_blob_link(self, filepath, doc):
+        digest   = hashlib.sha256(doc).hexdigest()
+        blobpath = self.get_blob_path(digest)
+
+        if self.is_same_file(filepath, blobpath):
+            return False
+
+        self.create_dirs(self.blobdir, os.path.relpath(blobpath, self.blobdir))
+        if os.path.exists(filepath) and \
+                os.path.getsize(filepath) == len(doc) and \
+                self.get_blob_digest(filepath) == digest:
+            # identical copy stored before deduplication was turned on
+            self.adopt_blob(filepath, blobpath)
+            return False
+
+        if not self.writer.exists(blobpath):
+            self.writer.write(blobpath, doc)
+
+        if not self.link_file(blobpath, filepath):
+            self.writer.write(filepath, doc)
+        return True
+
+    def adopt_blob(self, filepath, blobpath):
+        if self.writer.exists(blobpath):
+            return self.link_file(blobpath, filepath)
+
+        self.link_file(filepath, blobpath)
+        return False
+
+    def link_file(self, srcpath, filepath):
+        try:
+            self.writer.link(srcpath, filepath)
+        except OSError as e:
+            self.logger.warn('Could not link %s to %s: %s', filepath, srcpath, e)
+            return False
+        return True
+
+    def dedup_rawfile(self, relurl):
+        rawpath = self.get_rawfile_path(relurl)
+        if not rawpath:
+            return False
+
+        blobpath = self.get_blob_path(self.get_blob_digest(rawpath))
+        if self.is_same_file(rawpath, blobpath):
+            return False
+
+        self.create_dirs(self.blobdir, os.path.relpath(blobpath, self.blobdir))
+        return self.adopt_blob(rawpath, blobpath)
+
+    def gc_blobs(self):
+        removed = 0
+        for dirpath, dirnames, filenames in os.walk(self.blobdir):
+            for filename in filenames:
+                blobpath = os.path.join(dirpath, filename)
+                if os.stat(blobpath).st_nlink <= 1:
+                    os.remove(blobpath)
+                    removed += 1
+        return removed
+
 
     def recursive_relurls(self, datadir, relurl):
+        for entry in self.scan_entries(datadir, relurl):
+            yield entry[0]
+
+    def scan_entries(self, datadir, relurl):
         current_dir = os.path.join(datadir, relurl)
-        if os.path.isfile(current_dir):
-            tmprel = relurl.rsplit('.', 1)[0]
-            yield tmprel
+        try:
+            with os.scandir(current_dir) as it:
+                entries = [e for e in it if not e.name.startswith('.')]
+        except (FileNotFoundError, NotADirectoryError):
+            return
 
-        if os.path.isdir(current_dir):
-            filenames = os.listdir(current_dir)
-            filenames.sort()
-            for filename in filenames:
-                tmprel = os.path.join(relurl, filename)
-                for rel1 in self.recursive_relurls(datadir, tmprel):
-                    yield rel1
-                
-                    
-    def find_matching_relurls(self, srcs, start_ts, end_ts):         
+        entries.sort(key = lambda e: e.name)
+        for entry in entries:
+            tmprel = os.path.join(relurl, entry.name)
+            if entry.is_dir():
+                for x in self.scan_entries(datadir, tmprel):
+                    yield x
+            elif entry.is_file():
+                tmprel, suffix = compression.split_suffix(tmprel)
+                yield tmprel.rsplit('.', 1)[0], entry
+
+    def scan_metafiles(self, relurl):
+        metafiles = {}
+        try:
+            with os.scandir(os.path.join(self.metadir, relurl)) as it:
+                for entry in it:
+                    name, suffix = compression.split_suffix(entry.name)
+                    if name.endswith('.xml') and not name.startswith('.') \
+                            and entry.is_file():
+                        metafiles[name[:-4]] = entry
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+        return metafiles
+
+    def scan_backend_src(self, src):
+        # a remote store is listed by prefix, one listing per source
+        metakeys = {}
+        for key, stat in self.backend.list('metatags/%s/' % src):
+            name, suffix = compression.split_suffix(key[len('metatags/'):])
+            if name.endswith('.xml'):
+                metakeys[name[:-4]] = (key, stat)
+
+        for key, stat in self.backend.list('raw/%s/' % src):
+            name, suffix = compression.split_suffix(key[len('raw/'):])
+            relurl = name.rsplit('.', 1)[0]
+            if relurl not in metakeys:
+                continue
+
+            metakey, metastat = metakeys[relurl]
+            yield RelurlEntry(relurl, self.backend.get_url(key), stat.mtime, \
+                              self.backend.get_url(metakey), metastat.mtime)
+
+    def scan_src(self, src):
+        if not self.writer:
+            for entry in self.scan_backend_src(src):
+                yield entry
+            return
+
+        # the matching metatags directory is listed once per raw directory
+        # and the stat results of both DirEntry objects are reused
+        metadirs = {}
+        for relurl, rawentry in self.scan_entries(self.rawdir, src):
+            if self.metastore:
+                packentry = self.metastore.lookup(relurl)
+                if packentry != None:
+                    yield RelurlEntry(relurl, rawentry.path, \
+                                      rawentry.stat().st_mtime, \
+                                      self.metastore.get_path(relurl), \
+                                      packentry.mtime)
+                continue
+
+            dirname, filename = os.path.split(relurl)
+            if dirname not in metadirs:
+                if len(metadirs) >= 64:
+                    metadirs.clear()
+                metadirs[dirname] = self.scan_metafiles(dirname)
+
+            metaentry = metadirs[dirname].get(filename)
+            if metaentry == None:
+                continue
+
+            yield RelurlEntry(relurl, rawentry.path, rawentry.stat().st_mtime, \
+                              metaentry.path, metaentry.stat().st_mtime)
+
+    def scan_relurls(self, srcs, workers = 1):
         srcs = set(srcs)
 
+        srclist = self.backend.list_dirs('raw/')
+        srclist.sort()
+        srclist = [src for src in srclist if not srcs or src in srcs]
+
+        if workers <= 1:
+            for src in srclist:
+                for entry in self.scan_src(src):
+                    yield entry
+            return
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers = workers) as executor:
+            for entries in executor.map(lambda src: list(self.scan_src(src)), srclist):
+                for entry in entries:
+                    yield entry
+
+    def find_matching_relurls(self, srcs, start_ts, end_ts, workers = 1):
         if start_ts:
             start_ts = time.mktime(start_ts.timetuple())
 
         if end_ts:
             end_ts = time.mktime(end_ts.timetuple())
 
-        srclist = os.listdir(self.rawdir)
-        srclist.sort()
-        for src in srclist:
-            if srcs and src not in srcs:
+        for entry in self.scan_relurls(srcs, workers):
+            if start_ts != None and entry.raw_mtime < start_ts \
+                    and entry.meta_mtime < start_ts:
                 continue
-      
-            for relurl in self.recursive_relurls(self.rawdir, src):
-                rawpath   = self.get_rawfile_path(relurl)
-                metapath  = self.get_metafile_path(relurl)
 
-                if not os.path.isfile(rawpath):
-                    continue
+            if end_ts != None and entry.raw_mtime > end_ts \
+                    and entry.meta_mtime > end_ts:
+                continue
+            yield entry.relurl
 
-                if not metapath or not os.path.isfile(metapath):
-                    continue
+    def get_cursor(self, consumer):
+        return self.journal.get_cursor(consumer)
 
-                if start_ts != None and os.path.getmtime(rawpath) < start_ts \
-                        and  os.path.getmtime(metapath) < start_ts:
-                    continue 
+    def save_cursor(self, cursor):
+        self.journal.save_cursor(cursor)
+
+    def get_retries(self, consumer):
+        return self.journal.get_retries(consumer)
+
+    def save_retries(self, consumer, relurls):
+        self.journal.save_retries(consumer, relurls)
+
+    def find_changed_relurls(self, srcs, cursor, retries = None):
+        srcs = set(srcs)
+        seen = set()
+
+        if retries:
+            for relurl in retries:
+                if relurl not in seen:
+                    seen.add(relurl)
+                    yield relurl
+
+        for seqnum, ts, kind, relurl in self.journal.read(cursor):
+            if relurl in seen:
+                continue
+
+            src = relurl.split('/')[0]
+            if srcs and src not in srcs:
+                continue
+
+            if not self.get_rawfile_path(relurl) or \
+                    not self.get_metafile_path(relurl):
+                continue
 
-                if end_ts != None and os.path.getmtime(rawpath) > end_ts \
-                        and  os.path.getmtime(metapath) > end_ts:
-                    continue 
-                yield relurl    
+            seen.add(relurl)
+            yield relurl
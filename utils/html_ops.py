@@ -0,0 +1,131 @@
+import lxml.html
+from lxml import etree
+from bs4.dammit import EncodingDetector
+
+try:
+    from lxml.cssselect import CSSSelector
+except ImportError:
+    CSSSelector = None
+
+# sources that set self.parser to HTML_PARSER get lxml.html trees from
+# utils.parse_webpage instead of BeautifulSoup ones
+HTML_PARSER = 'lxml.html'
+
+SKIP_TAGS   = frozenset(['style', 'script'])
+WALK_EVENTS = ('start', 'end', 'comment', 'pi')
+
+html_parsers = {}
+xpaths       = {}
+selectors    = {}
+
+def get_html_parser(encoding):
+    parser = html_parsers.get(encoding)
+    if parser == None:
+        parser = lxml.html.HTMLParser(encoding = encoding)
+        html_parsers[encoding] = parser
+    return parser
+
+def get_encoding(webpage):
+    encoding = EncodingDetector.find_declared_encoding(webpage, is_html = True)
+    if encoding:
+        return encoding
+
+    try:
+        webpage.decode('utf8')
+    except UnicodeDecodeError:
+        return 'cp1252'
+    return 'utf8'
+
+def parse_html(webpage, encoding = None):
+    try:
+        if isinstance(webpage, bytes):
+            if encoding == None:
+                encoding = get_encoding(webpage)
+            return lxml.html.document_fromstring(webpage, \
+                                parser = get_html_parser(encoding))
+        return lxml.html.document_fromstring(webpage)
+    except (etree.ParserError, LookupError, ValueError):
+        return None
+
+def is_element(node):
+    return isinstance(node, etree._Element)
+
+def get_text(node):
+    # same output as utils.get_tag_contents on a BeautifulSoup tree:
+    # comments, style and script are dropped and every child element
+    # other than span is preceded by a space. iterwalk keeps it
+    # iterative so deeply nested pages do not hit the recursion limit.
+    if not is_element(node):
+        return '%s' % node
+
+    retval = []
+    skip   = 0
+    for event, element in etree.iterwalk(node, events = WALK_EVENTS):
+        if element is node:
+            if event == 'start' and node.text:
+                retval.append(node.text)
+            continue
+
+        if event == 'start':
+            if skip or element.tag in SKIP_TAGS:
+                skip += 1
+                continue
+
+            if element.tag != 'span':
+                retval.append(' ')
+            if element.text:
+                retval.append(element.text)
+        elif event == 'end':
+            if skip:
+                skip -= 1
+            if element.tail and not skip:
+                retval.append(element.tail)
+        elif element.tail and not skip:
+            # comments and processing instructions, only their tail is text
+            retval.append(element.tail)
+
+    return ''.join(retval)
+
+def xpath(node, path, **variables):
+    compiled = xpaths.get(path)
+    if compiled == None:
+        compiled = etree.XPath(path)
+        xpaths[path] = compiled
+    return compiled(node, **variables)
+
+def select(node, css):
+    if CSSSelector == None:
+        raise ImportError('cssselect module is needed for css selectors')
+
+    selector = selectors.get(css)
+    if selector == None:
+        selector = CSSSelector(css)
+        selectors[css] = selector
+    return selector(node)
+
+def find(node, tagname):
+    # first descendant with the tag, like find() on a BeautifulSoup tag
+    for element in node.iterdescendants(tagname):
+        return element
+    return None
+
+def find_all(node, tagname):
+    return list(node.iterdescendants(tagname))
+
+def extract(element):
+    # removes the element but, as in BeautifulSoup, the text following
+    # it stays in the parent
+    parent = element.getparent()
+    if parent == None:
+        return element
+
+    if element.tail:
+        prev = element.getprevious()
+        if prev != None:
+            prev.tail = (prev.tail or '') + element.tail
+        else:
+            parent.text = (parent.text or '') + element.tail
+        element.tail = None
+
+    parent.remove(element)
+    return element
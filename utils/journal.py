@@ -0,0 +1,152 @@
+import os
+import fcntl
+import time
+import logging
+
+def mk_dir(dirname):
+    if not os.path.exists(dirname):
+        os.mkdir(dirname)
+
+class JournalCursor:
+    def __init__(self, name, seqnum = 0, offset = 0):
+        self.name   = name
+        self.seqnum = seqnum
+        self.offset = offset
+
+    def advance(self, seqnum, offset):
+        self.seqnum = seqnum
+        self.offset = offset
+
+class ChangeJournal:
+    # one record per saved or removed file: seqnum, timestamp,
+    # kind (raw|meta|remove), relurl
+    def __init__(self, journaldir):
+        self.logger = logging.getLogger('judis.journal')
+
+        self.journaldir = journaldir
+        self.logfile    = os.path.join(journaldir, 'changes.log')
+        self.cursordir  = os.path.join(journaldir, 'cursors')
+
+        mk_dir(self.journaldir)
+        mk_dir(self.cursordir)
+
+    def append(self, kind, relurl):
+        # opened afresh every time so that flock works across the forked
+        # crawler processes that share one FileManager
+        filehandle = open(self.logfile, 'a+b')
+        fcntl.flock(filehandle, fcntl.LOCK_EX)
+        try:
+            seqnum = self.last_seqnum(filehandle) + 1
+            record = '%d\t%d\t%s\t%s\n' % (seqnum, int(time.time()), kind, relurl)
+            filehandle.write(record.encode('utf8'))
+            filehandle.flush()
+        finally:
+            fcntl.flock(filehandle, fcntl.LOCK_UN)
+            filehandle.close()
+        return seqnum
+
+    def last_seqnum(self, filehandle):
+        filehandle.seek(0, os.SEEK_END)
+        end = filehandle.tell()
+        if end == 0:
+            return 0
+
+        chunk = 4096
+        while True:
+            start = max(0, end - chunk)
+            filehandle.seek(start)
+            tail = filehandle.read(end - start)
+
+            lastpos = tail.rfind(b'\n')
+            if lastpos < 0 and start > 0:
+                chunk *= 2
+                continue
+
+            if lastpos != len(tail) - 1:
+                # a torn record left behind by a killed writer
+                self.logger.warn('Truncating partial record at the end of %s', self.logfile)
+                filehandle.truncate(start + lastpos + 1)
+                tail = tail[:lastpos + 1]
+                if lastpos < 0:
+                    return 0
+
+            prevpos = tail.rfind(b'\n', 0, len(tail) - 1)
+            if prevpos < 0 and start > 0:
+                chunk *= 2
+                continue
+
+            line = tail[prevpos + 1:]
+            return int(line.split(b'\t', 1)[0])
+
+    def get_cursor(self, name):
+        cursorfile = os.path.join(self.cursordir, name)
+        if not os.path.exists(cursorfile):
+            return JournalCursor(name)
+
+        filehandle = open(cursorfile, 'r')
+        words = filehandle.read().split()
+        filehandle.close()
+
+        if len(words) != 2:
+            self.logger.warn('Malformed cursor %s. Starting from the beginning', name)
+            return JournalCursor(name)
+
+        return JournalCursor(name, int(words[0]), int(words[1]))
+
+    def save_cursor(self, cursor):
+        cursorfile = os.path.join(self.cursordir, cursor.name)
+        self.write_file(cursorfile, '%d %d\n' % (cursor.seqnum, cursor.offset))
+
+    def get_retries(self, name):
+        # relurls the consumer failed on after its cursor moved past them
+        retryfile = os.path.join(self.cursordir, '%s.retry' % name)
+        if not os.path.exists(retryfile):
+            return []
+
+        filehandle = open(retryfile, 'r')
+        relurls = [line.strip() for line in filehandle if line.strip()]
+        filehandle.close()
+        return relurls
+
+    def save_retries(self, name, relurls):
+        retryfile = os.path.join(self.cursordir, '%s.retry' % name)
+        if not relurls:
+            if os.path.exists(retryfile):
+                os.remove(retryfile)
+            return
+
+        self.write_file(retryfile, ''.join(['%s\n' % r for r in relurls]))
+
+    def write_file(self, filepath, content):
+        tmpfile    = '%s.tmp%d' % (filepath, os.getpid())
+
+        filehandle = open(tmpfile, 'w')
+        filehandle.write(content)
+        filehandle.flush()
+        os.fsync(filehandle.fileno())
+        filehandle.close()
+
+        os.replace(tmpfile, filepath)
+
+    def read(self, cursor):
+        if not os.path.exists(self.logfile):
+            return
+
+        filehandle = open(self.logfile, 'rb')
+        filehandle.seek(cursor.offset)
+        offset = cursor.offset
+        for line in filehandle:
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+
+            words = line.decode('utf8').rstrip('\n').split('\t', 3)
+            if len(words) != 4:
+                self.logger.warn('Malformed journal record at offset %d', offset)
+                continue
+
+            seqnum = int(words[0])
+            cursor.advance(seqnum, offset)
+            yield seqnum, int(words[1]), words[2], words[3]
+
+        filehandle.close()
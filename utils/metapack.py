@@ -0,0 +1,287 @@
+import os
+import re
+import time
+import fcntl
+import logging
+import threading
+
+from . import compression
+
+def mk_dir(dirname):
+    if not os.path.exists(dirname):
+        os.mkdir(dirname)
+
+# index lines are fixed width up to the relurl so that an updated record
+# can be superseded by overwriting its offset/length in place
+INDEX_FORMAT = '%016d %010d %010d %-3s %s\n'
+INDEX_PREFIX = 16 + 1 + 10 + 1 + 10 + 1 + 3 + 1
+# codec of a removed record, its index line is skipped when loading
+REMOVED_CODEC = 'del'
+
+class IndexEntry:
+    def __init__(self, offset, length, mtime, codec, linepos):
+        self.offset  = offset
+        self.length  = length
+        self.mtime   = mtime
+        self.codec   = codec
+        self.linepos = linepos
+
+class MetaPack:
+    def __init__(self, packpath, indexpath):
+        self.logger    = logging.getLogger('judis.metapack')
+        self.packpath  = packpath
+        self.indexpath = indexpath
+
+        self.entries   = {}
+        self.indexsize = 0
+        self.indexstat = None
+        self.lock      = threading.Lock()
+
+    def get_indexstat(self):
+        try:
+            st = os.stat(self.indexpath)
+        except FileNotFoundError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def refresh(self):
+        # reloads the index if some other process has written to it
+        with self.lock:
+            indexstat = self.get_indexstat()
+            if indexstat == self.indexstat:
+                return
+
+            entries = {}
+            linepos = 0
+            if indexstat != None:
+                h = open(self.indexpath, 'rb')
+                for line in h:
+                    if not line.endswith(b'\n'):
+                        break
+                    self.parse_index_line(entries, line, linepos)
+                    linepos += len(line)
+                h.close()
+
+            self.entries   = entries
+            self.indexsize = linepos
+            self.indexstat = indexstat
+
+    def parse_index_line(self, entries, line, linepos):
+        prefix = line[:INDEX_PREFIX].split()
+        relurl = line[INDEX_PREFIX:-1].decode('utf8')
+        if len(prefix) != 4 or not relurl:
+            self.logger.warn('Malformed index line at %d in %s', linepos, self.indexpath)
+            return
+
+        codec = prefix[3].decode('ascii')
+        if codec == REMOVED_CODEC:
+            return
+        if codec == '-':
+            codec = None
+        entries[relurl] = IndexEntry(int(prefix[0]), int(prefix[1]), \
+                                     int(prefix[2]), codec, linepos)
+
+    def lookup(self, relurl):
+        self.refresh()
+        return self.entries.get(relurl)
+
+    def get(self, relurl):
+        entry = self.lookup(relurl)
+        if entry == None:
+            return None
+
+        h = open(self.packpath, 'rb')
+        h.seek(entry.offset)
+        buf = h.read(entry.length)
+        h.close()
+
+        return compression.decompress(buf, entry.codec)
+
+    def put(self, relurl, buf, codec, mtime = None):
+        if mtime == None:
+            mtime = int(time.time())
+
+        packh = open(self.packpath, 'ab')
+        fcntl.flock(packh, fcntl.LOCK_EX)
+        try:
+            self.refresh()
+
+            header = ('%s\t%d\n' % (relurl, len(buf))).encode('utf8')
+            packh.seek(0, os.SEEK_END)
+            offset = packh.tell() + len(header)
+            packh.write(header)
+            packh.write(buf)
+            packh.write(b'\n')
+            packh.flush()
+
+            codecstr = codec if codec else '-'
+            line = (INDEX_FORMAT % (offset, len(buf), mtime, codecstr, relurl)).encode('utf8')
+
+            entry = self.entries.get(relurl)
+            indexh = open(self.indexpath, 'r+b' if self.indexstat else 'wb')
+            if entry != None:
+                indexh.seek(entry.linepos)
+                indexh.write(line[:INDEX_PREFIX])
+                linepos = entry.linepos
+            else:
+                if self.indexstat and self.indexstat[0] > self.indexsize:
+                    self.logger.warn('Truncating partial line at the end of %s', self.indexpath)
+                    indexh.truncate(self.indexsize)
+                indexh.seek(self.indexsize)
+                linepos = self.indexsize
+                indexh.write(line)
+                self.indexsize = linepos + len(line)
+            indexh.close()
+
+            self.entries[relurl] = IndexEntry(offset, len(buf), mtime, codec, linepos)
+            self.indexstat = self.get_indexstat()
+        finally:
+            fcntl.flock(packh, fcntl.LOCK_UN)
+            packh.close()
+
+    def remove(self, relurl):
+        # the index line is superseded in place, compact() drops the data
+        packh = open(self.packpath, 'ab')
+        fcntl.flock(packh, fcntl.LOCK_EX)
+        try:
+            self.refresh()
+            entry = self.entries.pop(relurl, None)
+            if entry == None:
+                return False
+
+            line = (INDEX_FORMAT % (entry.offset, entry.length, entry.mtime, \
+                                    REMOVED_CODEC, relurl)).encode('utf8')
+            indexh = open(self.indexpath, 'r+b')
+            indexh.seek(entry.linepos)
+            indexh.write(line[:INDEX_PREFIX])
+            indexh.close()
+
+            self.indexstat = self.get_indexstat()
+        finally:
+            fcntl.flock(packh, fcntl.LOCK_UN)
+            packh.close()
+        return True
+
+    def sync(self):
+        for filepath in [self.packpath, self.indexpath]:
+            if os.path.exists(filepath):
+                fd = os.open(filepath, os.O_RDONLY)
+                os.fsync(fd)
+                os.close(fd)
+
+    def compact(self):
+        # rewrites the pack keeping only the live copy of every record
+        self.refresh()
+        tmppack  = '%s.compact' % self.packpath
+        tmpindex = '%s.compact' % self.indexpath
+
+        relurls = list(self.entries.keys())
+        relurls.sort()
+
+        src     = open(self.packpath, 'rb')
+        packh   = open(tmppack, 'wb')
+        indexh  = open(tmpindex, 'wb')
+        entries = {}
+        for relurl in relurls:
+            entry = self.entries[relurl]
+            src.seek(entry.offset)
+            buf = src.read(entry.length)
+
+            header = ('%s\t%d\n' % (relurl, len(buf))).encode('utf8')
+            offset = packh.tell() + len(header)
+            packh.write(header)
+            packh.write(buf)
+            packh.write(b'\n')
+
+            codecstr = entry.codec if entry.codec else '-'
+            linepos  = indexh.tell()
+            indexh.write((INDEX_FORMAT % (offset, len(buf), entry.mtime, \
+                                          codecstr, relurl)).encode('utf8'))
+            entries[relurl] = IndexEntry(offset, len(buf), entry.mtime, \
+                                         entry.codec, linepos)
+        src.close()
+        packh.close()
+        indexsize = indexh.tell()
+        indexh.close()
+
+        os.replace(tmppack, self.packpath)
+        os.replace(tmpindex, self.indexpath)
+        self.entries   = entries
+        self.indexsize = indexsize
+        self.indexstat = self.get_indexstat()
+
+class MetaPackStore:
+    def __init__(self, packdir):
+        self.packdir = packdir
+        self.packs   = {}
+        mk_dir(self.packdir)
+
+        self.month_re = re.compile('(?P<month>\d{4}-\d{2})-\d{2}$')
+
+    def get_packname(self, relurl):
+        words = relurl.split('/')
+        month = 'misc'
+        if len(words) > 2:
+            reobj = self.month_re.match(words[1])
+            if reobj:
+                month = reobj.group('month')
+        return words[0], month
+
+    def get_pack(self, relurl, create = False):
+        src, month = self.get_packname(relurl)
+        key = (src, month)
+        if key not in self.packs:
+            srcdir = os.path.join(self.packdir, src)
+            if not create and not os.path.exists(srcdir):
+                return None
+            mk_dir(srcdir)
+            self.packs[key] = MetaPack(os.path.join(srcdir, '%s.pack' % month), \
+                                       os.path.join(srcdir, '%s.idx' % month))
+        return self.packs[key]
+
+    def lookup(self, relurl):
+        pack = self.get_pack(relurl)
+        if pack == None:
+            return None
+        return pack.lookup(relurl)
+
+    def exists(self, relurl):
+        return self.lookup(relurl) != None
+
+    def get_path(self, relurl):
+        pack = self.get_pack(relurl)
+        if pack == None:
+            return None
+        return pack.packpath
+
+    def get(self, relurl):
+        pack = self.get_pack(relurl)
+        if pack == None:
+            return None
+        return pack.get(relurl)
+
+    def put(self, relurl, buf, codec, mtime = None):
+        self.get_pack(relurl, create = True).put(relurl, buf, codec, mtime)
+
+    def remove(self, relurl):
+        pack = self.get_pack(relurl)
+        if pack == None:
+            return False
+        return pack.remove(relurl)
+
+    def sync(self):
+        for pack in self.packs.values():
+            pack.sync()
+
+    def get_packs(self):
+        for src in sorted(os.listdir(self.packdir)):
+            srcdir = os.path.join(self.packdir, src)
+            for filename in sorted(os.listdir(srcdir)):
+                if not filename.endswith('.idx'):
+                    continue
+                month = filename[:-4]
+                key   = (src, month)
+                if key not in self.packs:
+                    self.packs[key] = MetaPack(os.path.join(srcdir, '%s.pack' % month), \
+                                               os.path.join(srcdir, filename))
+                yield self.packs[key]
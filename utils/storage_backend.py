@@ -0,0 +1,360 @@
+import os
+import io
+import glob
+import shutil
+import fnmatch
+import logging
+import concurrent.futures
+
+try:
+    import boto3
+    import botocore.exceptions
+except ImportError:
+    boto3 = None
+
+class BackendStat:
+    def __init__(self, size, mtime):
+        self.size  = size
+        self.mtime = mtime
+
+class StorageBackend:
+    # keys are '/' separated paths relative to the root of the store, e.g.
+    # raw/central/2020-01-01/12345.pdf or metatags/central/2020-01-01/12345.xml
+    def exists(self, key):
+        raise NotImplementedError
+
+    def put(self, key, stream):
+        raise NotImplementedError
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def list(self, prefix):
+        raise NotImplementedError
+
+    def stat(self, key):
+        raise NotImplementedError
+
+    def remove(self, key):
+        raise NotImplementedError
+
+    def list_dirs(self, prefix):
+        raise NotImplementedError
+
+    def get_url(self, key):
+        raise NotImplementedError
+
+    def pending(self):
+        return 0
+
+    def is_full(self):
+        return False
+
+    def commit(self):
+        pass
+
+class AtomicWriter:
+    # files are written to a hidden temp file and renamed into place so that
+    # a killed worker never leaves a truncated file at the final path. With
+    # fsync_batch > 0 the renames are held back and fsync'ed as one group.
+    def __init__(self, fsync_batch):
+        self.fsync_batch = fsync_batch
+        self.pending     = {}
+
+    def get_tmp_path(self, filepath, suffix = 'tmp'):
+        dirname, filename = os.path.split(filepath)
+        return os.path.join(dirname, '.%s.%s%d' % (filename, suffix, os.getpid()))
+
+    def exists(self, filepath):
+        return filepath in self.pending or os.path.exists(filepath)
+
+    def glob(self, pattern):
+        filepaths = glob.glob(pattern)
+        for filepath in self.pending:
+            if fnmatch.fnmatch(filepath, pattern) and filepath not in filepaths:
+                filepaths.append(filepath)
+        return filepaths
+
+    def write(self, filepath, buf):
+        tmppath = self.get_tmp_path(filepath)
+        h = open(tmppath, 'wb')
+        if isinstance(buf, bytes):
+            h.write(buf)
+        else:
+            shutil.copyfileobj(buf, h)
+        h.close()
+        self.stage(tmppath, filepath)
+
+    def link(self, srcpath, filepath):
+        srcpath = self.pending.get(srcpath, srcpath)
+        tmppath = self.get_tmp_path(filepath, 'link')
+        if os.path.lexists(tmppath):
+            os.remove(tmppath)
+        os.link(srcpath, tmppath)
+        self.stage(tmppath, filepath)
+
+    def stage(self, tmppath, filepath):
+        if self.fsync_batch <= 0:
+            os.replace(tmppath, filepath)
+        else:
+            self.pending[filepath] = tmppath
+
+    def unstage(self, filepath):
+        tmppath = self.pending.pop(filepath, None)
+        if tmppath:
+            os.remove(tmppath)
+
+    def is_full(self):
+        return self.fsync_batch > 0 and len(self.pending) >= self.fsync_batch
+
+    def commit(self):
+        if not self.pending:
+            return
+
+        for tmppath in set(self.pending.values()):
+            fd = os.open(tmppath, os.O_RDONLY)
+            os.fsync(fd)
+            os.close(fd)
+
+        dirnames = set()
+        for filepath, tmppath in self.pending.items():
+            os.replace(tmppath, filepath)
+            dirnames.add(os.path.dirname(filepath))
+        self.pending = {}
+
+        for dirname in dirnames:
+            fd = os.open(dirname, os.O_RDONLY)
+            os.fsync(fd)
+            os.close(fd)
+
+class LocalBackend(StorageBackend):
+    def __init__(self, basedir, fsync_batch = 0):
+        self.basedir = basedir
+        self.writer  = AtomicWriter(fsync_batch)
+
+    def get_path(self, key):
+        return os.path.join(self.basedir, key)
+
+    def get_url(self, key):
+        return self.get_path(key)
+
+    def exists(self, key):
+        return self.writer.exists(self.get_path(key))
+
+    def put(self, key, stream):
+        filepath = self.get_path(key)
+        os.makedirs(os.path.dirname(filepath), exist_ok = True)
+        self.writer.write(filepath, stream)
+
+    def get(self, key):
+        filepath = self.get_path(key)
+        return open(self.writer.pending.get(filepath, filepath), 'rb')
+
+    def stat(self, key):
+        filepath = self.get_path(key)
+        try:
+            st = os.stat(self.writer.pending.get(filepath, filepath))
+        except FileNotFoundError:
+            return None
+        return BackendStat(st.st_size, st.st_mtime)
+
+    def remove(self, key):
+        filepath = self.get_path(key)
+        self.writer.unstage(filepath)
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+    def list(self, prefix):
+        # prefix need not end at a directory boundary, as in S3
+        if '/' in prefix:
+            dirkey, namepart = prefix.rsplit('/', 1)
+        else:
+            dirkey, namepart = '', prefix
+
+        keys = {}
+        for key, entry in self.scan_dir(dirkey, namepart):
+            keys[key] = entry
+
+        basedir = self.basedir + os.sep
+        for filepath, tmppath in self.writer.pending.items():
+            key = filepath[len(basedir):]
+            if key.startswith(prefix) and key not in keys:
+                keys[key] = tmppath
+
+        for key in sorted(keys):
+            entry = keys[key]
+            if isinstance(entry, str):
+                st = os.stat(entry)
+            else:
+                st = entry.stat()
+            yield key, BackendStat(st.st_size, st.st_mtime)
+
+    def list_dirs(self, prefix):
+        try:
+            with os.scandir(self.get_path(prefix)) as it:
+                return [e.name for e in it if e.is_dir() \
+                                            and not e.name.startswith('.')]
+        except FileNotFoundError:
+            return []
+
+    def scan_dir(self, dirkey, namepart = ''):
+        try:
+            with os.scandir(self.get_path(dirkey)) as it:
+                entries = [e for e in it if e.name.startswith(namepart) \
+                                            and not e.name.startswith('.')]
+        except (FileNotFoundError, NotADirectoryError):
+            return
+
+        for entry in entries:
+            key = '%s/%s' % (dirkey, entry.name) if dirkey else entry.name
+            if entry.is_dir():
+                for x in self.scan_dir(key):
+                    yield x
+            elif entry.is_file():
+                yield key, entry
+
+    def pending(self):
+        return len(self.writer.pending)
+
+    def is_full(self):
+        return self.writer.is_full()
+
+    def commit(self):
+        self.writer.commit()
+
+class S3Backend(StorageBackend):
+    # works with any S3 compatible store (MinIO, Ceph RGW etc.). The endpoint
+    # and credentials come from the usual AWS_* environment variables.
+    def __init__(self, bucket, prefix = '', workers = 4, \
+                 part_size = 8 * 1024 * 1024, endpoint_url = None):
+        if boto3 == None:
+            raise ImportError('boto3 module is needed for the S3 backend')
+
+        self.logger       = logging.getLogger('judis.s3backend')
+        self.bucket       = bucket
+        self.prefix       = prefix
+        self.workers      = workers
+        self.part_size    = part_size
+        self.endpoint_url = endpoint_url
+        self.client       = None
+        self.pid          = None
+
+    def get_client(self):
+        # boto3 clients do not survive a fork, so every crawler process
+        # makes its own
+        if self.client == None or self.pid != os.getpid():
+            self.client = boto3.client('s3', endpoint_url = self.endpoint_url)
+            self.pid    = os.getpid()
+        return self.client
+
+    def get_name(self, key):
+        return self.prefix + key
+
+    def get_url(self, key):
+        return 's3://%s/%s' % (self.bucket, self.get_name(key))
+
+    def exists(self, key):
+        return self.stat(key) != None
+
+    def stat(self, key):
+        try:
+            response = self.get_client().head_object(Bucket = self.bucket, \
+                                                     Key = self.get_name(key))
+        except botocore.exceptions.ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return BackendStat(response['ContentLength'], \
+                           response['LastModified'].timestamp())
+
+    def get(self, key):
+        response = self.get_client().get_object(Bucket = self.bucket, \
+                                                Key = self.get_name(key))
+        return response['Body']
+
+    def remove(self, key):
+        self.get_client().delete_object(Bucket = self.bucket, \
+                                        Key = self.get_name(key))
+
+    def list(self, prefix):
+        paginator = self.get_client().get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket = self.bucket, \
+                                       Prefix = self.get_name(prefix)):
+            for obj in page.get('Contents', []):
+                key = obj['Key'][len(self.prefix):]
+                yield key, BackendStat(obj['Size'], obj['LastModified'].timestamp())
+
+    def list_dirs(self, prefix):
+        dirnames  = []
+        paginator = self.get_client().get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket = self.bucket, Delimiter = '/', \
+                                       Prefix = self.get_name(prefix)):
+            for obj in page.get('CommonPrefixes', []):
+                dirnames.append(obj['Prefix'].rstrip('/').rsplit('/', 1)[-1])
+        return dirnames
+
+    def put(self, key, stream):
+        if isinstance(stream, bytes):
+            stream = io.BytesIO(stream)
+
+        buf = stream.read(self.part_size)
+        if len(buf) < self.part_size:
+            self.get_client().put_object(Bucket = self.bucket, \
+                                         Key = self.get_name(key), Body = buf)
+            return
+
+        self.put_multipart(key, buf, stream)
+
+    def put_multipart(self, key, buf, stream):
+        client   = self.get_client()
+        name     = self.get_name(key)
+        response = client.create_multipart_upload(Bucket = self.bucket, Key = name)
+        uploadid = response['UploadId']
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers = self.workers)
+        futures  = []
+        try:
+            partnum = 1
+            while buf:
+                # at most workers parts are held in memory at a time. Only
+                # the unfinished uploads are waited on, wait() returns at
+                # once if any future in its list is already done
+                running = self.get_running(futures)
+                if len(running) >= self.workers:
+                    concurrent.futures.wait(running, \
+                        return_when = concurrent.futures.FIRST_COMPLETED)
+
+                futures.append(executor.submit(self.upload_part, client, \
+                                               name, uploadid, partnum, buf))
+                partnum += 1
+                buf = stream.read(self.part_size)
+
+            parts = [f.result() for f in futures]
+            client.complete_multipart_upload(Bucket = self.bucket, Key = name, \
+                UploadId = uploadid, MultipartUpload = {'Parts': parts})
+        except Exception:
+            self.logger.warn('Aborting multipart upload of %s', name)
+            client.abort_multipart_upload(Bucket = self.bucket, Key = name, \
+                                          UploadId = uploadid)
+            raise
+        finally:
+            executor.shutdown()
+
+    def get_running(self, futures):
+        return [f for f in futures if not f.done()]
+
+    def upload_part(self, client, name, uploadid, partnum, buf):
+        response = client.upload_part(Bucket = self.bucket, Key = name, \
+                                      UploadId = uploadid, PartNumber = partnum, \
+                                      Body = buf)
+        return {'ETag': response['ETag'], 'PartNumber': partnum}
+
+def get_backend(url, basedir, fsync_batch = 0):
+    if url and url.startswith('s3://'):
+        words  = url[5:].split('/', 1)
+        prefix = ''
+        if len(words) == 2 and words[1]:
+            prefix = words[1].rstrip('/') + '/'
+        return S3Backend(words[0], prefix)
+
+    return LocalBackend(basedir, fsync_batch)
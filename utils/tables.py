@@ -0,0 +1,65 @@
+import re
+
+from . import html_ops
+from .utils import get_tag_contents
+
+def find_all(node, tagname):
+    if html_ops.is_element(node):
+        return node.iter(tagname)
+    return node.find_all(tagname)
+
+class HeaderMap:
+    # columns is a list of (regex, field) tried in order on the text of each
+    # header cell, the first regex found in the text gives the field of the
+    # column. field can also be a function of the match object. The regexes
+    # are compiled once when the source is created instead of on every cell.
+    def __init__(self, columns, cell = 'th', flags = 0, required = None, \
+                 require_any = False):
+        self.columns     = [(re.compile(regex, flags), field) \
+                            for regex, field in columns]
+        self.cell        = cell
+        self.required    = required
+        self.require_any = require_any
+
+    def get_field(self, txt):
+        if not txt:
+            return ''
+
+        for reobj, field in self.columns:
+            match = reobj.search(txt)
+            if match:
+                if callable(field):
+                    return field(match)
+                return field
+        return ''
+
+    def get_order(self, tr):
+        order = [self.get_field(get_tag_contents(cell)) \
+                 for cell in find_all(tr, self.cell)]
+
+        if self.required:
+            for field in self.required:
+                if field not in order:
+                    return None
+
+        if self.require_any and not any(order):
+            return None
+
+        return order
+
+    def get_rows(self, table):
+        # the rows before the header row are skipped, every row after it is
+        # returned with the column order of the header
+        order = None
+        for tr in find_all(table, 'tr'):
+            if not order:
+                order = self.get_order(tr)
+                continue
+            yield tr, order
+
+    def find_table(self, tables):
+        for table in tables:
+            for tr in find_all(table, 'tr'):
+                if self.get_order(tr):
+                    return table
+        return None
@@ -11,8 +11,12 @@ import calendar
 from PyPDF2 import PdfFileReader
 from xml.parsers.expat import ExpatError
 from xml.dom import minidom, Node
-from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4 import BeautifulSoup, NavigableString, Tag, SoupStrainer
 from functools import reduce
+from collections.abc import MutableMapping
+
+from . import html_ops
+from . import dateparse
 
 def parse_xml(xmlpage):
     try: 
@@ -65,63 +69,67 @@ def check_next_page(tr, pagenum):
     return pageblock, nextlink
 
 def month_to_num(month):
-    month = month.lower()
-    if month in ['frbruary', 'februay']:
-        month = 'february'
-
-    count = 0
-    for mth in calendar.month_name:
-        if mth.lower() == month:
-            return count
-        count += 1
-
-    count = 0
-    for mth in calendar.month_abbr:
-        if mth.lower() == month:
-            return count
-        count += 1
-
-    return None
+    return dateparse.month_to_num(month)
 
 def to_dateobj(x):
-    reobj = re.search('(?P<day>\d+)-(?P<month>jan|feb|mar|apr|may|jun|jul|aug|sep|aug|sep|oct|nov|dec)-(?P<year>\d+)', x, re.IGNORECASE)
-    if reobj:
-        groupdict = reobj.groupdict()
-        month = month_to_num(groupdict['month'])
-        day   = int(groupdict['day'])
-        year  = int(groupdict['year'])
-        return datetime.date(year, month, day)
-
-    return None    
+    return dateparse.to_dateobj(x)
 
 def get_month_num(month, monthnames):
-    i = 0
-    month = month.lower()
-    for m in monthnames:
-        if m.lower() == month:
-            return i
-        i += 1
-    return -1
-            
-def parse_datestr(datestr):
-    reobj = re.search('(?P<day>\d+)\s*(?P<month>\w+)\s*(?P<year>\d+)', datestr)
-    if reobj:
-        groupdict = reobj.groupdict()
-        month_num = get_month_num(groupdict['month'], calendar.month_abbr)
-        if month_num <= 0:
-            return None
-        try:
-            year = int(groupdict['year'])
-            day  = int(groupdict['day'])    
-        except:
-            return None    
-        return datetime.datetime(year, month_num, day)
+    return dateparse.get_month_num(month, monthnames)
 
-    return None         
+def parse_datestr(datestr):
+    return dateparse.parse_datestr(datestr)
+
+class RegionStrainer(SoupStrainer):
+    # regions is a list of (tagname, attrs) and only the matching tags
+    # and their contents are built into the tree
+    def __init__(self, regions):
+        self.regions = regions
+        SoupStrainer.__init__(self, self.match_region)
+
+    def match_region(self, tag, attrs = None):
+        # bs4 before 4.13 calls this with the name and attributes of the
+        # tag, later versions with the Tag itself
+        if isinstance(tag, Tag):
+            name  = tag.name
+            attrs = tag.attrs
+        else:
+            name  = tag
+
+        if attrs == None:
+            attrs = {}
+
+        for region_name, region_attrs in self.regions:
+            if name != region_name:
+                continue
+            if not region_attrs:
+                return True
+
+            matched = True
+            for k, v in region_attrs.items():
+                value = attrs.get(k)
+                if isinstance(value, list):
+                    value = ' '.join(value)
+                if value != v:
+                    matched = False
+                    break
+            if matched:
+                return True
+        return False
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        return self.match_region(name, attrs)
+
+def parse_webpage(webpage, parser, regions = None):
+    if parser == html_ops.HTML_PARSER:
+        return html_ops.parse_html(webpage)
+
+    parse_only = None
+    if regions:
+        parse_only = RegionStrainer(regions)
 
-def parse_webpage(webpage, parser):
     try:
-        d = BeautifulSoup(webpage, parser)
+        d = BeautifulSoup(webpage, parser, parse_only = parse_only)
         return d
     except:
         return None
@@ -162,6 +170,9 @@ def get_tag_contents(node):
     if type(node) == NavigableString:
         return '%s' % node 
 
+    if not isinstance(node, Tag):
+        return html_ops.get_text(node)
+
     retval = [] 
     for content in node.contents:
         if type(content) == NavigableString:
@@ -174,26 +185,7 @@ def get_tag_contents(node):
     return ''.join(retval) 
 
 def get_date_from_title(title):
-    months =  '|'.join(calendar.month_name[1:]) 
-    reobj = re.search(r'(?P<day>\d+)\s*(st|nd|rd|th)\s*(?P<month>%s)\s*(?P<year>\d{4})\b' % months, title, re.IGNORECASE)
-    if not reobj:
-        return None
-
-    groupdict = reobj.groupdict()
-
-    day    = groupdict['day']
-    month  = groupdict['month']
-    year   = groupdict['year']
-
-    month_num = get_month_num(groupdict['month'], calendar.month_name)
-    if month_num <= 0:
-        return None
-
-    try:
-        dateobj = datetime.date(int(year), month_num, int (day))
-    except:    
-        dateobj = None    
-    return dateobj
+    return dateparse.get_date_from_title(title)
         
 def tag_contents_without_recurse(tag):
     contents = []
@@ -242,25 +234,114 @@ def replace_xml_illegal_chars(val, replacement=' '):
 
     return _illegal_xml_chars_RE.sub(replacement, val)
 
-class MetaInfo(dict):
+_missing = object()
+
+class MetaInfo(MutableMapping):
+    # the common fields are kept in slots and the rest in an overflow dict
+    # that is created only when a source sets one of them. download is
+    # held by most listings until the document is fetched
+    FIELDS    = ('date', 'title', 'url', 'gztype', 'gznum', 'ministry', \
+                 'department', 'subject', 'partnum', 'notification_num', \
+                 'download')
+    __slots__ = FIELDS + ('_extra',)
+
     def __init__(self):
-        dict.__init__(self)
+        self._extra = None
+
+    def __getitem__(self, field):
+        if field in METAINFO_FIELDS:
+            try:
+                return getattr(self, field)
+            except AttributeError:
+                raise KeyError(field)
+        if self._extra == None:
+            raise KeyError(field)
+        return self._extra[field]
+
+    def __setitem__(self, field, value):
+        if field in METAINFO_FIELDS:
+            setattr(self, field, value)
+        else:
+            if self._extra == None:
+                self._extra = {}
+            self._extra[field] = value
+
+    def __delitem__(self, field):
+        if field in METAINFO_FIELDS:
+            try:
+                delattr(self, field)
+            except AttributeError:
+                raise KeyError(field)
+        elif self._extra == None:
+            raise KeyError(field)
+        else:
+            del self._extra[field]
+
+    def __contains__(self, field):
+        if field in METAINFO_FIELDS:
+            return hasattr(self, field)
+        return self._extra != None and field in self._extra
+
+    def __iter__(self):
+        for field in self.FIELDS:
+            if getattr(self, field, _missing) is not _missing:
+                yield field
+        if self._extra:
+            for field in self._extra:
+                yield field
+
+    def __len__(self):
+        num = 0
+        for field in self.FIELDS:
+            if getattr(self, field, _missing) is not _missing:
+                num += 1
+        if self._extra:
+            num += len(self._extra)
+        return num
+
+    def items(self):
+        items = []
+        for field in self.FIELDS:
+            value = getattr(self, field, _missing)
+            if value is not _missing:
+                items.append((field, value))
+        if self._extra:
+            items.extend(self._extra.items())
+        return items
+
+    def keys(self):
+        return [item[0] for item in self.items()]
+
+    def values(self):
+        return [item[1] for item in self.items()]
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def get(self, field, default = None):
+        if field in METAINFO_FIELDS:
+            return getattr(self, field, default)
+        if self._extra == None:
+            return default
+        return self._extra.get(field, default)
 
     def copy(self):
         m = MetaInfo()
-        for k, v in self.items():
-            m[k] = v
+        for field in self.FIELDS:
+            value = getattr(self, field, _missing)
+            if value is not _missing:
+                setattr(m, field, value)
+        if self._extra:
+            m._extra = dict(self._extra)
         return m
  
     def set_field(self, field, value):
-        if type(value) in (str,):
+        if type(value) in (str,) and _illegal_xml_chars_RE.search(value):
             value = replace_xml_illegal_chars(value)
         self.__setitem__(field, value)
 
     def get_field(self, field):
-        if field in self:
-            return self.get(field)
-        return None
+        return self.get(field)
 
     def set_date(self, value):
         self.set_field(DATE, value)
@@ -304,6 +385,8 @@ class MetaInfo(dict):
     def get_gztype(self, value):
         return self.get_field(GZTYPE)
 
+METAINFO_FIELDS = frozenset(MetaInfo.FIELDS)
+
 def stats_to_message(stats):
     rawstats  = stats[0]
     metastats = stats[1]
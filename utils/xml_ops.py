@@ -1,69 +1,57 @@
-from xml.sax import saxutils
-from xml.parsers.expat import ExpatError
+from xml.etree import ElementTree
 import types
 import datetime
 import logging
-import codecs
-from xml.dom import minidom, Node
 from .utils import MetaInfo
 
-def print_tag_file(filepath, feature):
-    filehandle = codecs.open(filepath, 'w', 'utf8')
-
-    filehandle.write('<?xml version="1.0" encoding="utf-8"?>\n')
-    filehandle.write(obj_to_xml('document', feature))
-
-    filehandle.close()
-
-def read_tag_file(filepath, relurl):
-    filehandle = codecs.open(filepath, 'r', 'utf8')
-
-    metastring = filehandle.read()
-    metainfo = xml_to_tagdict(relurl, metastring.encode('utf-8'))
-
-    filehandle.close()
-
-    return metainfo
+def tag_file_bytes(feature):
+    xmlstring = '<?xml version="1.0" encoding="utf-8"?>\n' + \
+                obj_to_xml('document', feature)
+    return xmlstring.encode('utf8')
 
 def obj_to_xml(tagName, obj):
+    tags = []
+    append_xml_tags(tags, tagName, obj)
+    return '\n'.join(tags)
+
+def append_xml_tags(tags, tagName, obj):
+    # one flat list of lines instead of joining a string at every level
     if type(obj) in (str,):
-        return get_xml_tag(tagName, obj)
+        tags.append(get_xml_tag(tagName, obj))
+        return
 
-    tags = ['<%s>' % tagName]
-    ks = list(obj.keys())
-    ks.sort()
-    for k in ks:
+    tags.append('<%s>' % tagName)
+    for k in sorted(obj.keys()):
         newobj = obj[k]
-        if isinstance(newobj, dict):
-            tags.append(obj_to_xml(k, newobj))
+        if type(newobj) == str:
+            tags.append('<%s>%s</%s>' % (k, escape_xml(newobj), k))
+        elif isinstance(newobj, dict):
+            append_xml_tags(tags, k, newobj)
         elif isinstance(newobj, list):
             if k == 'bench':
                 tags.append('<%s>'% k)
                 for o in newobj:
-                    tags.append(obj_to_xml('name', o))
+                    append_xml_tags(tags, 'name', o)
                 tags.append('</%s>'% k)
             else:
                 for o in newobj:
-                    tags.append(obj_to_xml(k, o))
-        elif isinstance(newobj,  datetime.datetime) or \
-                isinstance(newobj, datetime.date):
-            tags.append(obj_to_xml(k, date_to_xml(newobj)))
+                    append_xml_tags(tags, k, o)
+        elif isinstance(newobj, datetime.date):
+            tags.append('<%s>\n<day>%d</day>\n<month>%d</month>\n<year>%d</year>\n</%s>' % \
+                        (k, newobj.day, newobj.month, newobj.year, k))
         else:
-            tags.append(get_xml_tag(k, obj[k]))
+            tags.append(get_xml_tag(k, newobj))
     tags.append('</%s>' % tagName)
-    xmltags =  '\n'.join(tags)
-
-    return xmltags
 
 def xml_to_tagdict(docid, xmlstring):
     try:
-        xmlnode = minidom.parseString(xmlstring)
-    except ExpatError as e:
+        root = ElementTree.fromstring(xmlstring)
+    except ElementTree.ParseError as e:
         logger = logging.getLogger('utils.commonfuncs')
         logger.error('Err %s in xml reading of tagfile  %s' % (e, docid))
         return None
 
-    feature = xml_to_obj(xmlnode.childNodes[0])
+    feature = xml_to_obj(root)
     metainfo = MetaInfo()
     for k, v in feature.items():
         if k == 'date':
@@ -74,23 +62,22 @@ def xml_to_tagdict(docid, xmlstring):
 
     return metainfo 
 
-def xml_to_obj(xmlNode):
+def xml_to_obj(element):
     xmldict = {}
-    for node in xmlNode.childNodes:
-        if node.nodeType == Node.ELEMENT_NODE:
-           k = node.tagName
-           obj = xml_to_obj(node)
-           if k in xmldict:
-               if not (type(xmldict[k]) == list):
-                   xmldict[k] = [xmldict[k]]
-               xmldict[k].append(obj)
-           else:
-               xmldict[k] = obj
+    for node in element:
+        k = node.tag
+        obj = xml_to_obj(node)
+        if k in xmldict:
+            if not (type(xmldict[k]) == list):
+                xmldict[k] = [xmldict[k]]
+            xmldict[k].append(obj)
+        else:
+            xmldict[k] = obj
 
     if xmldict:
         return xmldict
     else:
-        return get_node_value(xmlNode.childNodes)
+        return get_node_value(element)
 
 def get_xml_tag(tagName, tagValue, escape = True):
     if type(tagValue) == int:
@@ -105,7 +92,7 @@ def get_xml_tag(tagName, tagValue, escape = True):
     return xmltag
 
 def escape_xml(tagvalue):
-    return saxutils.escape(tagvalue)
+    return tagvalue.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
 
 def date_to_xml(dateobj):
     datedict =  {}
@@ -116,12 +103,9 @@ def date_to_xml(dateobj):
 
     return datedict
 
-def get_node_value(xmlNodes):
-    value = []
-    ignoreValues = ['\n']
-    for node in xmlNodes:
-        if node.nodeType == Node.TEXT_NODE:
-            if node.data not in ignoreValues:
-                value.append(node.data)
-    return ''.join(value)
-
+def get_node_value(element):
+    # a leaf that only holds the newline between tags is empty
+    value = element.text
+    if value == None or value == '\n':
+        return ''
+    return value